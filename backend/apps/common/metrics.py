@@ -0,0 +1,132 @@
+"""
+TruEditor - Lightweight Metrics
+===============================
+Process-local counters and timers, periodically pushed to the shared cache
+so every worker's numbers add up in one place.
+
+Hot paths only touch an in-memory dict; deltas are flushed with cache.incr
+at most once per METRICS_FLUSH_INTERVAL seconds per process.
+
+Usage:
+    from apps.common import metrics
+    metrics.incr('submission_detail_cache.hit')
+    with metrics.timer('presigned_url.sign'):
+        ...
+
+Developer: Abdullah Dogan
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+METRIC_KEY = 'metrics:{name}'
+METRIC_NAMES_KEY = 'metrics:names'
+
+_lock = threading.Lock()
+_pending = defaultdict(int)
+_last_flush = time.monotonic()
+
+
+def incr(name, amount=1):
+    """
+    Increment a counter.
+
+    Args:
+        name: Metric name (e.g. 'submission_detail_cache.hit')
+        amount: Integer increment
+    """
+    global _last_flush
+
+    with _lock:
+        _pending[name] += int(amount)
+        due = time.monotonic() - _last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 10)
+
+    if due:
+        flush()
+
+
+def observe(name, value):
+    """
+    Record one observation (e.g. bytes, items).
+    Stored as `{name}.count` and `{name}.sum`.
+    """
+    incr(f'{name}.count')
+    incr(f'{name}.sum', value)
+
+
+@contextmanager
+def timer(name):
+    """
+    Time a block; stored as `{name}.count` and `{name}.us` (microseconds).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        incr(f'{name}.count')
+        incr(f'{name}.us', (time.perf_counter() - started) * 1_000_000)
+
+
+def flush():
+    """Push pending deltas to the shared cache."""
+    global _last_flush
+
+    with _lock:
+        pending = {name: value for name, value in _pending.items() if value}
+        _pending.clear()
+        _last_flush = time.monotonic()
+
+    if not pending:
+        return
+
+    try:
+        for name, delta in pending.items():
+            key = METRIC_KEY.format(name=name)
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, delta)
+
+        names = cache.get(METRIC_NAMES_KEY) or set()
+        if not set(pending) <= names:
+            cache.set(METRIC_NAMES_KEY, names | set(pending), timeout=None)
+    except Exception as e:
+        # Metrics must never break a request
+        logger.warning(f"Metrics flush failed: {str(e)}")
+
+
+def get_metrics(prefix=''):
+    """
+    Return all flushed metrics, optionally filtered by name prefix.
+
+    Timers also get a derived `{name}.avg_ms` value.
+
+    Returns:
+        dict: {metric_name: value}
+    """
+    flush()
+
+    names = sorted(
+        name for name in (cache.get(METRIC_NAMES_KEY) or set())
+        if name.startswith(prefix)
+    )
+    values = cache.get_many([METRIC_KEY.format(name=name) for name in names])
+    result = {name: values.get(METRIC_KEY.format(name=name), 0) for name in names}
+
+    for name in list(result):
+        if name.endswith('.us'):
+            base = name[:-len('.us')]
+            count = result.get(f'{base}.count') or 0
+            result[f'{base}.avg_ms'] = round(result[name] / count / 1000, 3) if count else 0
+
+    return result
+
+
+atexit.register(flush)
@@ -0,0 +1,138 @@
+"""
+TruEditor - Pagination Classes
+==============================
+Custom pagination classes for list endpoints.
+
+Developer: Abdullah Dogan
+"""
+
+import uuid
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (seek) pagination on the composite key (created_at, id).
+
+    Every page is fetched with a WHERE clause on the last seen key instead
+    of an OFFSET, so page N costs the same as page 1 (backed by a composite
+    index ending in created_at, id). No COUNT(*) is run unless the client
+    asks for it with `?include_count=true`.
+
+    Query params:
+    - cursor: Opaque cursor from the `next`/`previous` links
+    - page_size: Items per page (max 100)
+    - include_count: Add the total `count` to the response (optional)
+    """
+
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    count_query_param = 'include_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return one page of results using a keyset WHERE clause."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        self.count = queryset.count() if self.is_count_requested(request) else None
+
+        reverse = bool(self.cursor and self.cursor.reverse)
+        if reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+
+        if self.cursor is not None:
+            created_at, pk = self.decode_position(self.cursor.position)
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+
+        # Fetch one extra row to know whether another page exists
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def is_count_requested(self, request):
+        """Check whether the client asked for the total count."""
+        value = request.query_params.get(self.count_query_param, '')
+        return value.lower() in ('1', 'true', 'yes')
+
+    def encode_position(self, instance):
+        """Build the cursor position string for an instance."""
+        return f"{instance.created_at.isoformat()}|{instance.pk}"
+
+    def decode_position(self, position):
+        """
+        Parse a cursor position string.
+
+        Tampered positions (impossible dates, non-UUID keys) are reported
+        as an invalid cursor and never reach the query.
+
+        Returns:
+            tuple: (created_at, id)
+        """
+        try:
+            created_at, pk = position.split('|', 1)
+            # parse_datetime raises ValueError on well-formed but invalid dates
+            created_at = parse_datetime(created_at)
+            pk = uuid.UUID(pk)
+        except (AttributeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return created_at, pk
+
+    def get_next_link(self):
+        """Return the link to the next page."""
+        if not self.has_next or not self.page:
+            return None
+        cursor = Cursor(offset=0, reverse=False, position=self.encode_position(self.page[-1]))
+        return self.encode_cursor(cursor)
+
+    def get_previous_link(self):
+        """Return the link to the previous page."""
+        if not self.has_previous or not self.page:
+            return None
+        cursor = Cursor(offset=0, reverse=True, position=self.encode_position(self.page[0]))
+        return self.encode_cursor(cursor)
+
+    def get_paginated_response(self, data):
+        """Return the paginated response (count only if requested)."""
+        response_data = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            response_data['count'] = self.count
+        response_data['results'] = data
+        return Response(response_data)
@@ -1,3 +1,53 @@
-from django.test import TestCase
+"""
+TruEditor - Common Tests
+========================
+Tests for shared helpers.
 
-# Create your tests here.
+Developer: Abdullah Dogan
+"""
+
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+from rest_framework.exceptions import NotFound
+
+from .pagination import KeysetPagination
+
+
+class KeysetCursorTests(SimpleTestCase):
+    """Cursor position encoding and decoding."""
+
+    def setUp(self):
+        self.paginator = KeysetPagination()
+
+    def test_round_trip(self):
+        instance = SimpleNamespace(
+            created_at=datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            pk=uuid.uuid4()
+        )
+        position = self.paginator.encode_position(instance)
+
+        self.assertEqual(
+            self.paginator.decode_position(position),
+            (instance.created_at, instance.pk)
+        )
+
+    def test_invalid_positions_are_not_found(self):
+        pk = uuid.uuid4()
+        positions = [
+            # Impossible date (parse_datetime raises ValueError)
+            f'2026-02-30T10:00:00+00:00|{pk}',
+            # Not a date at all (parse_datetime returns None)
+            f'yesterday|{pk}',
+            # Non-UUID key
+            '2026-03-01T10:00:00+00:00|1 OR 1=1',
+            # No separator
+            '2026-03-01T10:00:00+00:00',
+            '',
+        ]
+        for position in positions:
+            with self.subTest(position=position):
+                with self.assertRaises(NotFound):
+                    self.paginator.decode_position(position)
@@ -7,10 +7,11 @@ Geliştirici: Abdullah Doğan
 """
 
 from django.urls import path
-from .views import HealthCheckView, ReadinessCheckView, LivenessCheckView
+from .views import HealthCheckView, ReadinessCheckView, LivenessCheckView, MetricsView
 
 urlpatterns = [
     path('', HealthCheckView.as_view(), name='health-check'),
     path('ready/', ReadinessCheckView.as_view(), name='readiness-check'),
     path('live/', LivenessCheckView.as_view(), name='liveness-check'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
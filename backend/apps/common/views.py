@@ -11,7 +11,7 @@ from django.utils import timezone
 from django.db import connection
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework import status
 
 
@@ -133,3 +133,26 @@ class LivenessCheckView(APIView):
         Verify that the service is alive.
         """
         return Response({'alive': True}, status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    """
+    Application metrics (cache hit rates, timings, counters).
+    Staff only.
+    
+    GET /api/v1/health/metrics/?prefix=submission_detail_cache
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        """
+        Return all recorded metrics, optionally filtered by prefix.
+        """
+        from apps.common import metrics
+        
+        prefix = request.query_params.get('prefix', '')
+        
+        return Response(
+            {'success': True, 'data': metrics.get_metrics(prefix)},
+            status=status.HTTP_200_OK
+        )
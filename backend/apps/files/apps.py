@@ -9,3 +9,12 @@ class FilesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.files'
     verbose_name = 'Dosya Yönetimi'
+    
+    def ready(self):
+        """
+        Uygulama hazır olduğunda signal'ları import et.
+        """
+        try:
+            import apps.files.signals  # noqa
+        except ImportError:
+            pass
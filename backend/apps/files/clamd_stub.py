@@ -0,0 +1,102 @@
+"""
+TruEditor - clamd Stand-in
+==========================
+Minimal clamd-compatible server for development and CI, where a real
+ClamAV daemon (and its signature database) is not available.
+
+Speaks the subset of the protocol ClamdScanner uses (PING, VERSION,
+INSTREAM, IDSESSION/END) and reports only the EICAR test string as
+infected, so the whole pipeline including quarantine can be exercised.
+
+Developer: Abdullah Dogan
+"""
+
+import socketserver
+import struct
+
+EICAR_SIGNATURE = 'Eicar-Test-Signature'
+EICAR_MARKER = b'EICAR-STANDARD-ANTIVIRUS-TEST-FILE'
+
+
+class ClamdStubHandler(socketserver.BaseRequestHandler):
+    """Handles one client connection."""
+
+    def _read_exact(self, size):
+        data = bytearray()
+        while len(data) < size:
+            block = self.request.recv(size - len(data))
+            if not block:
+                raise ConnectionError('Client closed the connection.')
+            data += block
+        return bytes(data)
+
+    def _read_command(self):
+        """Read a `z`-prefixed, NUL-terminated command."""
+        command = bytearray()
+        while not command.endswith(b'\0'):
+            block = self.request.recv(1)
+            if not block:
+                return None
+            command += block
+        return command[:-1].decode('ascii', 'replace').lstrip('zn')
+
+    def _instream(self):
+        """Receive length-prefixed chunks and return the verdict."""
+        infected = False
+        tail = b''
+        while True:
+            size = struct.unpack('!L', self._read_exact(4))[0]
+            if size == 0:
+                break
+            chunk = self._read_exact(size)
+            # Keep a tail so a marker split across chunks is still found
+            infected = infected or EICAR_MARKER in tail + chunk
+            tail = chunk[-len(EICAR_MARKER):]
+        return f'stream: {EICAR_SIGNATURE} FOUND' if infected else 'stream: OK'
+
+    def _reply(self, text, request_id=None):
+        prefix = f'{request_id}: ' if request_id is not None else ''
+        self.request.sendall(f'{prefix}{text}\0'.encode())
+
+    def handle(self):
+        session = False
+        request_id = 0
+
+        try:
+            while True:
+                command = self._read_command()
+                if command is None:
+                    return
+
+                if command == 'IDSESSION':
+                    session = True
+                    continue
+                if command == 'END':
+                    return
+
+                request_id += 1
+                reply_id = request_id if session else None
+
+                if command == 'PING':
+                    self._reply('PONG', reply_id)
+                elif command == 'VERSION':
+                    self._reply('ClamAV stub', reply_id)
+                elif command == 'INSTREAM':
+                    self._reply(self._instream(), reply_id)
+                else:
+                    self._reply('UNKNOWN COMMAND ERROR', reply_id)
+
+                if not session:
+                    return
+        except ConnectionError:
+            return
+
+
+class ClamdStubServer(socketserver.ThreadingTCPServer):
+    """Threaded clamd stand-in."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=3310):
+        super().__init__((host, port), ClamdStubHandler)
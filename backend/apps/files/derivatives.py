@@ -0,0 +1,293 @@
+"""
+TruEditor - Image Derivatives
+=============================
+Web-sized previews and thumbnails of figure files.
+
+Figures arrive as multi-megabyte TIFF/PNG/JPEG files. After upload a
+Celery task (`generate_image_derivatives`) decodes the original once,
+at reduced scale where the format allows it (JPEG draft mode), and
+derives every size from that single decode, largest first. Each size is
+encoded as WebP and JPEG and stored next to the original:
+
+    blobs/ab/ab12...ef.tif  ->  blobs/ab/ab12...ef__thumbnail.webp
+                                blobs/ab/ab12...ef__preview.jpg
+
+Names depend only on the stored original, so files sharing a blob share
+their derivatives and existing ones are never encoded twice. The result
+is recorded in `ManuscriptFile.derivatives`.
+
+Sizes and formats: settings.IMAGE_DERIVATIVES / IMAGE_DERIVATIVE_FORMATS.
+
+Developer: Abdullah Dogan
+"""
+
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from apps.common import metrics
+from .local_serving import make_download_url
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_URL_KEY = 'derivative_url:{name}:{expiration}'
+
+FORMAT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class DerivativeError(Exception):
+    """The original could not be decoded as an image."""
+
+
+def wants_derivatives(manuscript_file):
+    """Check whether previews are generated for this file."""
+    return manuscript_file.file_type == manuscript_file.FileType.FIGURES and manuscript_file.is_image
+
+
+def derivative_name(source_name, variant, fmt):
+    """Return the storage name of one derivative of `source_name`."""
+    root = os.path.splitext(source_name)[0]
+    return f"{root}__{variant}.{FORMAT_EXTENSIONS[fmt]}"
+
+
+def derivative_names(source_name):
+    """Return the storage names every derivative of `source_name` would have."""
+    return [
+        derivative_name(source_name, variant, fmt)
+        for variant in settings.IMAGE_DERIVATIVES
+        for fmt in settings.IMAGE_DERIVATIVE_FORMATS
+    ]
+
+
+def delete_derivatives(source_name, storage):
+    """Delete every derivative of a stored original (missing ones are ignored)."""
+    for name in derivative_names(source_name):
+        try:
+            storage.delete(name)
+        except Exception as e:
+            logger.warning(f"Could not delete derivative of {source_name}: {str(e)}")
+
+
+def _target_size(size, width):
+    """Scale `size` to `width` (never upscales)."""
+    source_width, source_height = size
+    if source_width <= width:
+        return size
+    return width, max(1, round(source_height * width / source_width))
+
+
+def to_rgb(image):
+    """Convert any decoded mode to RGB (transparency on white, 16-bit scaled down)."""
+    if image.mode == 'RGB':
+        return image
+
+    if image.mode in ('I;16', 'I;16B', 'I;16L', 'I'):
+        image = image.convert('I').point(lambda value: value * (1 / 256)).convert('L')
+
+    if image.mode == 'P':
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    if image.mode in ('RGBA', 'LA', 'PA'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+
+    return image.convert('RGB')
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    quality = settings.IMAGE_DERIVATIVE_QUALITY
+    if fmt == 'jpeg':
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def generate(manuscript_file):
+    """
+    Create the missing derivatives of a file's stored original.
+
+    Args:
+        manuscript_file: ManuscriptFile with an image original
+
+    Returns:
+        dict: Value for `ManuscriptFile.derivatives`
+    """
+    source = manuscript_file.file.name
+    storage = manuscript_file.file.storage
+    formats = settings.IMAGE_DERIVATIVE_FORMATS
+
+    with storage.open(source, 'rb') as stored:
+        try:
+            image = Image.open(stored)
+            # Header only: the pixels are not decoded yet
+            orientation = image.getexif().get(0x0112)
+            size = image.size
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            raise DerivativeError(str(e))
+
+        if orientation in TRANSPOSED_ORIENTATIONS:
+            size = size[::-1]
+
+        # Largest first: smaller sizes are scaled from the previous one
+        targets = sorted(
+            ((variant, _target_size(size, width)) for variant, width in settings.IMAGE_DERIVATIVES.items()),
+            key=lambda target: target[1][0],
+            reverse=True
+        )
+        missing = [
+            variant for variant, _size in targets
+            if any(not storage.exists(derivative_name(source, variant, fmt)) for fmt in formats)
+        ]
+
+        if missing:
+            try:
+                with metrics.timer('image_derivative.decode'):
+                    # JPEG decodes directly at 1/2, 1/4 or 1/8 scale
+                    largest = targets[0][1][0]
+                    image.draft('RGB', (largest, largest))
+                    image.load()
+            except (Image.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+                raise DerivativeError(str(e))
+
+            ImageOps.exif_transpose(image, in_place=True)
+            current = to_rgb(image)
+
+            with metrics.timer('image_derivative.encode'):
+                for variant, target in targets:
+                    if current.size != target:
+                        # reduce() by integer factors first, then LANCZOS
+                        current = current.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+                    if variant not in missing:
+                        continue
+                    for fmt in formats:
+                        data = _encode(current, fmt)
+                        name = derivative_name(source, variant, fmt)
+                        saved = storage.save(name, ContentFile(data))
+                        if saved != name:
+                            # A concurrent run stored it first; keep that one
+                            storage.delete(saved)
+                        metrics.observe('image_derivative.bytes', len(data))
+
+    return {
+        'source': source,
+        'width': size[0],
+        'height': size[1],
+        'variants': {
+            variant: {
+                'width': target[0],
+                'height': target[1],
+                'files': {fmt: derivative_name(source, variant, fmt) for fmt in formats},
+            }
+            for variant, target in targets
+        },
+    }
+
+
+def schedule(manuscript_file):
+    """Queue derivative generation for a figure file."""
+    from .tasks import generate_image_derivatives
+
+    try:
+        generate_image_derivatives.delay(str(manuscript_file.pk))
+    except Exception as e:
+        # Previews are optional; the original stays downloadable
+        logger.warning(f"Could not schedule previews of file {manuscript_file.pk}: {str(e)}")
+
+
+def _current_variants(manuscript_file):
+    """Return the recorded variants if they belong to the current original."""
+    data = manuscript_file.derivatives or {}
+    # Derivatives of a replaced or quarantined original are stale
+    if manuscript_file.scan_status == manuscript_file.ScanStatus.INFECTED or data.get('source') != manuscript_file.file.name:
+        return None
+    return data.get('variants') or None
+
+
+def get_derivative_name(manuscript_file, variant, fmt):
+    """Return the storage name of one current derivative, or None."""
+    data = (_current_variants(manuscript_file) or {}).get(variant)
+    return data['files'].get(fmt) if data else None
+
+
+def _sign(storage, name, expiration):
+    try:
+        with metrics.timer('presigned_url.sign'):
+            return storage.url(name, expire=expiration)
+    except TypeError:
+        return storage.url(name)
+
+
+def get_preview_urls(files, expiration=900):
+    """
+    Return derivative URLs for many files with one cache round trip.
+
+    On S3 the signed URLs are cached like download URLs (see
+    ManuscriptFile.get_download_urls). On local storage they point at the
+    preview view with the file's download token. Files without current
+    derivatives (not generated yet, unreadable, quarantined) map to None.
+
+    Returns:
+        dict: {file_id: {variant: {"width", "height", "urls": {format: url}}} or None}
+    """
+    files = list(files)
+    result = {f.pk: _current_variants(f) for f in files}
+
+    names = {}
+    if settings.USE_S3:
+        for f in files:
+            for variant in (result[f.pk] or {}).values():
+                for name in variant['files'].values():
+                    names[name] = f.file.storage
+
+    # Served URLs also live on in the submission detail cache
+    cache_ttl = (
+        expiration
+        - settings.PRESIGNED_URL_MIN_VALIDITY
+        - settings.SUBMISSION_DETAIL_CACHE_TTL
+    )
+    cacheable = cache_ttl > 0
+    keys = {name: DERIVATIVE_URL_KEY.format(name=name, expiration=expiration) for name in names}
+    cached = cache.get_many(list(keys.values())) if cacheable and keys else {}
+
+    urls = {}
+    fresh = {}
+    for name, storage in names.items():
+        url = cached.get(keys[name])
+        if url is None:
+            url = _sign(storage, name, expiration)
+            fresh[keys[name]] = url
+        urls[name] = url
+
+    if cacheable and fresh:
+        cache.set_many(fresh, timeout=cache_ttl)
+
+    for f in files:
+        variants = result[f.pk]
+        if not variants:
+            continue
+        # Local storage: MEDIA_ROOT is not served; one token covers every preview of the file
+        base = None if settings.USE_S3 else make_download_url(f, expiration, view_name='file-preview')
+        result[f.pk] = {
+            variant: {
+                'width': data['width'],
+                'height': data['height'],
+                'urls': {
+                    fmt: urls[name] if base is None else f"{base}&variant={variant}&fmt={fmt}"
+                    for fmt, name in data['files'].items()
+                },
+            }
+            for variant, data in variants.items()
+        }
+
+    return result
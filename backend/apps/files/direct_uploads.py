@@ -0,0 +1,317 @@
+"""
+TruEditor - Direct-to-S3 Multipart Uploads
+==========================================
+The browser uploads file bytes straight to S3 / MinIO with presigned
+multipart-upload part URLs; the API only signs URLs and verifies the result.
+
+Flow:
+1. POST /files/uploads/?submission_id=  {"mode": "direct", ...}
+   -> CreateMultipartUpload, response lists presigned part URLs
+2. PUT  <part url>                      (browser -> bucket, ETag returned)
+3. POST /files/uploads/{id}/finalize/   {"parts": [{"part_number", "etag"}]}
+   -> ListParts (client ETags must match), CompleteMultipartUpload,
+      HeadObject (size, content type, multipart ETag), ranged GetObject of
+      the leading bytes (magic bytes must match the extension),
+      ManuscriptFile created; a failed check deletes the object
+4. hash_blob task computes the SHA-256 and deduplicates the content
+
+Only available when USE_S3 is on. Works with any S3-compatible endpoint
+(AWS_S3_ENDPOINT_URL), e.g. the MinIO service in docker-compose.yml.
+
+Developer: Abdullah Dogan
+"""
+
+import hashlib
+import logging
+import math
+import os
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from apps.common import metrics
+from .models import FileBlob, ManuscriptFile, UploadSession, blob_file_path
+from .upload_handlers import FILE_SIGNATURES, PDF_HEADER_WINDOW
+from .uploads import (
+    UploadChecksumError,
+    UploadSizeError,
+    UploadStateError,
+    check_content,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_PARTS = 10000  # S3 limit
+
+
+def is_available():
+    """Check whether direct uploads are possible (S3-compatible storage)."""
+    return settings.USE_S3 and hasattr(default_storage, 'bucket_name')
+
+
+def _client():
+    """Return the boto3 client of the default storage."""
+    return default_storage.connection.meta.client
+
+
+def _key(name):
+    """Return the bucket key of a storage name (applies AWS_LOCATION)."""
+    return default_storage._normalize_name(name)
+
+
+def _strip_etag(etag):
+    return (etag or '').strip().strip('"').lower()
+
+
+def part_count(session):
+    """Number of parts the upload is split into."""
+    return max(1, math.ceil(session.upload_length / settings.DIRECT_UPLOAD_PART_SIZE))
+
+
+def multipart_etag(part_etags):
+    """
+    Compute the ETag S3 reports for a completed multipart upload:
+    md5(concatenated binary part MD5s) + "-" + number of parts.
+    """
+    digest = hashlib.md5(b''.join(bytes.fromhex(etag) for etag in part_etags))
+    return f"{digest.hexdigest()}-{len(part_etags)}"
+
+
+def initiate(session):
+    """
+    Start the multipart upload for a direct session.
+
+    Args:
+        session: UploadSession in direct mode
+
+    Returns:
+        UploadSession: Session with storage key and multipart upload ID
+    """
+    if part_count(session) > MAX_PARTS:
+        raise UploadSizeError('File needs too many parts; increase DIRECT_UPLOAD_PART_SIZE.')
+
+    # Stored as blob content (see FileBlob)
+    name = blob_file_path(None, session.original_filename)
+
+    with metrics.timer('direct_upload.initiate'):
+        response = _client().create_multipart_upload(
+            Bucket=default_storage.bucket_name,
+            Key=_key(name),
+            ContentType=session.mime_type or 'application/octet-stream',
+        )
+
+    session.storage_key = name
+    session.multipart_upload_id = response['UploadId']
+    session.save(update_fields=['storage_key', 'multipart_upload_id', 'updated_at'])
+    return session
+
+
+def list_uploaded_parts(session):
+    """
+    List the parts S3 has received so far.
+
+    Returns:
+        dict: {part_number: {"etag", "size"}}
+    """
+    client = _client()
+    params = {
+        'Bucket': default_storage.bucket_name,
+        'Key': _key(session.storage_key),
+        'UploadId': session.multipart_upload_id,
+    }
+
+    parts = {}
+    while True:
+        response = client.list_parts(**params)
+        for part in response.get('Parts', []):
+            parts[part['PartNumber']] = {
+                'etag': _strip_etag(part['ETag']),
+                'size': part['Size'],
+            }
+        if not response.get('IsTruncated'):
+            return parts
+        params['PartNumberMarker'] = response['NextPartNumberMarker']
+
+
+def presign_parts(session, part_numbers=None):
+    """
+    Presign part upload URLs.
+
+    Args:
+        session: Active direct UploadSession
+        part_numbers: Parts to sign (default: all)
+
+    Returns:
+        list: [{"part_number", "url", "size"}]
+    """
+    if session.status != UploadSession.Status.ACTIVE:
+        raise UploadStateError('Upload session is not active.')
+
+    client = _client()
+    count = part_count(session)
+    part_size = settings.DIRECT_UPLOAD_PART_SIZE
+
+    urls = []
+    for number in part_numbers or range(1, count + 1):
+        if not 1 <= number <= count:
+            continue
+        with metrics.timer('direct_upload.sign_part'):
+            url = client.generate_presigned_url(
+                'upload_part',
+                Params={
+                    'Bucket': default_storage.bucket_name,
+                    'Key': _key(session.storage_key),
+                    'UploadId': session.multipart_upload_id,
+                    'PartNumber': number,
+                },
+                ExpiresIn=settings.DIRECT_UPLOAD_URL_EXPIRE,
+            )
+        urls.append({
+            'part_number': number,
+            'url': url,
+            'size': min(part_size, session.upload_length - (number - 1) * part_size),
+        })
+
+    return urls
+
+
+def complete(session, client_parts):
+    """
+    Complete and verify a direct upload, then create the ManuscriptFile.
+
+    Args:
+        session: Direct UploadSession
+        client_parts: [{"part_number", "etag"}] as returned by S3 to the browser
+
+    Returns:
+        ManuscriptFile: Created file
+    """
+    claimed = UploadSession.objects.filter(
+        pk=session.pk,
+        status=UploadSession.Status.ACTIVE
+    ).update(status=UploadSession.Status.FINALIZING, updated_at=timezone.now())
+
+    if not claimed:
+        raise UploadStateError('Upload is not active or already finalized.')
+
+    client = _client()
+    bucket = default_storage.bucket_name
+    key = _key(session.storage_key)
+    # Never the client's word: the type follows the extension
+    extension = os.path.splitext(session.original_filename)[1].lower().lstrip('.')
+    mime_type = FILE_SIGNATURES[extension][0]
+
+    try:
+        # 1. Every expected part is in the bucket and matches what the browser sent
+        stored = list_uploaded_parts(session)
+        expected_numbers = list(range(1, part_count(session) + 1))
+
+        if sorted(stored) != expected_numbers:
+            raise UploadSizeError('Some parts have not been uploaded yet.')
+
+        declared = {int(p['part_number']): _strip_etag(p['etag']) for p in client_parts}
+        if declared != {number: stored[number]['etag'] for number in expected_numbers}:
+            raise UploadChecksumError('Part ETags do not match the stored parts.')
+
+        if sum(part['size'] for part in stored.values()) != session.upload_length:
+            raise UploadSizeError('Uploaded size does not match the upload length.')
+
+        # 2. Assemble
+        with metrics.timer('direct_upload.complete'):
+            client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=key,
+                UploadId=session.multipart_upload_id,
+                MultipartUpload={'Parts': [
+                    {'PartNumber': number, 'ETag': f'"{stored[number]["etag"]}"'}
+                    for number in expected_numbers
+                ]},
+            )
+    except (UploadSizeError, UploadChecksumError, ClientError):
+        # Nothing assembled yet: the client can still upload / retry parts
+        UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.Status.ACTIVE)
+        raise
+
+    try:
+        # 3. Verify the assembled object
+        head = client.head_object(Bucket=bucket, Key=key)
+
+        if head['ContentLength'] != session.upload_length:
+            raise UploadSizeError('Stored object size does not match the upload length.')
+
+        if head.get('ContentType') != mime_type:
+            raise UploadChecksumError('Stored object content type does not match.')
+
+        expected_etag = multipart_etag([stored[number]['etag'] for number in expected_numbers])
+        if _strip_etag(head['ETag']) != expected_etag:
+            raise UploadChecksumError('Stored object ETag does not match the uploaded parts.')
+
+        # 4. The browser chose the bytes: they must match the extension
+        leading = client.get_object(
+            Bucket=bucket, Key=key, Range=f'bytes=0-{PDF_HEADER_WINDOW - 1}'
+        )['Body'].read()
+        check_content(session, leading)
+
+        instance = ManuscriptFile(
+            submission=session.submission,
+            uploaded_by=session.uploaded_by,
+            file_type=session.file_type,
+            original_filename=session.original_filename,
+            mime_type=mime_type,
+            description=session.description,
+            caption=session.caption,
+        )
+
+        with transaction.atomic():
+            # Object is already in the bucket; its SHA-256 is computed by
+            # a task (the bytes never passed through the API)
+            blob = FileBlob.register(
+                session.storage_key, None, session.upload_length, mime_type
+            )
+            instance.use_blob(blob)
+            instance.save()
+            session.status = UploadSession.Status.COMPLETED
+            session.offset = session.upload_length
+            session.manuscript_file = instance
+            session.save(update_fields=['status', 'offset', 'manuscript_file', 'updated_at'])
+    except Exception:
+        # The completed object cannot be trusted (or was not recorded)
+        try:
+            client.delete_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            logger.warning(f"Could not delete unverified object {key}: {str(e)}")
+        UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.Status.ABORTED)
+        raise
+
+    transaction.on_commit(lambda: _schedule_hash(blob.pk))
+    metrics.observe('direct_upload.bytes', session.upload_length)
+    return instance
+
+
+def _schedule_hash(blob_id):
+    """Queue SHA-256 computation (and deduplication) of a direct upload."""
+    from .tasks import hash_blob
+
+    try:
+        hash_blob.delay(str(blob_id))
+    except Exception as e:
+        # The blob stays usable; it is only not deduplicated
+        logger.warning(f"Could not schedule hashing of blob {blob_id}: {str(e)}")
+
+
+def abort(session):
+    """Abort the multipart upload so S3 drops the stored parts."""
+    if not session.multipart_upload_id:
+        return
+
+    try:
+        _client().abort_multipart_upload(
+            Bucket=default_storage.bucket_name,
+            Key=_key(session.storage_key),
+            UploadId=session.multipart_upload_id,
+        )
+    except ClientError as e:
+        logger.warning(f"Could not abort multipart upload {session.id}: {str(e)}")
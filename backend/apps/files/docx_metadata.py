@@ -0,0 +1,242 @@
+"""
+TruEditor - Word Document Metadata
+==================================
+Extracts title, abstract, keywords and counts from uploaded DOCX
+manuscripts so the submission wizard can pre-fill its fields.
+
+Uploading a main text or title page schedules `extract_document_metadata`
+after commit; the upload request never parses anything. Results are
+stored per content checksum (DocumentMetadata) and cached, so a document
+is parsed exactly once however often it is uploaded, and the wizard
+polls `GET /files/{id}/metadata/` until the status is `done`.
+
+The document body is walked once, in order (paragraphs and tables),
+reading the XML directly rather than building python-docx wrappers.
+
+Developer: Abdullah Dogan
+"""
+
+import logging
+import re
+
+from django.core.cache import cache
+from docx import Document
+from docx.oxml.ns import qn
+
+from apps.common import metrics
+
+logger = logging.getLogger(__name__)
+
+METADATA_CACHE_KEY = 'document_metadata:{sha256}'
+METADATA_CACHE_TIMEOUT = 24 * 3600
+
+ABSTRACT_LABELS = {'abstract', 'summary', 'özet', 'ozet'}
+REFERENCE_LABELS = {'references', 'reference list', 'bibliography', 'literature cited', 'kaynaklar', 'kaynakça'}
+# Unstyled section titles that end the abstract / reference list
+SECTION_LABELS = {
+    'introduction', 'background', 'methods', 'materials and methods', 'results',
+    'discussion', 'conclusion', 'conclusions', 'acknowledgements', 'acknowledgments',
+    'figure legends', 'tables', 'appendix', 'giriş', 'yöntem', 'gereç ve yöntem',
+    'bulgular', 'tartışma', 'sonuç', 'teşekkür',
+}
+
+LABEL_RE = re.compile(r'^\s*(?:\d+(?:\.\d+)*\.?\s+)?([^\W\d_][^:：.]{0,30}?)\s*[:：.]?\s*$')
+INLINE_ABSTRACT_RE = re.compile(r'^\s*(abstract|summary|özet)\s*[:：.\-–—]\s*(.+)$', re.IGNORECASE | re.DOTALL)
+KEYWORDS_RE = re.compile(
+    r'^\s*(key\s*words|keywords|anahtar\s+kelimeler|anahtar\s+sözcükler)\s*[:：.\-–—]?\s*(.*)$',
+    re.IGNORECASE | re.DOTALL
+)
+FIGURE_CAPTION_RE = re.compile(r'^\s*(figure|fig\.?|şekil)\s*(\d+)', re.IGNORECASE)
+TABLE_CAPTION_RE = re.compile(r'^\s*(table|tablo)\s*(\d+)', re.IGNORECASE)
+
+TAG_P = qn('w:p')
+TAG_TBL = qn('w:tbl')
+TAG_T = qn('w:t')
+TAG_PSTYLE = qn('w:pStyle')
+TAG_VAL = qn('w:val')
+DRAWING_TAGS = (qn('w:drawing'), qn('w:pict'))
+
+
+class DocumentMetadataError(Exception):
+    """The document could not be parsed."""
+
+
+def wants_metadata(manuscript_file):
+    """Check whether metadata is extracted from this file."""
+    return (
+        manuscript_file.file_type in (
+            manuscript_file.FileType.MAIN_TEXT,
+            manuscript_file.FileType.TITLE_PAGE,
+        )
+        and manuscript_file.file_extension == '.docx'
+    )
+
+
+def _text(element):
+    return ''.join(node.text or '' for node in element.iter(TAG_T)).strip()
+
+
+def _label(text):
+    """Return a short section label ("Abstract", "References:") lowercased, else None."""
+    match = LABEL_RE.match(text)
+    return match.group(1).strip().lower() if match else None
+
+
+def _split_keywords(text):
+    return [keyword.strip() for keyword in re.split(r'[,;·•]', text) if keyword.strip()]
+
+
+def extract(stream):
+    """
+    Parse a DOCX document.
+
+    Args:
+        stream: Readable, seekable binary file
+
+    Returns:
+        dict: title, abstract, keywords, word_count, figure_count,
+              table_count, reference_count
+    """
+    try:
+        document = Document(stream)
+    except Exception as e:
+        raise DocumentMetadataError(f"Not a readable DOCX file: {e}")
+
+    heading_styles = {
+        style.style_id for style in document.styles
+        if style.name and (style.name.startswith('Heading') or style.name == 'Title')
+    }
+    title_styles = {style.style_id for style in document.styles if style.name == 'Title'}
+
+    title = (document.core_properties.title or '').strip()
+    first_text = ''
+    abstract = []
+    keywords = []
+    section = None
+    word_count = 0
+    drawings = 0
+    tables = 0
+    references = 0
+    figure_numbers = set()
+    table_numbers = set()
+
+    for element in document.element.body.iterchildren():
+        if element.tag == TAG_TBL:
+            tables += 1
+            for paragraph in element.iter(TAG_P):
+                word_count += len(_text(paragraph).split())
+            continue
+
+        if element.tag != TAG_P:
+            continue
+
+        drawings += sum(1 for tag in DRAWING_TAGS for _node in element.iter(tag))
+        text = _text(element)
+        if not text:
+            continue
+
+        word_count += len(text.split())
+
+        style = element.find(f'.//{TAG_PSTYLE}')
+        style_id = style.get(TAG_VAL) if style is not None else None
+        label = _label(text)
+        is_heading = style_id in heading_styles or label in ABSTRACT_LABELS | REFERENCE_LABELS | SECTION_LABELS
+
+        if not title and style_id in title_styles:
+            title = text
+        if not first_text:
+            first_text = text
+
+        if figure_match := FIGURE_CAPTION_RE.match(text):
+            figure_numbers.add(int(figure_match.group(2)))
+        if table_match := TABLE_CAPTION_RE.match(text):
+            table_numbers.add(int(table_match.group(2)))
+
+        keyword_match = KEYWORDS_RE.match(text)
+        if keyword_match:
+            keywords = keywords or _split_keywords(keyword_match.group(2))
+            section = None
+            continue
+
+        if is_heading:
+            section = None
+            if label in ABSTRACT_LABELS and not abstract:
+                section = 'abstract'
+            elif label in REFERENCE_LABELS:
+                section = 'references'
+            continue
+
+        inline = INLINE_ABSTRACT_RE.match(text)
+        if inline and not abstract:
+            abstract.append(inline.group(2).strip())
+            section = 'abstract'
+        elif section == 'abstract':
+            abstract.append(text)
+        elif section == 'references':
+            references += 1
+
+    if not keywords and document.core_properties.keywords:
+        keywords = _split_keywords(document.core_properties.keywords)
+
+    return {
+        # Untitled documents usually start with the title
+        'title': (title or first_text)[:500],
+        'abstract': '\n\n'.join(abstract)[:5000],
+        'keywords': keywords[:20],
+        'word_count': word_count,
+        'figure_count': max(drawings, len(figure_numbers)),
+        'table_count': max(tables, len(table_numbers)),
+        'reference_count': references,
+    }
+
+
+def to_dict(record):
+    """Return a DocumentMetadata record as API data."""
+    return {
+        'status': record.status,
+        'title': record.title,
+        'abstract': record.abstract,
+        'keywords': record.keywords,
+        'word_count': record.word_count,
+        'figure_count': record.figure_count,
+        'table_count': record.table_count,
+        'reference_count': record.reference_count,
+        'error': record.error,
+    }
+
+
+def get_metadata(sha256):
+    """
+    Return the metadata of a document checksum (cached once final).
+
+    Returns:
+        dict: Metadata, or None if the document has not been picked up yet
+    """
+    from .models import DocumentMetadata
+
+    key = METADATA_CACHE_KEY.format(sha256=sha256)
+    data = cache.get(key)
+    if data is not None:
+        metrics.incr('document_metadata_cache.hit')
+        return data
+
+    metrics.incr('document_metadata_cache.miss')
+    record = DocumentMetadata.objects.filter(sha256=sha256).first()
+    if record is None:
+        return None
+
+    data = to_dict(record)
+    if record.status != DocumentMetadata.Status.PROCESSING:
+        cache.set(key, data, timeout=METADATA_CACHE_TIMEOUT)
+    return data
+
+
+def schedule(manuscript_file):
+    """Queue metadata extraction for a Word manuscript."""
+    from .tasks import extract_document_metadata
+
+    try:
+        extract_document_metadata.delay(str(manuscript_file.pk))
+    except Exception as e:
+        # The wizard falls back to manual entry
+        logger.warning(f"Could not schedule metadata extraction of file {manuscript_file.pk}: {str(e)}")
@@ -0,0 +1,318 @@
+"""
+TruEditor - Buffered Download Logging
+=====================================
+Download requests only append a small JSON entry to a buffer; entries
+are written to FileDownloadLog in large `bulk_create` batches, together
+with the per-file daily counts (FileDownloadDaily).
+
+Buffers:
+- Redis list (production, django-redis cache): one RPUSH per request.
+  Drained every minute by the `flush_download_logs` beat task.
+- Process-local queue (no Redis, e.g. development): drained by the
+  process itself every DOWNLOAD_LOG_FLUSH_INTERVAL seconds (checked on
+  each download, like apps.common.metrics) and at exit.
+
+Guarantees:
+- At-least-once: entries are read, written and committed before they are
+  trimmed from the buffer. A crash in between replays the batch; entries
+  carry their own UUID (the log primary key), so replayed rows are
+  skipped and daily counts are not incremented twice.
+- Loss window on crash: Redis mode loses only what Redis itself loses
+  (AOF `everysec`: about one second). Process-local mode loses at most
+  the entries of the last DOWNLOAD_LOG_FLUSH_INTERVAL seconds of the
+  crashed process (capped at DOWNLOAD_LOG_LOCAL_MAX_PENDING entries;
+  anything beyond is dropped and counted as `download_log.dropped`).
+- Log writes never fail a download.
+
+Developer: Abdullah Dogan
+"""
+
+import atexit
+import ipaddress
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.common import metrics
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = 'download_log:buffer'
+FLUSH_LOCK_KEY = 'download_log:flush_lock'
+FLUSH_LOCK_TIMEOUT = 600
+
+
+# ============================================
+# BUFFERS
+# ============================================
+
+class RedisBuffer:
+    """Shared Redis list; survives web and worker restarts."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def push(self, entries):
+        self.connection.rpush(BUFFER_KEY, *entries)
+
+    def peek(self, count):
+        return [entry.decode() for entry in self.connection.lrange(BUFFER_KEY, 0, count - 1)]
+
+    def ack(self, count):
+        self.connection.ltrim(BUFFER_KEY, count, -1)
+
+    def __len__(self):
+        return self.connection.llen(BUFFER_KEY)
+
+
+class LocalBuffer:
+    """In-process queue, flushed by the process that filled it."""
+
+    def __init__(self):
+        self._entries = deque()
+        self._lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def push(self, entries):
+        with self._lock:
+            room = settings.DOWNLOAD_LOG_LOCAL_MAX_PENDING - len(self._entries)
+            if room < len(entries):
+                metrics.incr('download_log.dropped', len(entries) - max(room, 0))
+            self._entries.extend(entries[:max(room, 0)])
+
+    def peek(self, count):
+        with self._lock:
+            return [self._entries[i] for i in range(min(count, len(self._entries)))]
+
+    def ack(self, count):
+        with self._lock:
+            for _ in range(min(count, len(self._entries))):
+                self._entries.popleft()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_due(self):
+        return bool(self._entries) and (
+            time.monotonic() - self.last_flush >= settings.DOWNLOAD_LOG_FLUSH_INTERVAL
+        )
+
+
+_local_buffer = LocalBuffer()
+_local_flush_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the Redis buffer if the cache is django-redis, else the local one."""
+    if 'django_redis' in settings.CACHES['default']['BACKEND']:
+        from django_redis import get_redis_connection
+        return RedisBuffer(get_redis_connection('default'))
+    return _local_buffer
+
+
+# ============================================
+# RECORDING
+# ============================================
+
+def _entry(manuscript_file, request):
+    return json.dumps({
+        'id': uuid.uuid4().hex,
+        'file': str(manuscript_file.pk),
+        'user': str(request.user.pk) if request.user.is_authenticated else None,
+        'ip': request.META.get('REMOTE_ADDR') or None,
+        'ua': request.META.get('HTTP_USER_AGENT', '')[:500],
+        'at': timezone.now().isoformat(),
+    })
+
+
+def record(files, request):
+    """
+    Buffer one download log entry per file.
+
+    Args:
+        files: ManuscriptFile instances handed out to the client
+        request: Request that asked for them
+    """
+    entries = [_entry(f, request) for f in files]
+    if not entries:
+        return
+
+    try:
+        buffer = get_buffer()
+        buffer.push(entries)
+        metrics.incr('download_log.buffered', len(entries))
+    except Exception as e:
+        logger.warning(f"Download log buffering failed: {str(e)}")
+        return
+
+    if buffer is _local_buffer and buffer.is_due():
+        flush()
+
+
+# ============================================
+# FLUSHING
+# ============================================
+
+def _parse(raw):
+    """
+    Decode and validate one buffered entry.
+
+    Returns:
+        dict: Entry with UUIDs, IP address and timestamp already parsed
+
+    Raises:
+        ValueError, KeyError, TypeError, AttributeError: Malformed entry
+    """
+    data = json.loads(raw)
+    return {
+        'id': uuid.UUID(data['id']),
+        'file': uuid.UUID(data['file']),
+        'user': uuid.UUID(data['user']) if data['user'] else None,
+        'ip': str(ipaddress.ip_address(data['ip'])) if data['ip'] else None,
+        'ua': str(data['ua'])[:500],
+        'at': datetime.fromisoformat(data['at']),
+    }
+
+
+def _write(raw_entries):
+    """
+    Insert a batch of entries and update daily counts (one transaction).
+
+    Returns:
+        int: Rows inserted (replayed and orphaned entries are skipped)
+    """
+    from django.contrib.auth import get_user_model
+    from .models import FileDownloadDaily, FileDownloadLog, ManuscriptFile
+
+    User = get_user_model()
+
+    entries = []
+    for raw in raw_entries:
+        try:
+            entries.append(_parse(raw))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            # Dropped (and acked with the batch): it would fail every flush
+            logger.warning(f"Skipping malformed download log entry: {str(e)}")
+            metrics.incr('download_log.malformed')
+
+    if not entries:
+        return 0
+
+    with transaction.atomic():
+        existing = set(FileDownloadLog.objects.filter(
+            id__in=[e['id'] for e in entries]
+        ).values_list('id', flat=True))
+        # Files hard-deleted since the download have no log to attach to
+        live_files = set(ManuscriptFile.objects.filter(
+            id__in={e['file'] for e in entries}
+        ).values_list('id', flat=True))
+        live_users = set(User.objects.filter(
+            pk__in={e['user'] for e in entries if e['user']}
+        ).values_list('pk', flat=True))
+
+        logs = []
+        for e in entries:
+            if e['id'] in existing or e['file'] not in live_files:
+                continue
+            logs.append(FileDownloadLog(
+                id=e['id'],
+                file_id=e['file'],
+                downloaded_by_id=e['user'] if e['user'] in live_users else None,
+                ip_address=e['ip'],
+                user_agent=e['ua'],
+                created_at=e['at'],
+            ))
+
+        FileDownloadLog.objects.bulk_create(logs, batch_size=1000)
+
+        counts = Counter((log.file_id, timezone.localdate(log.created_at)) for log in logs)
+        if counts:
+            rows = {
+                (row.file_id, row.date): row
+                for row in FileDownloadDaily.objects.select_for_update().filter(
+                    file_id__in={file_id for file_id, _date in counts},
+                    date__in={date for _file_id, date in counts}
+                )
+            }
+            updated, created = [], []
+            for (file_id, date), count in counts.items():
+                row = rows.get((file_id, date))
+                if row is None:
+                    created.append(FileDownloadDaily(file_id=file_id, date=date, count=count))
+                else:
+                    row.count += count
+                    updated.append(row)
+            FileDownloadDaily.objects.bulk_update(updated, ['count'], batch_size=1000)
+            FileDownloadDaily.objects.bulk_create(created, batch_size=1000)
+
+    return len(logs)
+
+
+def flush(batch_size=None, max_batches=50):
+    """
+    Drain the buffer into the database.
+
+    Only one flusher runs at a time (cache lock in Redis mode, thread
+    lock in local mode); a batch is trimmed from the buffer only after
+    its transaction has committed.
+
+    Args:
+        batch_size: Entries per bulk_create (default DOWNLOAD_LOG_BATCH_SIZE)
+        max_batches: Upper bound per call so one run cannot monopolise a worker
+
+    Returns:
+        int: Rows inserted
+    """
+    batch_size = batch_size or settings.DOWNLOAD_LOG_BATCH_SIZE
+    buffer = get_buffer()
+    local = buffer is _local_buffer
+
+    if local:
+        if not _local_flush_lock.acquire(blocking=False):
+            return 0
+    elif not cache.add(FLUSH_LOCK_KEY, '1', timeout=FLUSH_LOCK_TIMEOUT):
+        return 0
+
+    inserted = 0
+    try:
+        for _ in range(max_batches):
+            batch = buffer.peek(batch_size)
+            if not batch:
+                break
+
+            with metrics.timer('download_log.flush'):
+                inserted += _write(batch)
+            buffer.ack(len(batch))
+
+            if len(batch) < batch_size:
+                break
+    except Exception as e:
+        # Entries stay buffered and are retried by the next flush
+        logger.error(f"Download log flush failed: {str(e)}")
+    finally:
+        if local:
+            _local_buffer.last_flush = time.monotonic()
+            _local_flush_lock.release()
+        else:
+            cache.delete(FLUSH_LOCK_KEY)
+
+    if inserted:
+        metrics.incr('download_log.written', inserted)
+    return inserted
+
+
+def _flush_at_exit():
+    if len(_local_buffer):
+        flush()
+
+
+atexit.register(_flush_at_exit)
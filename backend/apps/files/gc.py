@@ -0,0 +1,260 @@
+"""
+TruEditor - File Garbage Collection
+===================================
+Reclaims storage that no row needs any more:
+
+1. Soft-deleted files (`is_active=False`) untouched for
+   FILE_GC_RETENTION_DAYS: rows are purged in chunks; their blobs are
+   released and the content is deleted with the last reference.
+2. Orphaned objects: anything under the managed prefixes that no row
+   references and that is older than FILE_GC_ORPHAN_GRACE_HOURS (so
+   in-flight uploads are never touched). This covers `temp/` uploads
+   without a submission, objects of deleted draft submissions (the
+   cascade removes the rows, not the legacy objects), blobs left by
+   interrupted uploads, derivatives of deleted originals, quarantined
+   content and stale upload parts.
+
+Storage deletes are batched: S3 `DeleteObjects` with up to 1000 keys per
+call, or plain file removal on local storage. Each row chunk commits
+before its objects are deleted, so a crash leaves at most orphaned
+objects, which the next run collects.
+
+`dry_run=True` reports what would be reclaimed without changing anything.
+
+Developer: Abdullah Dogan
+"""
+
+import logging
+import os
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from apps.common import metrics
+from .derivatives import FORMAT_EXTENSIONS
+from .models import FileBlob, ManuscriptFile, UploadSession, deferred_storage_deletes
+
+logger = logging.getLogger(__name__)
+
+MANAGED_PREFIXES = ['temp/', 'submissions/', 'blobs/', 'quarantine/', 'uploads/']
+S3_DELETE_BATCH = 1000  # DeleteObjects limit
+
+DERIVATIVE_RE = re.compile(
+    r'^(?P<root>.+)__[a-z0-9_]+\.(?:%s)$' % '|'.join(sorted(set(FORMAT_EXTENSIONS.values())))
+)
+UPLOAD_PART_RE = re.compile(r'^uploads/(?P<session>[0-9a-f-]{36})/')
+# Originals that can have derivatives (ManuscriptFile.is_image), stored with either case
+IMAGE_EXTENSIONS = [
+    ext for ext in ('.jpg', '.jpeg', '.png', '.gif', '.tiff', '.tif', '.bmp') for ext in (ext, ext.upper())
+]
+
+
+def _is_s3(storage):
+    return hasattr(storage, 'bucket_name')
+
+
+# ============================================
+# STORAGE
+# ============================================
+
+def iter_objects(storage, prefix):
+    """
+    List stored objects under a prefix.
+
+    Yields:
+        tuple: (name, size, last_modified)
+    """
+    if _is_s3(storage):
+        location = storage.location.strip('/')
+        strip = len(location) + 1 if location else 0
+        paginator = storage.connection.meta.client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=storage.bucket_name, Prefix=storage._normalize_name(prefix))
+        for page in pages:
+            for item in page.get('Contents', []):
+                yield item['Key'][strip:], item['Size'], item['LastModified']
+        return
+
+    root = storage.path(prefix)
+    for directory, _dirs, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+            yield name, stat.st_size, datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+
+
+def delete_objects(storage, names):
+    """
+    Delete stored objects in batches.
+
+    Returns:
+        tuple: (deleted count, failed names)
+    """
+    names = list(dict.fromkeys(names))
+    failed = []
+
+    if _is_s3(storage):
+        client = storage.connection.meta.client
+        for start in range(0, len(names), S3_DELETE_BATCH):
+            batch = names[start:start + S3_DELETE_BATCH]
+            keys = {storage._normalize_name(name): name for name in batch}
+            with metrics.timer('file_gc.delete_objects'):
+                response = client.delete_objects(
+                    Bucket=storage.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True},
+                )
+            for error in response.get('Errors', []):
+                logger.warning(f"GC: could not delete {error['Key']}: {error.get('Message')}")
+                failed.append(keys.get(error['Key'], error['Key']))
+        return len(names) - len(failed), failed
+
+    deleted = 0
+    for name in names:
+        try:
+            if storage.exists(name):
+                storage.delete(name)
+                deleted += 1
+        except OSError as e:
+            logger.warning(f"GC: could not delete {name}: {str(e)}")
+            failed.append(name)
+    return deleted, failed
+
+
+# ============================================
+# COLLECTION
+# ============================================
+
+def purge_soft_deleted(stats, dry_run=False, batch_size=None):
+    """Purge soft-deleted files past the retention window."""
+    batch_size = batch_size or settings.FILE_GC_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=settings.FILE_GC_RETENTION_DAYS)
+    expired = ManuscriptFile.objects.filter(is_active=False, updated_at__lt=cutoff).order_by('pk')
+
+    if dry_run:
+        rows = list(expired.values_list('file_size', 'blob__ref_count', 'blob_id'))
+        stats['files_purged'] += len(rows)
+        # Shared content is only reclaimed when no other file holds it
+        stats['bytes_reclaimed'] += sum(
+            size for size, ref_count, blob_id in rows if not blob_id or ref_count <= 1
+        )
+        return
+
+    while True:
+        chunk = list(expired.select_related('blob')[:batch_size])
+        if not chunk:
+            return
+
+        collected = []
+        token = deferred_storage_deletes.set(collected)
+        try:
+            with transaction.atomic():
+                for instance in chunk:
+                    # Legacy files without a blob own their object
+                    if instance.file and not instance.blob_id:
+                        collected.append((instance.file.name, instance.file_size))
+                # Blobs are released by the post_delete signal (into `collected`)
+                ManuscriptFile.objects.filter(pk__in=[f.pk for f in chunk]).delete()
+        finally:
+            deferred_storage_deletes.reset(token)
+
+        deleted, failed = delete_objects(default_storage, [name for name, _size in collected])
+        failed = set(failed)
+        stats['files_purged'] += len(chunk)
+        stats['objects_deleted'] += deleted
+        stats['errors'] += len(failed)
+        stats['bytes_reclaimed'] += sum(size for name, size in collected if name not in failed)
+
+
+def _referenced(names):
+    """Return the subset of storage names still referenced by a row."""
+    candidates = set()
+    for name in names:
+        match = DERIVATIVE_RE.match(name)
+        if match:
+            # A derivative lives as long as its original
+            candidates.update(match.group('root') + ext for ext in IMAGE_EXTENSIONS)
+        candidates.add(name)
+
+    referenced = set(ManuscriptFile.objects.filter(file__in=candidates).values_list('file', flat=True))
+    referenced |= set(FileBlob.objects.filter(file__in=candidates).values_list('file', flat=True))
+
+    sessions = {m.group('session') for m in map(UPLOAD_PART_RE.match, names) if m}
+    live_sessions = {
+        str(pk) for pk in UploadSession.objects.filter(
+            pk__in=sessions,
+            status__in=[UploadSession.Status.ACTIVE, UploadSession.Status.FINALIZING]
+        ).values_list('pk', flat=True)
+    }
+
+    result = set()
+    for name in names:
+        match = DERIVATIVE_RE.match(name)
+        session = UPLOAD_PART_RE.match(name)
+        if name in referenced:
+            result.add(name)
+        elif match and any(match.group('root') + ext in referenced for ext in IMAGE_EXTENSIONS):
+            result.add(name)
+        elif session and session.group('session') in live_sessions:
+            result.add(name)
+    return result
+
+
+def collect_orphans(stats, dry_run=False, batch_size=None):
+    """Delete stored objects no row references."""
+    batch_size = batch_size or settings.FILE_GC_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(hours=settings.FILE_GC_ORPHAN_GRACE_HOURS)
+
+    def sweep(batch):
+        referenced = _referenced(list(batch))
+        orphans = {name: size for name, size in batch.items() if name not in referenced}
+        if not orphans:
+            return
+        if dry_run:
+            deleted, failed = len(orphans), []
+        else:
+            deleted, failed = delete_objects(default_storage, list(orphans))
+        stats['orphans_deleted'] += deleted
+        stats['objects_deleted'] += 0 if dry_run else deleted
+        stats['errors'] += len(failed)
+        stats['bytes_reclaimed'] += sum(size for name, size in orphans.items() if name not in failed)
+
+    for prefix in MANAGED_PREFIXES:
+        batch = {}
+        for name, size, modified in iter_objects(default_storage, prefix):
+            if modified >= cutoff:
+                continue
+            batch[name] = size
+            if len(batch) >= batch_size:
+                sweep(batch)
+                batch = {}
+        if batch:
+            sweep(batch)
+
+
+def collect_garbage(dry_run=False):
+    """
+    Run a full garbage collection pass.
+
+    Args:
+        dry_run: Only report what would be reclaimed
+
+    Returns:
+        dict: files_purged, orphans_deleted, objects_deleted, bytes_reclaimed, errors
+    """
+    stats = {'files_purged': 0, 'orphans_deleted': 0, 'objects_deleted': 0, 'bytes_reclaimed': 0, 'errors': 0}
+
+    with metrics.timer('file_gc.run'):
+        purge_soft_deleted(stats, dry_run=dry_run)
+        collect_orphans(stats, dry_run=dry_run)
+
+    if not dry_run:
+        metrics.incr('file_gc.files_purged', stats['files_purged'])
+        metrics.incr('file_gc.objects_deleted', stats['objects_deleted'])
+        metrics.incr('file_gc.bytes_reclaimed', stats['bytes_reclaimed'])
+        metrics.incr('file_gc.errors', stats['errors'])
+
+    return stats
@@ -0,0 +1,226 @@
+"""
+TruEditor - Local Storage Downloads
+===================================
+Authenticated file downloads when files live on local storage
+(USE_S3=false). Download URLs point at `GET /files/{id}/content/` with a
+signed, expiring token (the local counterpart of an S3 presigned URL),
+so links work from <a href> and <img> without an Authorization header.
+Image previews use the same token at `GET /files/{id}/preview/`;
+MEDIA_ROOT itself is never served directly.
+
+The bytes are never copied through Python when a web server is in front:
+- LOCAL_FILE_SERVER=nginx:  X-Accel-Redirect to LOCAL_FILE_ACCEL_PREFIX
+  (an `internal` location aliased to MEDIA_ROOT)
+- LOCAL_FILE_SERVER=apache: X-Sendfile with the absolute path
+  (mod_xsendfile, lighttpd)
+- LOCAL_FILE_SERVER=django: FileResponse; gunicorn hands it to
+  sendfile(2). Single byte ranges (resumed downloads, PDF viewers) and
+  conditional requests (ETag / If-None-Match, If-Range) are handled here.
+
+nginx example:
+    location /protected-media/ {
+        internal;
+        alias /app/media/;
+    }
+
+Developer: Abdullah Dogan
+"""
+
+import io
+import mimetypes
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+TOKEN_SALT = 'files.local_download'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def make_download_url(manuscript_file, expiration=900, view_name='file-content'):
+    """
+    Return a signed content URL valid for `expiration` seconds.
+    
+    `view_name` is the content view taking the object's pk (generated
+    submission PDFs use the same tokens).
+    """
+    token = signing.dumps(
+        {'f': str(manuscript_file.pk), 'e': int(time.time()) + expiration},
+        salt=TOKEN_SALT,
+        compress=True
+    )
+    return f"{reverse(view_name, args=[manuscript_file.pk])}?token={token}"
+
+
+def check_token(token, manuscript_file):
+    """Check that a token was issued for this file and has not expired."""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        return False
+    return payload.get('f') == str(manuscript_file.pk) and payload.get('e', 0) >= time.time()
+
+
+class _RangeFile(io.RawIOBase):
+    """
+    Read at most `length` bytes from `start` of a file.
+
+    Exposes the real file descriptor (positioned at `start`) so
+    wsgi.file_wrapper implementations can still use sendfile(2), bounded
+    by Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        super().__init__()
+        self._file = file
+        self._remaining = length
+        file.seek(start)
+
+    def readable(self):
+        return True
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            return 0
+        data = self._file.read(min(len(buffer), self._remaining))
+        size = len(data)
+        buffer[:size] = data
+        self._remaining -= size
+        return size
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _etag(checksum, stat):
+    # Blob content is addressed by SHA-256; legacy files fall back to size + mtime
+    if checksum:
+        return quote_etag(checksum)
+    return quote_etag(f"{stat.st_size:x}-{int(stat.st_mtime):x}")
+
+
+def _parse_range(header, size):
+    """
+    Parse a single `bytes=` range.
+
+    Returns:
+        tuple: (start, end) inclusive, None to send the whole file,
+               or False if the range is unsatisfiable
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        # Absent, malformed or multi-range: full response is allowed
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def serve(request, manuscript_file):
+    """
+    Build the download response for a locally stored file.
+    """
+    path = manuscript_file.file.path
+    filename = manuscript_file.original_filename or os.path.basename(path)
+    return _serve(
+        request,
+        manuscript_file.file.name,
+        path,
+        filename=filename,
+        content_type=manuscript_file.mime_type or mimetypes.guess_type(filename)[0],
+        checksum=manuscript_file.checksum,
+        as_attachment=True
+    )
+
+
+def serve_derivative(request, manuscript_file, name):
+    """
+    Build the response for a locally stored preview of a file (inline,
+    so it can be used as an <img> source).
+    """
+    return _serve(
+        request,
+        name,
+        manuscript_file.file.storage.path(name),
+        filename=os.path.basename(name),
+        content_type=mimetypes.guess_type(name)[0],
+        checksum=None,
+        as_attachment=False
+    )
+
+
+def _serve(request, name, path, filename, content_type, checksum, as_attachment):
+    stat = os.stat(path)
+    etag = _etag(checksum, stat)
+    content_type = content_type or 'application/octet-stream'
+
+    def common_headers(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = 'private, max-age=3600'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        return common_headers(HttpResponseNotModified())
+
+    disposition = content_disposition_header(as_attachment=as_attachment, filename=filename)
+
+    server = settings.LOCAL_FILE_SERVER
+    if server in ('nginx', 'apache'):
+        # The web server streams the file (and handles Range itself)
+        response = HttpResponse(content_type=content_type)
+        if server == 'nginx':
+            response['X-Accel-Redirect'] = f"{settings.LOCAL_FILE_ACCEL_PREFIX}{name}"
+        else:
+            response['X-Sendfile'] = path
+        response['Content-Disposition'] = disposition
+        return common_headers(response)
+
+    byte_range = _parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+
+    # If-Range: only honour the range for the current representation
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if byte_range and if_range and if_range.strip() != etag:
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{stat.st_size}"
+        return common_headers(response)
+
+    source = open(path, 'rb')
+
+    if byte_range is None:
+        response = FileResponse(source, content_type=content_type)
+        response['Content-Length'] = stat.st_size
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(_RangeFile(source, start, length), status=206, content_type=content_type)
+        response['Content-Length'] = length
+        response['Content-Range'] = f"bytes {start}-{end}/{stat.st_size}"
+
+    response['Content-Disposition'] = disposition
+    return common_headers(response)
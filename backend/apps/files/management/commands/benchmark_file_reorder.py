@@ -0,0 +1,99 @@
+"""
+TruEditor - File Reorder Benchmark
+==================================
+Measures the number of queries and time needed to reorder N files.
+Runs inside a transaction that is rolled back, so no data is kept.
+
+Usage:
+    python manage.py benchmark_file_reorder --sizes 10 50 100
+
+Developer: Abdullah Dogan
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.files.models import ManuscriptFile
+from apps.files.serializers import FileReorderSerializer
+from apps.submissions.models import Submission
+from apps.users.models import User
+
+
+class _Rollback(Exception):
+    """Raised to roll back the benchmark transaction."""
+
+
+class Command(BaseCommand):
+    """
+    Benchmark FileReorderSerializer for increasing numbers of figures.
+    """
+    
+    help = 'Benchmark file reorder query count for increasing file counts.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 50, 100],
+            help='Number of files to reorder'
+        )
+    
+    def handle(self, *args, **options):
+        results = []
+        
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(orcid_id='0000-0000-0000-000X')
+                
+                for size in options['sizes']:
+                    submission = Submission.objects.create(
+                        submitter=user, title='Reorder benchmark', abstract='-'
+                    )
+                    # bulk_create skips save(), so no real files are needed
+                    files = ManuscriptFile.objects.bulk_create([
+                        ManuscriptFile(
+                            submission=submission,
+                            file=f'benchmark/figure_{i}.png',
+                            file_type=ManuscriptFile.FileType.FIGURES,
+                            original_filename=f'figure_{i}.png',
+                            order=i,
+                        )
+                        for i in range(1, size + 1)
+                    ])
+                    file_ids = [f.id for f in files]
+                    random.shuffle(file_ids)
+                    
+                    started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as queries:
+                        serializer = FileReorderSerializer(
+                            data={'file_ids': file_ids},
+                            context={'submission': submission}
+                        )
+                        serializer.is_valid(raise_exception=True)
+                        reordered = serializer.save()
+                    elapsed = (time.perf_counter() - started) * 1000
+                    
+                    if [f.id for f in reordered] != file_ids:
+                        raise CommandError(f'Wrong order after reordering {size} files.')
+                    
+                    # Savepoint statements are bookkeeping, not work
+                    statements = [
+                        q for q in queries.captured_queries
+                        if 'SAVEPOINT' not in q['sql'].upper()
+                    ]
+                    results.append((size, len(statements), elapsed))
+                
+                raise _Rollback()
+        except _Rollback:
+            pass
+        
+        self.stdout.write(f"{'Files':>6} {'Queries':>8} {'Time (ms)':>10}")
+        for size, query_count, elapsed in results:
+            self.stdout.write(f"{size:>6} {query_count:>8} {elapsed:>10.2f}")
+        
+        if len({query_count for _, query_count, _ in results}) > 1:
+            raise CommandError('Query count depends on the number of files.')
+        
+        self.stdout.write(self.style.SUCCESS('OK: constant number of queries.'))
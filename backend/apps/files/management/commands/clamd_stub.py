@@ -0,0 +1,40 @@
+"""
+TruEditor - clamd Stand-in Command
+==================================
+Runs the clamd-compatible stub server for local virus-scan testing.
+
+Usage:
+    python manage.py clamd_stub --port 3310
+    # then: VIRUS_SCAN_ENABLED=true CLAMD_HOST=127.0.0.1 celery -A core worker
+
+Developer: Abdullah Dogan
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.files.clamd_stub import ClamdStubServer
+
+
+class Command(BaseCommand):
+    """
+    Serve the clamd stub until interrupted.
+    """
+
+    help = 'Run a minimal clamd-compatible server (flags only the EICAR test file).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=3310, help='Port (default: 3310)')
+
+    def handle(self, *args, **options):
+        server = ClamdStubServer(options['host'], options['port'])
+        self.stdout.write(self.style.SUCCESS(
+            f"clamd stub listening on {options['host']}:{options['port']}"
+        ))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,38 @@
+"""
+TruEditor - File Garbage Collection Command
+===========================================
+Runs the file garbage collector once (normally a daily Celery Beat task).
+
+Usage:
+    python manage.py gc_files --dry-run
+    python manage.py gc_files
+
+Developer: Abdullah Dogan
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.files.gc import collect_garbage
+
+
+class Command(BaseCommand):
+    """
+    Purge expired soft-deleted files and orphaned storage objects.
+    """
+
+    help = 'Delete soft-deleted files past retention and storage objects no row references.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be reclaimed')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        stats = collect_garbage(dry_run=dry_run)
+
+        prefix = 'Would reclaim' if dry_run else 'Reclaimed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {stats['bytes_reclaimed']} bytes: "
+            f"{stats['files_purged']} soft-deleted file(s), {stats['orphans_deleted']} orphaned object(s)"
+        ))
+        if stats['errors']:
+            self.stdout.write(self.style.WARNING(f"{stats['errors']} object(s) could not be deleted"))
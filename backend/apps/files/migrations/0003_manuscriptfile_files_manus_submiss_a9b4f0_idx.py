@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0002_alter_filedownloadlog_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='manuscriptfile',
+            index=models.Index(fields=['submission', '-created_at', '-id'], name='files_manus_submiss_a9b4f0_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:04
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0003_manuscriptfile_files_manus_submiss_a9b4f0_idx'),
+        ('submissions', '0005_author_unique_corresponding_author_per_submission'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file_type', models.CharField(choices=[('main_text', 'Main Text'), ('cover_letter', 'Cover Letter'), ('title_page', 'Title Page'), ('abstract', 'Abstract'), ('tables', 'Tables'), ('figures', 'Figures'), ('supplementary', 'Supplementary Files'), ('ethics_approval', 'Ethics Approval Document'), ('copyright', 'Copyright Form'), ('revision', 'Revision File'), ('revision_notes', 'Revision Notes'), ('other', 'Other')], default='other', max_length=30, verbose_name='File Type')),
+                ('original_filename', models.CharField(max_length=255, verbose_name='Original Filename')),
+                ('mime_type', models.CharField(blank=True, max_length=100, verbose_name='MIME Type')),
+                ('description', models.CharField(blank=True, max_length=500, verbose_name='Description')),
+                ('caption', models.TextField(blank=True, verbose_name='Caption')),
+                ('upload_length', models.PositiveBigIntegerField(help_text='Declared total size in bytes', verbose_name='Upload Length')),
+                ('offset', models.PositiveBigIntegerField(default=0, help_text='Bytes received so far', verbose_name='Offset')),
+                ('parts', models.JSONField(blank=True, default=list, help_text='Stored chunk objects as [offset, storage name, size]', verbose_name='Parts')),
+                ('status', models.CharField(choices=[('active', 'Active'), ('finalizing', 'Finalizing'), ('completed', 'Completed'), ('aborted', 'Aborted')], db_index=True, default='active', max_length=20, verbose_name='Status')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expires At')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('manuscript_file', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_session', to='files.manuscriptfile', verbose_name='Manuscript File')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='submissions.submission', verbose_name='Submission')),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL, verbose_name='Uploaded By')),
+            ],
+            options={
+                'verbose_name': 'Upload Session',
+                'verbose_name_plural': 'Upload Sessions',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
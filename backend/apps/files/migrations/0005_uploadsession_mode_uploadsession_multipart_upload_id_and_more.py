@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0004_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='mode',
+            field=models.CharField(choices=[('chunked', 'Chunked (through API)'), ('direct', 'Direct to storage')], default='chunked', max_length=20, verbose_name='Mode'),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='multipart_upload_id',
+            field=models.CharField(blank=True, max_length=1024, verbose_name='Multipart Upload ID'),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='storage_key',
+            field=models.CharField(blank=True, help_text='Target object name of a direct upload', max_length=500, verbose_name='Storage Key'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:10
+
+import apps.files.models
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0005_uploadsession_mode_uploadsession_multipart_upload_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileBlob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sha256', models.CharField(blank=True, help_text='Content hash (empty until computed for direct uploads)', max_length=64, null=True, unique=True, verbose_name='SHA-256')),
+                ('file', models.FileField(max_length=255, upload_to=apps.files.models.blob_file_path, verbose_name='File')),
+                ('size', models.PositiveBigIntegerField(default=0, help_text='Size in bytes', verbose_name='Size')),
+                ('mime_type', models.CharField(blank=True, max_length=100, verbose_name='MIME Type')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Reference Count')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+            ],
+            options={
+                'verbose_name': 'File Blob',
+                'verbose_name_plural': 'File Blobs',
+            },
+        ),
+        migrations.AddField(
+            model_name='manuscriptfile',
+            name='blob',
+            field=models.ForeignKey(blank=True, help_text='Shared stored content (released on hard delete)', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='manuscript_files', to='files.fileblob', verbose_name='Blob'),
+        ),
+    ]
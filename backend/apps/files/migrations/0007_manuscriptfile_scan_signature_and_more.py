@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0006_fileblob_manuscriptfile_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manuscriptfile',
+            name='scan_signature',
+            field=models.CharField(blank=True, help_text='Signature reported for infected files', max_length=255, verbose_name='Scan Signature'),
+        ),
+        migrations.AddField(
+            model_name='manuscriptfile',
+            name='scan_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('scanning', 'Scanning'), ('clean', 'Clean'), ('infected', 'Infected (quarantined)')], db_index=True, default='pending', help_text='Result of the background virus scan', max_length=20, verbose_name='Scan Status'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0007_manuscriptfile_scan_signature_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manuscriptfile',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, help_text='Generated previews and thumbnails (figures)', verbose_name='Derivatives'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:19
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0008_manuscriptfile_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentMetadata',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sha256', models.CharField(help_text='Checksum of the parsed document', max_length=64, unique=True, verbose_name='SHA-256')),
+                ('status', models.CharField(choices=[('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='processing', max_length=20, verbose_name='Status')),
+                ('title', models.CharField(blank=True, max_length=500, verbose_name='Title')),
+                ('abstract', models.TextField(blank=True, verbose_name='Abstract')),
+                ('keywords', models.JSONField(blank=True, default=list, verbose_name='Keywords')),
+                ('word_count', models.PositiveIntegerField(default=0, verbose_name='Word Count')),
+                ('figure_count', models.PositiveIntegerField(default=0, verbose_name='Figure Count')),
+                ('table_count', models.PositiveIntegerField(default=0, verbose_name='Table Count')),
+                ('reference_count', models.PositiveIntegerField(default=0, verbose_name='Reference Count')),
+                ('error', models.CharField(blank=True, max_length=255, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Document Metadata',
+                'verbose_name_plural': 'Document Metadata',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0009_documentmetadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='filedownloadlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Downloaded At'),
+        ),
+        migrations.CreateModel(
+            name='FileDownloadDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Downloads')),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_downloads', to='files.manuscriptfile', verbose_name='File')),
+            ],
+            options={
+                'verbose_name': 'Daily Download Count',
+                'verbose_name_plural': 'Daily Download Counts',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('file', 'date'), name='unique_file_download_day')],
+            },
+        ),
+    ]
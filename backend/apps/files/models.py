@@ -8,13 +8,45 @@ Developer: Abdullah Dogan
 """
 
 import os
+import time
 import uuid
-from django.db import models
+import logging
+from contextvars import ContextVar
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
+from django.utils.http import content_disposition_header
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import FileExtensionValidator
 
+from apps.common import metrics
+from apps.submissions.detail_cache import bump_version_on_commit
+from .derivatives import delete_derivatives, derivative_names
+
+logger = logging.getLogger(__name__)
+
+PRESIGNED_URL_KEY = 'presigned_url:{id}:{expiration}'
+
+# Set by the garbage collector to batch storage deletes (see gc.py)
+deferred_storage_deletes = ContextVar('deferred_storage_deletes', default=None)
+
+
+def delete_stored_on_commit(storage, name, size=0):
+    """
+    Delete a stored object and its derivatives once the transaction commits
+    (or hand them to the active garbage collection run).
+    """
+    deferred = deferred_storage_deletes.get()
+    if deferred is not None:
+        deferred.append((name, size))
+        deferred.extend((derived, 0) for derived in derivative_names(name))
+        return
+    
+    transaction.on_commit(lambda: storage.delete(name))
+    transaction.on_commit(lambda: delete_derivatives(name, storage))
+
 
 def manuscript_file_path(instance, filename):
     """
@@ -29,6 +61,229 @@ def manuscript_file_path(instance, filename):
     return f"temp/{unique_filename}"
 
 
+def blob_file_path(instance, filename):
+    """
+    Determine the storage path for blobs.
+    Format: blobs/{xx}/{uuid}{ext}
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    name = uuid.uuid4().hex
+    return f"blobs/{name[:2]}/{name}{ext}"
+
+
+class FileBlob(models.Model):
+    """
+    Content-addressed file content.
+    
+    Identical bytes (same SHA-256) are stored once and shared by every
+    ManuscriptFile that references them. `ref_count` tracks the references;
+    the stored object is deleted when the last one is released.
+    """
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    
+    sha256 = models.CharField(
+        _('SHA-256'),
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text=_('Content hash (empty until computed for direct uploads)')
+    )
+    
+    file = models.FileField(
+        _('File'),
+        upload_to=blob_file_path,
+        max_length=255
+    )
+    
+    size = models.PositiveBigIntegerField(
+        _('Size'),
+        default=0,
+        help_text=_('Size in bytes')
+    )
+    
+    mime_type = models.CharField(
+        _('MIME Type'),
+        max_length=100,
+        blank=True
+    )
+    
+    ref_count = models.PositiveIntegerField(
+        _('Reference Count'),
+        default=0
+    )
+    
+    created_at = models.DateTimeField(
+        _('Created At'),
+        auto_now_add=True
+    )
+    
+    class Meta:
+        verbose_name = _('File Blob')
+        verbose_name_plural = _('File Blobs')
+    
+    def __str__(self):
+        return f"{self.sha256 or self.id} ({self.ref_count} refs)"
+    
+    @classmethod
+    def acquire(cls, sha256):
+        """
+        Take a reference on an existing blob.
+        
+        Returns:
+            FileBlob or None if no blob has this content
+        """
+        if not sha256:
+            return None
+        
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(sha256=sha256).first()
+            if blob is None:
+                return None
+            cls.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+            blob.ref_count += 1
+            return blob
+    
+    @classmethod
+    def register(cls, name, sha256, size, mime_type=''):
+        """
+        Register an object that is already in storage, taking one reference.
+        
+        If a blob with the same content exists, the new object is a duplicate:
+        it is deleted and the existing blob is returned instead.
+        
+        Args:
+            name: Storage name of the written object
+            sha256: Content hash (None if not known yet)
+            size: Size in bytes
+            mime_type: MIME type
+        
+        Returns:
+            FileBlob
+        """
+        blob = cls.acquire(sha256)
+        if blob is not None:
+            if blob.file.name != name:
+                blob.file.storage.delete(name)
+            return blob
+        
+        blob = cls(sha256=sha256, size=size, mime_type=mime_type, ref_count=1)
+        blob.file.name = name
+        
+        try:
+            with transaction.atomic():
+                blob.save()
+        except IntegrityError:
+            # Same bytes registered concurrently
+            existing = cls.acquire(sha256)
+            if existing is None:
+                raise
+            blob.file.storage.delete(name)
+            return existing
+        
+        return blob
+    
+    @classmethod
+    def store(cls, content, sha256, filename, mime_type=''):
+        """
+        Store content unless identical bytes are already stored.
+        
+        Args:
+            content: Django File (already hashed while it was received)
+            sha256: Content hash
+            filename: Original filename (only the extension is kept)
+            mime_type: MIME type
+        
+        Returns:
+            tuple: (FileBlob, created)
+        """
+        blob = cls.acquire(sha256)
+        if blob is not None:
+            metrics.incr('file_blob.dedup_hit')
+            metrics.observe('file_blob.bytes_saved', blob.size)
+            return blob, False
+        
+        name = cls.write(content, filename)
+        blob = cls.register(name, sha256, content.size, mime_type)
+        return blob, blob.file.name == name
+    
+    @classmethod
+    def write(cls, content, filename):
+        """
+        Write content to a new blob object (no row is created).
+        
+        Returns:
+            str: Storage name
+        """
+        field = cls._meta.get_field('file')
+        return field.storage.save(field.generate_filename(None, filename), content)
+    
+    def assign_sha256(self, sha256):
+        """
+        Set the hash of a blob stored without one (direct uploads).
+        
+        If identical content is already stored, this blob's files are moved
+        to the existing blob and this blob is deleted.
+        
+        Returns:
+            FileBlob: The blob that now holds the content
+        """
+        with transaction.atomic():
+            blob = FileBlob.objects.select_for_update().get(pk=self.pk)
+            existing = FileBlob.objects.select_for_update().filter(sha256=sha256).first()
+            
+            files = ManuscriptFile.objects.filter(blob=blob)
+            submission_ids = set(files.values_list('submission_id', flat=True))
+            
+            if existing is None:
+                FileBlob.objects.filter(pk=blob.pk).update(sha256=sha256)
+                files.update(checksum=sha256)
+                blob.sha256 = sha256
+                return blob
+            
+            files.update(blob=existing, file=existing.file.name, checksum=sha256)
+            FileBlob.objects.filter(pk=existing.pk).update(
+                ref_count=F('ref_count') + blob.ref_count
+            )
+            
+            blob.delete()
+            delete_stored_on_commit(blob.file.storage, blob.file.name, blob.size)
+            
+            # Bulk update sends no signals
+            for submission_id in submission_ids:
+                bump_version_on_commit(submission_id)
+            
+            metrics.incr('file_blob.dedup_hit')
+            metrics.observe('file_blob.bytes_saved', blob.size)
+            return existing
+    
+    def release(self):
+        """
+        Drop one reference; delete the blob and its object with the last one.
+        
+        Returns:
+            bool: True if the blob was deleted
+        """
+        with transaction.atomic():
+            blob = FileBlob.objects.select_for_update().filter(pk=self.pk).first()
+            if blob is None:
+                return False
+            
+            if blob.ref_count > 1:
+                FileBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return False
+            
+            blob.delete()
+            # Only remove the object once the row is gone for good
+            delete_stored_on_commit(blob.file.storage, blob.file.name, blob.size)
+            return True
+
+
 class ManuscriptFile(models.Model):
     """
     Manuscript File Model.
@@ -59,6 +314,12 @@ class ManuscriptFile(models.Model):
         REVISION_NOTES = 'revision_notes', _('Revision Notes')
         OTHER = 'other', _('Other')
     
+    class ScanStatus(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        SCANNING = 'scanning', _('Scanning')
+        CLEAN = 'clean', _('Clean')
+        INFECTED = 'infected', _('Infected (quarantined)')
+    
     # ============================================
     # PRIMARY KEY
     # ============================================
@@ -198,6 +459,16 @@ class ManuscriptFile(models.Model):
         help_text=_('SHA-256 file checksum')
     )
     
+    blob = models.ForeignKey(
+        FileBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='manuscript_files',
+        verbose_name=_('Blob'),
+        help_text=_('Shared stored content (released on hard delete)')
+    )
+    
     virus_scanned = models.BooleanField(
         _('Virus Scanned'),
         default=False,
@@ -210,6 +481,32 @@ class ManuscriptFile(models.Model):
         blank=True
     )
     
+    scan_status = models.CharField(
+        _('Scan Status'),
+        max_length=20,
+        choices=ScanStatus.choices,
+        default=ScanStatus.PENDING,
+        db_index=True,
+        help_text=_('Result of the background virus scan')
+    )
+    
+    scan_signature = models.CharField(
+        _('Scan Signature'),
+        max_length=255,
+        blank=True,
+        help_text=_('Signature reported for infected files')
+    )
+    
+    # ============================================
+    # PREVIEWS
+    # ============================================
+    derivatives = models.JSONField(
+        _('Derivatives'),
+        default=dict,
+        blank=True,
+        help_text=_('Generated previews and thumbnails (figures)')
+    )
+    
     # ============================================
     # TIMESTAMPS
     # ============================================
@@ -231,6 +528,8 @@ class ManuscriptFile(models.Model):
             models.Index(fields=['submission', 'file_type']),
             models.Index(fields=['uploaded_by']),
             models.Index(fields=['is_active']),
+            # Keyset pagination: WHERE submission = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['submission', '-created_at', '-id']),
         ]
     
     def __str__(self):
@@ -258,12 +557,23 @@ class ManuscriptFile(models.Model):
         self.save(update_fields=['is_active', 'updated_at'])
     
     def hard_delete(self, *args, **kwargs):
-        """Permanently delete the file."""
-        # Delete from S3 as well
-        if self.file:
+        """
+        Permanently delete the file.
+        Shared content is released by the post_delete signal and only
+        removed from storage when no other file references it.
+        """
+        # Legacy files without a blob own their object
+        if self.file and not self.blob_id:
             self.file.delete(save=False)
         super().delete(*args, **kwargs)
     
+    def use_blob(self, blob):
+        """Point this file at shared blob content."""
+        self.blob = blob
+        self.file.name = blob.file.name
+        self.file_size = blob.size
+        self.checksum = blob.sha256 or ''
+    
     @property
     def file_extension(self):
         """Return the file extension."""
@@ -293,9 +603,9 @@ class ManuscriptFile(models.Model):
         doc_extensions = ['.doc', '.docx', '.pdf', '.odt', '.rtf']
         return self.file_extension in doc_extensions
     
-    def get_download_url(self, expiration=900):
+    def sign_download_url(self, expiration=900):
         """
-        Generate a presigned download URL.
+        Sign a fresh download URL (no caching).
         
         Args:
             expiration: URL validity period in seconds
@@ -303,15 +613,98 @@ class ManuscriptFile(models.Model):
         Returns:
             str: Download URL
         """
+        if not self.file:
+            return None
+        
         # Use presigned URL for S3
         if hasattr(self.file.storage, 'url'):
             try:
-                return self.file.storage.url(self.file.name, expire=expiration)
-            except Exception:
+                with metrics.timer('presigned_url.sign'):
+                    return self.file.storage.url(
+                        self.file.name,
+                        # Stored names are blob names; download as the original filename
+                        parameters={'ResponseContentDisposition': content_disposition_header(
+                            as_attachment=True,
+                            filename=self.original_filename or os.path.basename(self.file.name)
+                        )},
+                        expire=expiration
+                    )
+            except TypeError:
+                # Local storage does not accept `expire`
                 pass
+            except Exception as e:
+                logger.warning(f"Presigning failed for file {self.pk}: {str(e)}")
+        
+        # Local storage: signed URL of the authenticated download view
+        from .local_serving import make_download_url
+        return make_download_url(self, expiration)
+    
+    def get_download_url(self, expiration=900):
+        """
+        Generate a presigned download URL (served from the URL cache if possible).
+        
+        Args:
+            expiration: URL validity period in seconds
+        
+        Returns:
+            str: Download URL
+        """
+        url, _expires_in = self.get_download_urls([self], expiration).get(self.pk, (None, 0))
+        return url
+    
+    @classmethod
+    def get_download_urls(cls, files, expiration=900):
+        """
+        Return download URLs for many files with one cache round trip.
         
-        # Local storage
-        return self.file.url if self.file else None
+        Signed URLs are cached for `expiration - PRESIGNED_URL_MIN_VALIDITY -
+        SUBMISSION_DETAIL_CACHE_TTL` seconds. The submission detail cache
+        keeps a served URL for up to SUBMISSION_DETAIL_CACHE_TTL more
+        seconds, so a URL still has at least PRESIGNED_URL_MIN_VALIDITY
+        seconds left when that cached payload is served.
+        
+        Args:
+            files: Iterable of ManuscriptFile instances
+            expiration: URL validity period in seconds
+        
+        Returns:
+            dict: {file_id: (url, expires_in_seconds)}
+        """
+        # Quarantined files are never handed out
+        files = [f for f in files if f.file and f.scan_status != cls.ScanStatus.INFECTED]
+        cache_ttl = (
+            expiration
+            - settings.PRESIGNED_URL_MIN_VALIDITY
+            - settings.SUBMISSION_DETAIL_CACHE_TTL
+        )
+        
+        # Local storage URLs are not signed, nothing to cache
+        if not settings.USE_S3 or cache_ttl <= 0:
+            return {f.pk: (f.sign_download_url(expiration), expiration) for f in files}
+        
+        keys = {f.pk: PRESIGNED_URL_KEY.format(id=f.pk, expiration=expiration) for f in files}
+        cached = cache.get_many(list(keys.values()))
+        now = time.time()
+        
+        result = {}
+        fresh = {}
+        for f in files:
+            entry = cached.get(keys[f.pk])
+            # Entries are only valid for the object they were signed for
+            if entry and entry[2] == f.file.name:
+                url, signed_at, _name = entry
+                metrics.incr('presigned_url_cache.hit')
+            else:
+                url, signed_at = f.sign_download_url(expiration), now
+                metrics.incr('presigned_url_cache.miss')
+                if url:
+                    fresh[keys[f.pk]] = (url, signed_at, f.file.name)
+            result[f.pk] = (url, max(int(expiration - (now - signed_at)), 0))
+        
+        if fresh:
+            cache.set_many(fresh, timeout=cache_ttl)
+        
+        return result
 
 
 class FileDownloadLog(models.Model):
@@ -351,9 +744,11 @@ class FileDownloadLog(models.Model):
         blank=True
     )
     
+    # Set when the download happened (rows are written later, in batches)
     created_at = models.DateTimeField(
         _('Downloaded At'),
-        auto_now_add=True
+        default=timezone.now,
+        editable=False
     )
     
     class Meta:
@@ -363,3 +758,279 @@ class FileDownloadLog(models.Model):
     
     def __str__(self):
         return f"{self.file.original_filename} - {self.downloaded_by} - {self.created_at}"
+
+
+class FileDownloadDaily(models.Model):
+    """
+    Daily download count per file.
+    Maintained by the download log flusher (see download_log.py).
+    """
+    
+    file = models.ForeignKey(
+        ManuscriptFile,
+        on_delete=models.CASCADE,
+        related_name='daily_downloads',
+        verbose_name=_('File')
+    )
+    
+    date = models.DateField(_('Date'))
+    
+    count = models.PositiveIntegerField(_('Downloads'), default=0)
+    
+    class Meta:
+        verbose_name = _('Daily Download Count')
+        verbose_name_plural = _('Daily Download Counts')
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['file', 'date'], name='unique_file_download_day'),
+        ]
+    
+    def __str__(self):
+        return f"{self.file_id} {self.date}: {self.count}"
+
+
+class UploadSession(models.Model):
+    """
+    Resumable (chunked) upload session.
+    
+    Chunks are PATCHed at increasing offsets and stored as part objects;
+    the ManuscriptFile is created only when the session is finalized.
+    
+    In `direct` mode (S3 only) the browser uploads presigned multipart
+    parts straight to the bucket and the session only tracks the upload.
+    """
+    
+    class Mode(models.TextChoices):
+        CHUNKED = 'chunked', _('Chunked (through API)')
+        DIRECT = 'direct', _('Direct to storage')
+    
+    class Status(models.TextChoices):
+        ACTIVE = 'active', _('Active')
+        FINALIZING = 'finalizing', _('Finalizing')
+        COMPLETED = 'completed', _('Completed')
+        ABORTED = 'aborted', _('Aborted')
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    
+    submission = models.ForeignKey(
+        'submissions.Submission',
+        on_delete=models.CASCADE,
+        related_name='upload_sessions',
+        verbose_name=_('Submission')
+    )
+    
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions',
+        verbose_name=_('Uploaded By')
+    )
+    
+    # ============================================
+    # TARGET FILE INFORMATION
+    # ============================================
+    file_type = models.CharField(
+        _('File Type'),
+        max_length=30,
+        choices=ManuscriptFile.FileType.choices,
+        default=ManuscriptFile.FileType.OTHER
+    )
+    
+    original_filename = models.CharField(
+        _('Original Filename'),
+        max_length=255
+    )
+    
+    mime_type = models.CharField(
+        _('MIME Type'),
+        max_length=100,
+        blank=True
+    )
+    
+    description = models.CharField(
+        _('Description'),
+        max_length=500,
+        blank=True
+    )
+    
+    caption = models.TextField(
+        _('Caption'),
+        blank=True
+    )
+    
+    # ============================================
+    # PROGRESS
+    # ============================================
+    upload_length = models.PositiveBigIntegerField(
+        _('Upload Length'),
+        help_text=_('Declared total size in bytes')
+    )
+    
+    offset = models.PositiveBigIntegerField(
+        _('Offset'),
+        default=0,
+        help_text=_('Bytes received so far')
+    )
+    
+    parts = models.JSONField(
+        _('Parts'),
+        default=list,
+        blank=True,
+        help_text=_('Stored chunk objects as [offset, storage name, size]')
+    )
+    
+    status = models.CharField(
+        _('Status'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.ACTIVE,
+        db_index=True
+    )
+    
+    # ============================================
+    # DIRECT (S3 MULTIPART) MODE
+    # ============================================
+    mode = models.CharField(
+        _('Mode'),
+        max_length=20,
+        choices=Mode.choices,
+        default=Mode.CHUNKED
+    )
+    
+    storage_key = models.CharField(
+        _('Storage Key'),
+        max_length=500,
+        blank=True,
+        help_text=_('Target object name of a direct upload')
+    )
+    
+    multipart_upload_id = models.CharField(
+        _('Multipart Upload ID'),
+        max_length=1024,
+        blank=True
+    )
+    
+    manuscript_file = models.OneToOneField(
+        ManuscriptFile,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload_session',
+        verbose_name=_('Manuscript File')
+    )
+    
+    expires_at = models.DateTimeField(
+        _('Expires At'),
+        db_index=True
+    )
+    
+    created_at = models.DateTimeField(
+        _('Created At'),
+        auto_now_add=True
+    )
+    
+    updated_at = models.DateTimeField(
+        _('Updated At'),
+        auto_now=True
+    )
+    
+    class Meta:
+        verbose_name = _('Upload Session')
+        verbose_name_plural = _('Upload Sessions')
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.original_filename} ({self.offset}/{self.upload_length})"
+    
+    @property
+    def is_complete(self):
+        """Check whether all bytes have been received."""
+        return self.offset == self.upload_length
+    
+    @property
+    def parts_prefix(self):
+        """Storage prefix of the chunk objects."""
+        return f"uploads/{self.id}/"
+
+
+class DocumentMetadata(models.Model):
+    """
+    Metadata extracted from a Word manuscript.
+    
+    Keyed by content checksum: a document is parsed once, however many
+    files (or re-uploads) share its bytes.
+    """
+    
+    class Status(models.TextChoices):
+        PROCESSING = 'processing', _('Processing')
+        DONE = 'done', _('Done')
+        FAILED = 'failed', _('Failed')
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    
+    sha256 = models.CharField(
+        _('SHA-256'),
+        max_length=64,
+        unique=True,
+        help_text=_('Checksum of the parsed document')
+    )
+    
+    status = models.CharField(
+        _('Status'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PROCESSING
+    )
+    
+    title = models.CharField(
+        _('Title'),
+        max_length=500,
+        blank=True
+    )
+    
+    abstract = models.TextField(
+        _('Abstract'),
+        blank=True
+    )
+    
+    keywords = models.JSONField(
+        _('Keywords'),
+        default=list,
+        blank=True
+    )
+    
+    word_count = models.PositiveIntegerField(_('Word Count'), default=0)
+    figure_count = models.PositiveIntegerField(_('Figure Count'), default=0)
+    table_count = models.PositiveIntegerField(_('Table Count'), default=0)
+    reference_count = models.PositiveIntegerField(_('Reference Count'), default=0)
+    
+    error = models.CharField(
+        _('Error'),
+        max_length=255,
+        blank=True
+    )
+    
+    created_at = models.DateTimeField(
+        _('Created At'),
+        auto_now_add=True
+    )
+    
+    updated_at = models.DateTimeField(
+        _('Updated At'),
+        auto_now=True
+    )
+    
+    class Meta:
+        verbose_name = _('Document Metadata')
+        verbose_name_plural = _('Document Metadata')
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.status})"
@@ -0,0 +1,349 @@
+"""
+TruEditor - Virus Scanning
+==========================
+Background virus scanning of uploaded files.
+
+Pipeline:
+1. A new ManuscriptFile starts as `pending`; its creation schedules one
+   debounced `scan_pending_files` task (uploads arriving together share it).
+2. The task claims pending files, scans every stored object once
+   (deduplicated content shares the result) and records the outcome.
+   Small objects are scanned in batches over one scanner session, large
+   ones are streamed from storage in chunks.
+3. Infected objects are moved under `quarantine/` and their files are
+   marked `infected`; they are never handed out for download.
+4. Submission readiness requires every active file to be `clean`.
+
+The scanner is pluggable (settings.VIRUS_SCANNER). ClamdScanner speaks the
+clamd protocol; `python manage.py clamd_stub` runs a local stand-in.
+
+Developer: Abdullah Dogan
+"""
+
+import logging
+import socket
+import struct
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.common import metrics
+from apps.submissions.detail_cache import bump_version_on_commit
+from .derivatives import delete_derivatives
+from .models import FileBlob, ManuscriptFile
+
+logger = logging.getLogger(__name__)
+
+SCAN_SCHEDULED_KEY = 'virus_scan_scheduled'
+READ_CHUNK_SIZE = 256 * 1024
+QUARANTINE_PREFIX = 'quarantine/'
+
+
+@dataclass
+class ScanResult:
+    """Outcome of scanning one object."""
+    infected: bool
+    signature: str = ''
+
+
+class ScannerError(Exception):
+    """The scanner could not produce a result."""
+
+
+# ============================================
+# SCANNERS
+# ============================================
+
+class BaseScanner:
+    """
+    Scanner interface.
+
+    Subclasses implement `scan`; `scan_many` may be overridden to scan
+    several small objects in one round trip.
+    """
+
+    def scan(self, chunks):
+        """
+        Scan a stream.
+
+        Args:
+            chunks: Iterable of bytes
+
+        Returns:
+            ScanResult
+        """
+        raise NotImplementedError
+
+    def scan_many(self, items):
+        """
+        Scan several small objects.
+
+        Args:
+            items: List of (key, bytes)
+
+        Returns:
+            dict: {key: ScanResult}
+        """
+        return {key: self.scan([data]) for key, data in items}
+
+
+class ClamdScanner(BaseScanner):
+    """
+    clamd client (INSTREAM; batches use one IDSESSION connection).
+    """
+
+    def __init__(self, host='localhost', port=3310, timeout=60, chunk_size=64 * 1024):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+    def _connect(self):
+        try:
+            return socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            raise ScannerError(f"Cannot connect to clamd at {self.host}:{self.port}: {e}")
+
+    def _send_stream(self, sock, chunks):
+        """Send one INSTREAM command with length-prefixed chunks."""
+        sock.sendall(b'zINSTREAM\0')
+        for chunk in chunks:
+            for start in range(0, len(chunk), self.chunk_size):
+                piece = chunk[start:start + self.chunk_size]
+                sock.sendall(struct.pack('!L', len(piece)) + piece)
+        sock.sendall(struct.pack('!L', 0))
+
+    def _read_reply(self, sock):
+        """Read one NUL-terminated reply."""
+        reply = bytearray()
+        while not reply.endswith(b'\0'):
+            data = sock.recv(4096)
+            if not data:
+                raise ScannerError('clamd closed the connection.')
+            reply += data
+        return reply[:-1].decode('utf-8', 'replace').strip()
+
+    @staticmethod
+    def _parse(reply):
+        """
+        Parse "stream: OK", "stream: <signature> FOUND" (optionally
+        prefixed with a session request ID: "1: stream: OK").
+        """
+        if reply.endswith('FOUND'):
+            signature = reply.rsplit(':', 1)[-1][:-len('FOUND')].strip()
+            return ScanResult(infected=True, signature=signature)
+        if reply.endswith('OK'):
+            return ScanResult(infected=False)
+        raise ScannerError(f"clamd error: {reply}")
+
+    def scan(self, chunks):
+        try:
+            with self._connect() as sock:
+                self._send_stream(sock, chunks)
+                return self._parse(self._read_reply(sock))
+        except OSError as e:
+            raise ScannerError(str(e))
+
+    def scan_many(self, items):
+        results = {}
+        try:
+            with self._connect() as sock:
+                sock.sendall(b'zIDSESSION\0')
+                # One request at a time: clamd may block if replies are not read
+                for key, data in items:
+                    self._send_stream(sock, [data])
+                    results[key] = self._parse(self._read_reply(sock))
+                sock.sendall(b'zEND\0')
+        except OSError as e:
+            raise ScannerError(str(e))
+        return results
+
+
+def get_scanner():
+    """Return the configured scanner."""
+    scanner_class = import_string(settings.VIRUS_SCANNER)
+    return scanner_class(**getattr(settings, 'VIRUS_SCANNER_OPTIONS', {}))
+
+
+# ============================================
+# PIPELINE
+# ============================================
+
+def schedule_scan():
+    """
+    Schedule one debounced scan run (called after a file is created).
+    Uploads within VIRUS_SCAN_BATCH_DELAY seconds share the run.
+    """
+    if not settings.VIRUS_SCAN_ENABLED:
+        return
+
+    from .tasks import scan_pending_files
+
+    delay = settings.VIRUS_SCAN_BATCH_DELAY
+    if not cache.add(SCAN_SCHEDULED_KEY, '1', timeout=delay):
+        return
+
+    try:
+        scan_pending_files.apply_async(countdown=delay)
+    except Exception as e:
+        # The periodic sweep picks the files up later
+        cache.delete(SCAN_SCHEDULED_KEY)
+        logger.warning(f"Could not schedule virus scan: {str(e)}")
+
+
+def claim_pending(limit):
+    """
+    Mark up to `limit` pending files as scanning and return them.
+    Concurrent workers skip each other's rows.
+    """
+    with transaction.atomic():
+        files = list(
+            ManuscriptFile.objects.select_for_update(skip_locked=True).filter(
+                scan_status=ManuscriptFile.ScanStatus.PENDING
+            ).order_by('created_at')[:limit]
+        )
+        ManuscriptFile.objects.filter(pk__in=[f.pk for f in files]).update(
+            scan_status=ManuscriptFile.ScanStatus.SCANNING,
+            virus_scan_date=timezone.now()
+        )
+    return files
+
+
+def reset_stale(max_age=None):
+    """Return files stuck in `scanning` (e.g. lost worker) to `pending`."""
+    cutoff = timezone.now() - timedelta(seconds=max_age or settings.VIRUS_SCAN_STALE_AFTER)
+    return ManuscriptFile.objects.filter(
+        scan_status=ManuscriptFile.ScanStatus.SCANNING,
+        virus_scan_date__lt=cutoff
+    ).update(scan_status=ManuscriptFile.ScanStatus.PENDING)
+
+
+def _record(files, result):
+    """Store a scan result on every file sharing the scanned object."""
+    pks = [f.pk for f in files]
+    now = timezone.now()
+
+    if result.infected:
+        _quarantine(files)
+        ManuscriptFile.objects.filter(pk__in=pks).update(
+            scan_status=ManuscriptFile.ScanStatus.INFECTED,
+            scan_signature=result.signature[:255],
+            virus_scanned=True,
+            virus_scan_date=now
+        )
+        metrics.incr('virus_scan.infected', len(pks))
+        logger.warning(f"Infected file(s) quarantined: {pks} ({result.signature})")
+    else:
+        ManuscriptFile.objects.filter(pk__in=pks).update(
+            scan_status=ManuscriptFile.ScanStatus.CLEAN,
+            scan_signature='',
+            virus_scanned=True,
+            virus_scan_date=now
+        )
+        metrics.incr('virus_scan.clean', len(pks))
+
+    # Bulk updates send no signals
+    for submission_id in {f.submission_id for f in files}:
+        bump_version_on_commit(submission_id)
+
+
+def _quarantine(files):
+    """
+    Move an infected object under QUARANTINE_PREFIX so it is out of the
+    regular namespace, and point every referencing row at the new name.
+    """
+    name = files[0].file.name
+    if name.startswith(QUARANTINE_PREFIX):
+        return
+
+    storage = files[0].file.storage
+    with storage.open(name, 'rb') as source:
+        new_name = storage.save(f"{QUARANTINE_PREFIX}{name}", source)
+
+    with transaction.atomic():
+        ManuscriptFile.objects.filter(file=name).update(file=new_name, derivatives={})
+        FileBlob.objects.filter(file=name).update(file=new_name)
+
+    storage.delete(name)
+    delete_derivatives(name, storage)
+
+
+def _release_claim(files):
+    """Put files whose scan did not finish back to pending."""
+    ManuscriptFile.objects.filter(
+        pk__in=[f.pk for f in files],
+        scan_status=ManuscriptFile.ScanStatus.SCANNING
+    ).update(scan_status=ManuscriptFile.ScanStatus.PENDING)
+
+
+def scan_files(files, scanner=None):
+    """
+    Scan claimed files and record the results.
+
+    Args:
+        files: ManuscriptFile instances in `scanning` state
+        scanner: Scanner instance (default: get_scanner())
+
+    Returns:
+        dict: Counts of scanned objects (`batched`, `streamed`, `reused`)
+    """
+    scanner = scanner or get_scanner()
+    stats = {'batched': 0, 'streamed': 0, 'reused': 0}
+
+    # One scan per stored object (deduplicated blobs are shared)
+    objects = {}
+    for f in files:
+        objects.setdefault(f.file.name, []).append(f)
+
+    # Content already scanned clean through another file is not rescanned
+    clean_blobs = set(ManuscriptFile.objects.filter(
+        blob_id__in={f.blob_id for f in files if f.blob_id},
+        scan_status=ManuscriptFile.ScanStatus.CLEAN
+    ).values_list('blob_id', flat=True))
+
+    small, large = [], []
+    for name, group in objects.items():
+        if group[0].blob_id in clean_blobs:
+            _record(group, ScanResult(infected=False))
+            stats['reused'] += 1
+        elif group[0].file_size <= settings.VIRUS_SCAN_SMALL_FILE_SIZE:
+            small.append(name)
+        else:
+            large.append(name)
+
+    pending = dict(objects)
+    try:
+        batch_size = settings.VIRUS_SCAN_BATCH_SIZE
+        for start in range(0, len(small), batch_size):
+            names = small[start:start + batch_size]
+            items = []
+            for name in names:
+                with pending[name][0].file.storage.open(name, 'rb') as stored:
+                    items.append((name, stored.read()))
+
+            with metrics.timer('virus_scan.batch'):
+                results = scanner.scan_many(items)
+
+            for name in names:
+                _record(pending.pop(name), results[name])
+            stats['batched'] += len(names)
+
+        for name in large:
+            with pending[name][0].file.storage.open(name, 'rb') as stored:
+                with metrics.timer('virus_scan.stream'):
+                    result = scanner.scan(stored.chunks(READ_CHUNK_SIZE))
+
+            _record(pending.pop(name), result)
+            stats['streamed'] += 1
+    finally:
+        # Anything not recorded goes back to the queue
+        leftover = [f for group in pending.values() for f in group]
+        if leftover:
+            _release_claim(leftover)
+
+    return stats
@@ -6,12 +6,39 @@ Serializers for file upload and management.
 Developer: Abdullah Dogan
 """
 
+import os
+from datetime import timedelta
+
 from rest_framework import serializers
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import FileExtensionValidator
 
-from .models import ManuscriptFile
+from .derivatives import get_preview_urls
+from .models import FileBlob, ManuscriptFile, UploadSession
+from .upload_handlers import FILE_SIGNATURES, get_sha256
 from apps.submissions.models import Submission
+from apps.submissions.detail_cache import bump_version_on_commit
+
+ALLOWED_UPLOAD_EXTENSIONS = list(FILE_SIGNATURES)
+
+
+class ManuscriptFileListSerializer(serializers.ListSerializer):
+    """
+    List serializer that resolves all download URLs in one batch
+    (one cache round trip instead of one per file).
+    """
+    
+    def to_representation(self, data):
+        files = list(data.all() if hasattr(data, 'all') else data)
+        urls = ManuscriptFile.get_download_urls(files, expiration=900)  # 15 minutes
+        previews = get_preview_urls(files, expiration=900)
+        for instance in files:
+            instance._download_url = urls.get(instance.pk, (None, 0))[0]
+            instance._previews = previews.get(instance.pk)
+        return super().to_representation(files)
 
 
 class ManuscriptFileSerializer(serializers.ModelSerializer):
@@ -24,14 +51,16 @@ class ManuscriptFileSerializer(serializers.ModelSerializer):
     is_image = serializers.ReadOnlyField()
     is_document = serializers.ReadOnlyField()
     file_type_display = serializers.CharField(source='get_file_type_display', read_only=True)
+    scan_status_display = serializers.CharField(source='get_scan_status_display', read_only=True)
     download_url = serializers.SerializerMethodField()
+    previews = serializers.SerializerMethodField()
     
     class Meta:
         model = ManuscriptFile
+        list_serializer_class = ManuscriptFileListSerializer
         fields = [
             'id',
             'submission',
-            'file',
             'file_type',
             'file_type_display',
             'original_filename',
@@ -47,7 +76,10 @@ class ManuscriptFileSerializer(serializers.ModelSerializer):
             'is_primary',
             'is_image',
             'is_document',
+            'scan_status',
+            'scan_status_display',
             'download_url',
+            'previews',
             'created_at',
             'updated_at',
         ]
@@ -59,15 +91,24 @@ class ManuscriptFileSerializer(serializers.ModelSerializer):
             'mime_type',
             'is_image',
             'is_document',
+            'scan_status',
             'created_at',
             'updated_at',
         ]
     
     def get_download_url(self, obj):
         """Generate presigned download URL."""
+        if hasattr(obj, '_download_url'):
+            return obj._download_url
         if obj.file:
             return obj.get_download_url(expiration=900)  # 15 minutes
         return None
+    
+    def get_previews(self, obj):
+        """Preview and thumbnail URLs of figures ({variant: {width, height, urls}})."""
+        if hasattr(obj, '_previews'):
+            return obj._previews
+        return get_preview_urls([obj], expiration=900).get(obj.pk)
 
 
 class FileUploadSerializer(serializers.ModelSerializer):
@@ -80,7 +121,7 @@ class FileUploadSerializer(serializers.ModelSerializer):
         required=True,
         validators=[
             FileExtensionValidator(
-                allowed_extensions=['doc', 'docx', 'pdf', 'jpg', 'jpeg', 'png', 'tiff', 'tif', 'xlsx', 'xls']
+                allowed_extensions=ALLOWED_UPLOAD_EXTENSIONS
             )
         ],
         help_text=_('Allowed formats: DOC, DOCX, PDF, JPG, PNG, TIFF, XLS, XLSX')
@@ -97,13 +138,16 @@ class FileUploadSerializer(serializers.ModelSerializer):
         ]
     
     def validate_file(self, value):
-        """Validate file size and type."""
-        # Max file size: 50MB
-        max_size = 50 * 1024 * 1024  # 50MB in bytes
-        
-        if value.size > max_size:
+        """
+        Validate file size.
+        Multipart uploads are already checked while streaming
+        (ValidatingUploadHandler); this covers files from other sources.
+        """
+        if value.size > settings.MAX_UPLOAD_SIZE:
             raise serializers.ValidationError(
-                _('File size cannot exceed 50MB.')
+                _('File size cannot exceed %(size)d MB.') % {
+                    'size': settings.MAX_UPLOAD_SIZE // (1024 * 1024)
+                }
             )
         
         return value
@@ -126,20 +170,37 @@ class FileUploadSerializer(serializers.ModelSerializer):
         return attrs
     
     def create(self, validated_data):
-        """Create file record."""
+        """
+        Create file record.
+        Content is stored once per SHA-256 (computed while the upload streamed).
+        """
         submission = self.context['submission']
         user = self.context['request'].user
+        file = validated_data.pop('file')
         
         validated_data['submission'] = submission
         validated_data['uploaded_by'] = user
-        validated_data['original_filename'] = validated_data['file'].name
+        validated_data['original_filename'] = file.name
+        # The content was checked against its extension; don't trust the client's type
+        extension = os.path.splitext(file.name)[1].lower().lstrip('.')
+        validated_data['mime_type'] = FILE_SIGNATURES[extension][0]
         
-        # Set file size and mime type
-        file = validated_data['file']
-        validated_data['file_size'] = file.size
-        validated_data['mime_type'] = file.content_type or ''
+        blob, _created = FileBlob.store(
+            file,
+            get_sha256(file),
+            file.name,
+            validated_data['mime_type']
+        )
         
-        return super().create(validated_data)
+        instance = ManuscriptFile(**validated_data)
+        instance.use_blob(blob)
+        try:
+            instance.save()
+        except Exception:
+            blob.release()
+            raise
+        
+        return instance
 
 
 class FileReorderSerializer(serializers.Serializer):
@@ -169,19 +230,216 @@ class FileReorderSerializer(serializers.Serializer):
         return value
     
     def validate(self, attrs):
-        """Validate that all files belong to the submission."""
+        """
+        Validate that all files belong to the submission.
+        Loads the submission's active files once; save() reuses them.
+        """
         submission = self.context['submission']
         file_ids = attrs['file_ids']
         
-        files = ManuscriptFile.objects.filter(
-            id__in=file_ids,
-            submission=submission,
-            is_active=True
-        )
+        files = {
+            f.id: f for f in ManuscriptFile.objects.filter(
+                submission=submission,
+                is_active=True
+            )
+        }
         
-        if files.count() != len(file_ids):
+        if any(file_id not in files for file_id in file_ids):
             raise serializers.ValidationError(
                 _('Some file IDs do not belong to this submission.')
             )
         
+        attrs['files'] = files
         return attrs
+    
+    @transaction.atomic
+    def save(self):
+        """
+        Apply the new order in a single CASE WHEN UPDATE.
+        
+        Returns:
+            list: Active files of the submission ordered by `order`
+        """
+        files = self.validated_data['files']
+        
+        reordered = []
+        for order, file_id in enumerate(self.validated_data['file_ids'], start=1):
+            instance = files[file_id]
+            instance.order = order
+            reordered.append(instance)
+        
+        ManuscriptFile.objects.bulk_update(reordered, ['order'])
+        
+        # Bulk writes send no signals
+        bump_version_on_commit(self.context['submission'].pk)
+        
+        return sorted(files.values(), key=lambda f: (f.order, f.created_at))
+
+
+class PresignedUrlBatchSerializer(serializers.Serializer):
+    """
+    Serializer for batch download URL requests.
+    """
+    
+    file_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=True,
+        max_length=100,
+        help_text=_('List of file IDs (max 100)')
+    )
+    
+    def validate_file_ids(self, value):
+        """Validate file IDs."""
+        if not value:
+            raise serializers.ValidationError(
+                _('At least one file ID is required.')
+            )
+        
+        # Keep request order, drop duplicates
+        return list(dict.fromkeys(value))
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for resumable upload sessions (progress / resume).
+    """
+    
+    max_chunk_size = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id',
+            'submission',
+            'mode',
+            'file_type',
+            'original_filename',
+            'upload_length',
+            'offset',
+            'max_chunk_size',
+            'status',
+            'manuscript_file',
+            'expires_at',
+            'created_at',
+        ]
+        read_only_fields = fields
+    
+    def get_max_chunk_size(self, obj):
+        """Largest chunk the server accepts per PATCH."""
+        return settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE
+
+
+class UploadSessionCreateSerializer(serializers.ModelSerializer):
+    """
+    Serializer for starting a resumable upload.
+    """
+    
+    class Meta:
+        model = UploadSession
+        fields = [
+            'mode',
+            'file_type',
+            'original_filename',
+            'upload_length',
+            'description',
+            'caption',
+        ]
+    
+    def validate_original_filename(self, value):
+        """Validate file extension."""
+        extension = os.path.splitext(value)[1].lower().lstrip('.')
+        
+        if extension not in ALLOWED_UPLOAD_EXTENSIONS:
+            raise serializers.ValidationError(
+                _('Allowed formats: DOC, DOCX, PDF, JPG, PNG, TIFF, XLS, XLSX')
+            )
+        
+        return os.path.basename(value)
+    
+    def validate_mode(self, value):
+        """Direct uploads need S3-compatible storage."""
+        from .direct_uploads import is_available
+        
+        if value == UploadSession.Mode.DIRECT and not is_available():
+            raise serializers.ValidationError(
+                _('Direct uploads require S3 storage.')
+            )
+        
+        return value
+    
+    def validate_upload_length(self, value):
+        """Validate declared file size."""
+        if value <= 0:
+            raise serializers.ValidationError(
+                _('File is empty.')
+            )
+        
+        if value > settings.MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                _('File size cannot exceed %(size)d MB.') % {
+                    'size': settings.MAX_UPLOAD_SIZE // (1024 * 1024)
+                }
+            )
+        
+        return value
+    
+    def validate(self, attrs):
+        """Validate submission status."""
+        submission = self.context.get('submission')
+        
+        if not submission:
+            raise serializers.ValidationError(
+                _('Submission is required.')
+            )
+        
+        if not submission.is_editable:
+            raise serializers.ValidationError(
+                _('Files can only be uploaded for draft or revision submissions.')
+            )
+        
+        return attrs
+    
+    def create(self, validated_data):
+        """Create upload session."""
+        # MIME type follows the extension; the content is checked against it
+        extension = os.path.splitext(validated_data['original_filename'])[1].lower().lstrip('.')
+        validated_data['mime_type'] = FILE_SIGNATURES[extension][0]
+        validated_data['submission'] = self.context['submission']
+        validated_data['uploaded_by'] = self.context['request'].user
+        validated_data['expires_at'] = timezone.now() + timedelta(
+            seconds=settings.CHUNKED_UPLOAD_EXPIRY
+        )
+        
+        return super().create(validated_data)
+
+
+class UploadPartSerializer(serializers.Serializer):
+    """
+    A part uploaded directly to storage.
+    """
+    
+    part_number = serializers.IntegerField(min_value=1, max_value=10000)
+    etag = serializers.CharField(max_length=100)
+
+
+class DirectUploadCompleteSerializer(serializers.Serializer):
+    """
+    Serializer for completing a direct (S3 multipart) upload.
+    """
+    
+    parts = UploadPartSerializer(many=True)
+    
+    def validate_parts(self, value):
+        """Validate part list."""
+        if not value:
+            raise serializers.ValidationError(
+                _('At least one part is required.')
+            )
+        
+        numbers = [part['part_number'] for part in value]
+        if len(numbers) != len(set(numbers)):
+            raise serializers.ValidationError(
+                _('Duplicate part numbers are not allowed.')
+            )
+        
+        return value
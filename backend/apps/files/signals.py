@@ -0,0 +1,50 @@
+"""
+TruEditor - File Signals
+========================
+Releases shared blob content when manuscript files are deleted
+(hard delete or cascades, e.g. a deleted submission) and schedules
+virus scans, figure previews and manuscript metadata extraction for
+new files.
+
+Developer: Abdullah Dogan
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FileBlob, ManuscriptFile
+
+
+@receiver(post_delete, sender=ManuscriptFile)
+def release_file_blob(sender, instance, **kwargs):
+    """Drop the file's reference on its blob."""
+    if instance.blob_id:
+        FileBlob(pk=instance.blob_id).release()
+
+
+@receiver(post_save, sender=ManuscriptFile)
+def schedule_file_scan(sender, instance, created, **kwargs):
+    """Queue a (debounced) virus scan once the new file is committed."""
+    if created and settings.VIRUS_SCAN_ENABLED:
+        from .scanning import schedule_scan
+        transaction.on_commit(schedule_scan)
+
+
+@receiver(post_save, sender=ManuscriptFile)
+def schedule_file_derivatives(sender, instance, created, **kwargs):
+    """Queue preview generation for new figure images."""
+    from .derivatives import schedule, wants_derivatives
+    
+    if created and wants_derivatives(instance):
+        transaction.on_commit(lambda: schedule(instance))
+
+
+@receiver(post_save, sender=ManuscriptFile)
+def schedule_document_metadata(sender, instance, created, **kwargs):
+    """Queue metadata extraction for new Word manuscripts."""
+    from .docx_metadata import schedule, wants_metadata
+    
+    if created and instance.checksum and wants_metadata(instance):
+        transaction.on_commit(lambda: schedule(instance))
@@ -0,0 +1,266 @@
+"""
+TruEditor - File Tasks
+======================
+Celery tasks for manuscript files.
+
+Developer: Abdullah Dogan
+"""
+
+import hashlib
+import logging
+from celery import shared_task
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def cleanup_expired_uploads(batch_size=500):
+    """
+    Abort resumable upload sessions past their expiry and delete their parts.
+    
+    Runs hourly (Celery Beat).
+    
+    Args:
+        batch_size: Maximum sessions handled per run
+    """
+    from .models import UploadSession
+    from .uploads import abort
+    
+    sessions = UploadSession.objects.filter(
+        status=UploadSession.Status.ACTIVE,
+        expires_at__lt=timezone.now()
+    )[:batch_size]
+    
+    aborted = sum(1 for session in sessions if abort(session))
+    
+    if aborted:
+        logger.info(f"Aborted {aborted} expired upload session(s)")
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    ignore_result=True
+)
+def hash_blob(blob_id):
+    """
+    Compute the SHA-256 of a blob stored without one (direct-to-S3 uploads)
+    and merge it into an existing blob with the same content.
+    
+    Args:
+        blob_id: FileBlob UUID
+    """
+    from .models import FileBlob
+    
+    blob = FileBlob.objects.filter(pk=blob_id, sha256__isnull=True).first()
+    if blob is None:
+        return
+    
+    hasher = hashlib.sha256()
+    with blob.file.open('rb') as stored:
+        for chunk in stored.chunks():
+            hasher.update(chunk)
+    
+    from . import derivatives, docx_metadata
+    
+    result = blob.assign_sha256(hasher.hexdigest())
+    merged = result.pk != blob.pk
+    if merged:
+        logger.info(f"Blob {blob_id} deduplicated into {result.pk}")
+    
+    for instance in result.manuscript_files.all():
+        # Metadata extraction waited for the checksum
+        if docx_metadata.wants_metadata(instance):
+            docx_metadata.schedule(instance)
+        # Previews of the dropped object went with it
+        if merged and derivatives.wants_derivatives(instance) and instance.derivatives.get('source') != instance.file.name:
+            derivatives.schedule(instance)
+
+
+@shared_task(ignore_result=True)
+def scan_pending_files(batch_size=100):
+    """
+    Virus-scan files waiting in `pending` state.
+    
+    Scheduled (debounced) after uploads and swept every 5 minutes by
+    Celery Beat. Reschedules itself while files are left.
+    
+    Args:
+        batch_size: Maximum files claimed per run
+    """
+    from django.conf import settings
+    from .models import ManuscriptFile
+    from .scanning import claim_pending, reset_stale, scan_files
+    
+    if not settings.VIRUS_SCAN_ENABLED:
+        return
+    
+    reset = reset_stale()
+    if reset:
+        logger.warning(f"Requeued {reset} file(s) stuck in scanning")
+    
+    files = claim_pending(batch_size)
+    if not files:
+        return
+    
+    stats = scan_files(files)
+    logger.info(f"Virus scan: {len(files)} file(s), {stats}")
+    
+    if ManuscriptFile.objects.filter(scan_status=ManuscriptFile.ScanStatus.PENDING).exists():
+        scan_pending_files.delay(batch_size)
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    ignore_result=True
+)
+def generate_image_derivatives(file_id):
+    """
+    Create web previews and thumbnails of a figure and record them on
+    every file sharing the same stored original.
+    
+    Args:
+        file_id: ManuscriptFile UUID
+    """
+    from apps.submissions.detail_cache import bump_version_on_commit
+    from .derivatives import DerivativeError, generate, wants_derivatives
+    from .models import ManuscriptFile
+    
+    instance = ManuscriptFile.objects.filter(pk=file_id).first()
+    if instance is None or not wants_derivatives(instance):
+        return
+    
+    if instance.scan_status == ManuscriptFile.ScanStatus.INFECTED:
+        return
+    
+    source = instance.file.name
+    if (instance.derivatives or {}).get('source') == source:
+        return
+    
+    try:
+        derivatives = generate(instance)
+    except DerivativeError as e:
+        # Not retried: the original itself is unreadable
+        logger.warning(f"Cannot create previews of file {file_id}: {str(e)}")
+        derivatives = {'source': source, 'error': 'unreadable'}
+    
+    files = ManuscriptFile.objects.filter(file=source)
+    submission_ids = set(files.values_list('submission_id', flat=True))
+    files.update(derivatives=derivatives)
+    
+    # Bulk update sends no signals
+    for submission_id in submission_ids:
+        bump_version_on_commit(submission_id)
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    ignore_result=True
+)
+def extract_document_metadata(file_id):
+    """
+    Extract wizard metadata (title, abstract, keywords, counts) from a
+    Word manuscript. Each checksum is parsed at most once.
+    
+    Args:
+        file_id: ManuscriptFile UUID
+    """
+    from datetime import timedelta
+    from django.conf import settings
+    from apps.common import metrics
+    from .docx_metadata import DocumentMetadataError, extract
+    from .models import DocumentMetadata, ManuscriptFile
+    
+    instance = ManuscriptFile.objects.filter(pk=file_id).first()
+    # Direct uploads get their checksum later (hash_blob schedules again)
+    if instance is None or not instance.checksum:
+        return
+    
+    if instance.scan_status == ManuscriptFile.ScanStatus.INFECTED:
+        return
+    
+    record, created = DocumentMetadata.objects.get_or_create(sha256=instance.checksum)
+    stale = timezone.now() - timedelta(seconds=settings.DOCUMENT_METADATA_STALE_AFTER)
+    if not created:
+        # Parsed, failed for good or being parsed; a crashed worker's claim expires
+        reclaimed = DocumentMetadata.objects.filter(
+            pk=record.pk,
+            status=DocumentMetadata.Status.PROCESSING,
+            updated_at__lt=stale
+        ).update(updated_at=timezone.now())
+        if not reclaimed:
+            return
+    
+    if instance.file_size > settings.DOCUMENT_METADATA_MAX_SIZE:
+        record.status = DocumentMetadata.Status.FAILED
+        record.error = 'Document is too large to be parsed.'
+        record.save()
+        return
+    
+    try:
+        with instance.file.open('rb') as stored, metrics.timer('document_metadata.parse'):
+            data = extract(stored)
+    except DocumentMetadataError as e:
+        # Not retried: the same bytes would fail again
+        logger.warning(f"Cannot extract metadata of file {file_id}: {str(e)}")
+        record.status = DocumentMetadata.Status.FAILED
+        record.error = str(e)[:255]
+        record.save()
+        return
+    except Exception:
+        # Retried (storage hiccup): expire the claim so the retry can take it
+        DocumentMetadata.objects.filter(
+            pk=record.pk,
+            status=DocumentMetadata.Status.PROCESSING
+        ).update(updated_at=stale - timedelta(seconds=1))
+        raise
+    
+    for field, value in data.items():
+        setattr(record, field, value)
+    record.status = DocumentMetadata.Status.DONE
+    record.save()
+
+
+@shared_task(ignore_result=True)
+def flush_download_logs():
+    """
+    Write buffered download logs and daily counts in batches.
+    
+    Runs every minute (Celery Beat).
+    """
+    from .download_log import flush
+    
+    written = flush()
+    if written:
+        logger.info(f"Wrote {written} download log(s)")
+
+
+@shared_task(ignore_result=True)
+def collect_file_garbage(dry_run=None):
+    """
+    Purge expired soft-deleted files and delete orphaned storage objects.
+    
+    Runs daily (Celery Beat).
+    
+    Args:
+        dry_run: Only report (default settings.FILE_GC_DRY_RUN)
+    """
+    from django.conf import settings
+    from .gc import collect_garbage
+    
+    if dry_run is None:
+        dry_run = settings.FILE_GC_DRY_RUN
+    
+    stats = collect_garbage(dry_run=dry_run)
+    logger.info(
+        f"File GC{' (dry run)' if dry_run else ''}: {stats['files_purged']} file(s) purged, "
+        f"{stats['orphans_deleted']} orphan(s), {stats['bytes_reclaimed']} bytes reclaimed, "
+        f"{stats['errors']} error(s)"
+    )
+    return stats
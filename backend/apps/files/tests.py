@@ -1,3 +1,265 @@
-from django.test import TestCase
+"""
+TruEditor - File Tests
+======================
+Tests for the file API and helpers.
 
-# Create your tests here.
+Developer: Abdullah Dogan
+"""
+
+import hashlib
+import json
+import shutil
+import tempfile
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.submissions.models import Submission
+from apps.users.models import User
+from . import download_log, local_serving
+from .models import FileBlob, FileDownloadDaily, FileDownloadLog, ManuscriptFile
+from .serializers import ManuscriptFileSerializer
+
+
+class FileBlobTests(TestCase):
+    """Content-addressed storage with reference counting."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def store(self, data):
+        return FileBlob.store(
+            ContentFile(data), hashlib.sha256(data).hexdigest(), 'paper.pdf', 'application/pdf'
+        )
+
+    def test_acquire_unknown_content(self):
+        self.assertIsNone(FileBlob.acquire(None))
+        self.assertIsNone(FileBlob.acquire(hashlib.sha256(b'missing').hexdigest()))
+
+    def test_identical_content_is_stored_once(self):
+        blob, created = self.store(b'%PDF-1.7 same bytes')
+        duplicate, duplicate_created = self.store(b'%PDF-1.7 same bytes')
+
+        self.assertTrue(created)
+        self.assertFalse(duplicate_created)
+        self.assertEqual(duplicate.pk, blob.pk)
+        self.assertEqual(FileBlob.objects.get(pk=blob.pk).ref_count, 2)
+        self.assertEqual(FileBlob.objects.count(), 1)
+
+    def test_acquire_takes_a_reference(self):
+        blob, _created = self.store(b'%PDF-1.7 acquired')
+
+        acquired = FileBlob.acquire(blob.sha256)
+
+        self.assertEqual(acquired.pk, blob.pk)
+        self.assertEqual(acquired.ref_count, 2)
+        self.assertEqual(FileBlob.objects.get(pk=blob.pk).ref_count, 2)
+
+    def test_last_release_deletes_blob_and_object(self):
+        blob, _created = self.store(b'%PDF-1.7 released')
+        FileBlob.acquire(blob.sha256)
+        name = blob.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(blob.release())
+        self.assertEqual(FileBlob.objects.get(pk=blob.pk).ref_count, 1)
+        self.assertTrue(default_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(blob.release())
+        self.assertFalse(FileBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(blob.release())
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class UploadSessionCreateTests(TestCase):
+    """Starting a resumable upload."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(orcid_id='0000-0000-9999-200X')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_malformed_submission_id_is_not_found(self):
+        for submission_id in ('not-a-uuid', '12345'):
+            with self.subTest(submission_id=submission_id):
+                response = self.client.post(
+                    f'/api/v1/files/uploads/?submission_id={submission_id}',
+                    {'original_filename': 'paper.pdf', 'upload_length': 10, 'file_type': 'main_text'},
+                    format='json'
+                )
+
+                self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class SubmissionFileAccessTests(TestCase):
+    """Editors read submitted files, never drafts."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(orcid_id='0000-0000-9999-202X')
+        self.editor = User.objects.create_user(orcid_id='0000-0000-9999-203X', is_editor=True)
+        self.submission = Submission.objects.create(submitter=self.author, title='Access')
+        self.client = APIClient()
+
+    def submit(self):
+        # status is FSM-protected on instances
+        Submission.objects.filter(pk=self.submission.pk).update(status=Submission.Status.SUBMITTED)
+
+    def get_bundle(self, user):
+        self.client.force_authenticate(user)
+        return self.client.get('/api/v1/files/bundle/', {'submission_id': str(self.submission.pk)})
+
+    def test_editor_cannot_bundle_a_draft(self):
+        self.assertEqual(self.get_bundle(self.editor).status_code, 403)
+
+    def test_editor_passes_the_bundle_check_once_submitted(self):
+        self.submit()
+
+        # No files yet: past the access check, nothing to bundle
+        self.assertEqual(self.get_bundle(self.editor).status_code, 404)
+        self.assertEqual(self.get_bundle(self.author).status_code, 404)
+
+
+class DownloadLogWriteTests(TestCase):
+    """Batch writes of buffered download log entries."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(orcid_id='0000-0000-9999-201X')
+        submission = Submission.objects.create(submitter=self.user, title='Downloads')
+        # bulk_create skips save(), so no stored file is needed
+        self.file = ManuscriptFile.objects.bulk_create([
+            ManuscriptFile(
+                submission=submission,
+                file='downloads/paper.pdf',
+                file_type=ManuscriptFile.FileType.MAIN_TEXT,
+                original_filename='paper.pdf',
+            )
+        ])[0]
+
+    def entry(self, file_id=None):
+        return json.dumps({
+            'id': uuid.uuid4().hex,
+            'file': str(file_id or self.file.pk),
+            'user': str(self.user.pk),
+            'ip': '192.0.2.1',
+            'ua': 'test',
+            'at': timezone.now().isoformat(),
+        })
+
+    def daily_count(self):
+        return FileDownloadDaily.objects.get(file=self.file).count
+
+    def test_replayed_batch_is_not_counted_twice(self):
+        batch = [self.entry(), self.entry()]
+
+        self.assertEqual(download_log._write(batch), 2)
+        self.assertEqual(download_log._write(batch), 0)
+
+        self.assertEqual(FileDownloadLog.objects.filter(file=self.file).count(), 2)
+        self.assertEqual(self.daily_count(), 2)
+
+    def test_partly_replayed_batch_adds_only_new_entries(self):
+        first = self.entry()
+        download_log._write([first])
+
+        self.assertEqual(download_log._write([first, self.entry()]), 1)
+        self.assertEqual(self.daily_count(), 2)
+
+    def test_malformed_and_orphaned_entries_are_skipped(self):
+        batch = ['not json', '{"id": "x"}', self.entry(file_id=uuid.uuid4()), self.entry()]
+
+        self.assertEqual(download_log._write(batch), 1)
+        self.assertEqual(self.daily_count(), 1)
+
+
+class ParseRangeTests(SimpleTestCase):
+    """Single byte-range parsing for local downloads."""
+
+    def test_ranges(self):
+        cases = [
+            ('bytes=0-99', (0, 99)),
+            ('bytes=100-', (100, 999)),
+            ('bytes=-100', (900, 999)),
+            ('bytes=-5000', (0, 999)),
+            ('bytes=900-5000', (900, 999)),
+            # Full response: absent, malformed or multi-range
+            (None, None),
+            ('', None),
+            ('bytes=-', None),
+            ('items=0-10', None),
+            ('bytes=0-10,20-30', None),
+            # Unsatisfiable
+            ('bytes=1000-', False),
+            ('bytes=50-10', False),
+            ('bytes=-0', False),
+        ]
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(local_serving._parse_range(header, 1000), expected)
+
+
+@override_settings(ALLOWED_HOSTS=['*'], USE_S3=False, LOCAL_FILE_SERVER='django')
+class LocalFileDownloadTests(TestCase):
+    """Signed and authenticated downloads from local storage."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.author = User.objects.create_user(orcid_id='0000-0000-9999-204X')
+        self.editor = User.objects.create_user(orcid_id='0000-0000-9999-205X', is_editor=True)
+        self.submission = Submission.objects.create(submitter=self.author, title='Local files')
+        name = default_storage.save('downloads/paper.pdf', ContentFile(b'%PDF-1.7 local bytes'))
+        self.file = ManuscriptFile.objects.bulk_create([
+            ManuscriptFile(
+                submission=self.submission,
+                file=name,
+                file_type=ManuscriptFile.FileType.MAIN_TEXT,
+                original_filename='paper.pdf',
+                mime_type='application/pdf',
+                file_size=20,
+            )
+        ])[0]
+        self.client = APIClient()
+
+    def get_content(self, user=None, **params):
+        if user is not None:
+            self.client.force_authenticate(user)
+        return self.client.get(f'/api/v1/files/{self.file.pk}/content/', params)
+
+    def test_signed_url(self):
+        url = local_serving.make_download_url(self.file)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=0-7')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.7')
+
+    def test_bad_token_is_forbidden(self):
+        self.assertEqual(self.get_content(token='forged').status_code, 403)
+
+    def test_editor_needs_a_token_for_drafts(self):
+        self.assertEqual(self.get_content(self.author).status_code, 200)
+        self.assertEqual(self.get_content(self.editor).status_code, 403)
+
+        Submission.objects.filter(pk=self.submission.pk).update(status=Submission.Status.SUBMITTED)
+        self.assertEqual(self.get_content(self.editor).status_code, 200)
+
+    def test_serialized_file_has_no_unsigned_url(self):
+        data = ManuscriptFileSerializer(self.file).data
+
+        self.assertNotIn('file', data)
+        self.assertIn('?token=', data['download_url'])
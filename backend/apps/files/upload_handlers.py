@@ -0,0 +1,232 @@
+"""
+TruEditor - Upload Handlers
+===========================
+Django upload handlers that validate and hash uploads while they stream in.
+
+ValidatingUploadHandler rejects an upload as soon as it is known to be
+bad, instead of after the whole body was spooled:
+- request Content-Length above the limit: before any byte is read
+- extension not allowed: at the part header
+- content not matching its extension (magic bytes): at the first bytes
+- file growing past MAX_UPLOAD_SIZE: at the offending chunk
+The rest of the body is not read (StopUpload with connection reset); the
+reason is left on the request for the view (see `get_upload_rejection`).
+
+The SHA-256 is updated chunk by chunk as Django receives the request body,
+so the finished UploadedFile carries `sha256` without a second read.
+
+The hashing handlers are configured in settings.FILE_UPLOAD_HANDLERS.
+ValidatingUploadHandler only applies to manuscript file uploads: the view
+puts it first in `request.upload_handlers` (see `add_validating_handler`),
+so other multipart forms are not held to these rules.
+
+Developer: Abdullah Dogan
+"""
+
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    MemoryFileUploadHandler,
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from django.utils.translation import gettext as _
+
+from apps.common import metrics
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+OLE2_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'  # legacy Office (doc, xls)
+ZIP_SIGNATURES = (b'PK\x03\x04',)  # OOXML (docx, xlsx)
+JPEG_SIGNATURE = b'\xff\xd8\xff'
+TIFF_SIGNATURES = (b'II*\x00', b'MM\x00*', b'II+\x00', b'MM\x00+')  # classic and BigTIFF
+
+# Allowed extensions -> (MIME type, leading signatures)
+FILE_SIGNATURES = {
+    'doc': ('application/msword', (OLE2_SIGNATURE,)),
+    'docx': ('application/vnd.openxmlformats-officedocument.wordprocessingml.document', ZIP_SIGNATURES),
+    'pdf': ('application/pdf', (b'%PDF-',)),
+    'jpg': ('image/jpeg', (JPEG_SIGNATURE,)),
+    'jpeg': ('image/jpeg', (JPEG_SIGNATURE,)),
+    'png': ('image/png', (b'\x89PNG\r\n\x1a\n',)),
+    'tiff': ('image/tiff', TIFF_SIGNATURES),
+    'tif': ('image/tiff', TIFF_SIGNATURES),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', ZIP_SIGNATURES),
+    'xls': ('application/vnd.ms-excel', (OLE2_SIGNATURE,)),
+}
+
+# PDF readers accept the header anywhere in the first 1024 bytes
+PDF_HEADER_WINDOW = 1024
+SNIFF_SIZE = 8
+
+# Room for the other form fields and multipart boundaries
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+
+def sniff(head, extension):
+    """
+    Check the first bytes of a file against its extension.
+    
+    Args:
+        head: Leading bytes (at least SNIFF_SIZE, or the whole file)
+        extension: Lowercase extension without the dot
+    
+    Returns:
+        str: MIME type implied by the content, or None if it does not match
+    """
+    mime_type, signatures = FILE_SIGNATURES[extension]
+    if extension == 'pdf':
+        return mime_type if b'%PDF-' in head[:PDF_HEADER_WINDOW] else None
+    return mime_type if head.startswith(signatures) else None
+
+
+class UploadRejected(StopUpload):
+    """An upload failed validation while it was streaming."""
+    
+    def __init__(self, message, code, status_code):
+        super().__init__(connection_reset=True)
+        self.message = message
+        self.code = code
+        self.status_code = status_code
+
+
+def get_upload_rejection(request):
+    """Return the UploadRejected that stopped this request's upload, if any."""
+    return getattr(getattr(request, '_request', request), 'upload_rejection', None)
+
+
+class ValidatingUploadHandler(FileUploadHandler):
+    """
+    Enforce size, extension and content type while the body streams.
+    
+    Must be the first handler: it passes every chunk on unchanged and
+    stores nothing itself.
+    """
+    
+    def _reject(self, message, code, status_code):
+        rejection = UploadRejected(message, code, status_code)
+        self.request.upload_rejection = rejection
+        metrics.incr(f'upload_rejected.{code.lower()}')
+        return rejection
+    
+    def _size_error(self):
+        return self._reject(
+            _('File size cannot exceed %(size)d MB.') % {'size': settings.MAX_UPLOAD_SIZE // (1024 * 1024)},
+            'FILE_SIZE_LIMIT_EXCEEDED',
+            413
+        )
+    
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > settings.MAX_UPLOAD_SIZE + UPLOAD_FORM_OVERHEAD:
+            self._size_error()
+            # Handled: an empty form, the body is never read
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+    
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        self.extension = os.path.splitext(file_name)[1].lower().lstrip('.')
+        self.head = b''
+        self.checked = False
+        
+        if self.extension not in FILE_SIGNATURES:
+            raise self._reject(
+                _('Allowed formats: DOC, DOCX, PDF, JPG, PNG, TIFF, XLS, XLSX'),
+                'FILE_TYPE_NOT_ALLOWED',
+                415
+            )
+        
+        if self.content_length and self.content_length > settings.MAX_UPLOAD_SIZE:
+            raise self._size_error()
+    
+    def _check_head(self, complete=False):
+        window = PDF_HEADER_WINDOW if self.extension == 'pdf' else SNIFF_SIZE
+        if sniff(self.head, self.extension):
+            self.checked = True
+        elif complete or len(self.head) >= window:
+            raise self._reject(
+                _('File content does not match its .%(extension)s extension.') % {'extension': self.extension},
+                'FILE_CONTENT_MISMATCH',
+                415
+            )
+    
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.MAX_UPLOAD_SIZE:
+            raise self._size_error()
+        
+        if not self.checked:
+            self.head += raw_data[:PDF_HEADER_WINDOW - len(self.head)]
+            self._check_head()
+        return raw_data
+    
+    def file_complete(self, file_size):
+        # Empty files are left to the serializer ("The submitted file is empty.")
+        if not self.checked and file_size:
+            self._check_head(complete=True)
+        return None
+
+
+def add_validating_handler(request):
+    """
+    Validate the upload of this request while it streams.
+
+    Must be called before the body is parsed (before `request.data`).
+    """
+    django_request = getattr(request, '_request', request)
+    django_request.upload_handlers.insert(0, ValidatingUploadHandler(django_request))
+
+
+class HashingUploadMixin:
+    """
+    Hash the chunks this handler keeps and attach the hex digest to the
+    file it produces.
+    """
+    
+    def new_file(self, *args, **kwargs):
+        # Before super(): MemoryFileUploadHandler raises StopFutureHandlers
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+    
+    def receive_data_chunk(self, raw_data, start):
+        result = super().receive_data_chunk(raw_data, start)
+        # None means this handler consumed the chunk
+        if result is None:
+            self.sha256.update(raw_data)
+        return result
+    
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    """Small uploads kept in memory."""
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    """Large uploads streamed to a temporary file."""
+
+
+def get_sha256(file):
+    """
+    Return the SHA-256 of an uploaded file.
+    
+    Uses the digest computed while streaming; falls back to reading
+    the file (e.g. files not created by the handlers above).
+    """
+    digest = getattr(file, 'sha256', None)
+    if digest:
+        return digest
+    
+    hasher = hashlib.sha256()
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
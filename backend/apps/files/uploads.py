@@ -0,0 +1,369 @@
+"""
+TruEditor - Resumable Uploads
+=============================
+tus-style chunked upload protocol on top of Django storage.
+
+Flow:
+1. POST  /files/uploads/?submission_id=  -> session with the declared length
+2. PATCH /files/uploads/{id}/            -> raw chunk at `Upload-Offset`
+3. GET   /files/uploads/{id}/            -> current offset (to resume)
+4. POST  /files/uploads/{id}/finalize/   -> ManuscriptFile is created
+
+Direct-to-S3 sessions (`mode=direct`) are handled in direct_uploads.py.
+
+Chunks are streamed to storage as part objects (works on local storage
+and S3 alike, and across web instances). Each chunk is hashed while it is
+read and can be verified against `Upload-Checksum: sha256 <base64>`.
+The MIME type is derived from the extension, never taken from the
+client, and the leading bytes must match it (magic bytes, see
+upload_handlers.sniff): checked on the first chunk when it is long
+enough, and always on finalize before the blob is registered.
+The file SHA-256 is computed while the parts are streamed into the final
+blob object, so no extra pass over the data is needed.
+
+Developer: Abdullah Dogan
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.common import metrics
+from .models import FileBlob, ManuscriptFile, UploadSession
+from .upload_handlers import PDF_HEADER_WINDOW, SNIFF_SIZE, sniff
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK_SIZE = 64 * 1024
+SPOOL_MAX_MEMORY = 1024 * 1024  # chunks larger than this spool to disk
+
+
+class UploadError(ValueError):
+    """Base class for resumable upload errors."""
+
+
+class UploadOffsetError(UploadError):
+    """Chunk offset does not match the session offset."""
+
+
+class UploadSizeError(UploadError):
+    """Chunk is larger than allowed or shorter than announced."""
+
+
+class UploadChecksumError(UploadError):
+    """Chunk checksum does not match `Upload-Checksum`."""
+
+
+class UploadStateError(UploadError):
+    """Session is not in a state that allows the operation."""
+
+
+class UploadContentError(UploadError):
+    """Leading bytes do not match the file extension."""
+
+
+def parse_checksum_header(value):
+    """
+    Parse an `Upload-Checksum` header.
+
+    Args:
+        value: Header value, e.g. "sha256 q1w2e3..." (base64 digest)
+
+    Returns:
+        bytes: Expected digest, or None if the header is empty
+    """
+    if not value:
+        return None
+
+    try:
+        algorithm, encoded = value.split(' ', 1)
+    except ValueError:
+        raise UploadChecksumError('Invalid Upload-Checksum header.')
+
+    if algorithm.lower() != 'sha256':
+        raise UploadChecksumError(f"Unsupported checksum algorithm: {algorithm}")
+
+    try:
+        return base64.b64decode(encoded.strip(), validate=True)
+    except (binascii.Error, ValueError):
+        raise UploadChecksumError('Invalid Upload-Checksum header.')
+
+
+def check_content(session, head):
+    """
+    Check the leading bytes of an upload against its extension.
+
+    Args:
+        session: UploadSession instance
+        head: First bytes of the file (up to PDF_HEADER_WINDOW)
+
+    Returns:
+        bool: True if the content matches, False if `head` is too short to tell
+    """
+    extension = os.path.splitext(session.original_filename)[1].lower().lstrip('.')
+    if sniff(head, extension):
+        return True
+
+    window = PDF_HEADER_WINDOW if extension == 'pdf' else SNIFF_SIZE
+    if len(head) >= min(window, session.upload_length):
+        raise UploadContentError(f"File content does not match its .{extension} extension.")
+    return False
+
+
+def write_chunk(session, stream, offset, content_length, expected_digest=None):
+    """
+    Stream one chunk into storage and advance the session offset.
+
+    Args:
+        session: UploadSession instance
+        stream: Readable request stream
+        offset: Client's `Upload-Offset`
+        content_length: Announced chunk size in bytes
+        expected_digest: Optional SHA-256 digest of the chunk
+
+    Returns:
+        UploadSession: Session with the new offset
+    """
+    if session.status != UploadSession.Status.ACTIVE:
+        raise UploadStateError('Upload session is not active.')
+
+    if session.mode != UploadSession.Mode.CHUNKED:
+        raise UploadStateError('Direct uploads send their parts to storage.')
+
+    if offset != session.offset:
+        raise UploadOffsetError('Upload-Offset does not match the session offset.')
+
+    max_length = min(
+        settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE,
+        session.upload_length - session.offset
+    )
+    if content_length is None or content_length > max_length:
+        raise UploadSizeError(f"Chunk size must not exceed {max_length} bytes.")
+
+    if content_length == 0:
+        return session
+
+    hasher = hashlib.sha256()
+    received = 0
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+        while received < content_length:
+            block = stream.read(min(READ_BLOCK_SIZE, content_length - received))
+            if not block:
+                break
+            hasher.update(block)
+            spool.write(block)
+            received += len(block)
+
+        if received != content_length:
+            raise UploadSizeError('Chunk is shorter than Content-Length.')
+
+        if expected_digest is not None and hasher.digest() != expected_digest:
+            raise UploadChecksumError('Chunk checksum mismatch.')
+
+        # Reject a mismatching file before the rest of it is uploaded
+        if offset == 0:
+            spool.seek(0)
+            try:
+                check_content(session, spool.read(PDF_HEADER_WINDOW))
+            except UploadContentError:
+                abort(session)
+                raise
+
+        spool.seek(0)
+        with metrics.timer('chunked_upload.store_part'):
+            name = default_storage.save(
+                f"{session.parts_prefix}{offset:012d}.part",
+                File(spool)
+            )
+
+    parts = session.parts + [[offset, name, received]]
+    new_offset = offset + received
+
+    # Conditional update: a concurrent chunk at the same offset loses
+    updated = UploadSession.objects.filter(
+        pk=session.pk,
+        status=UploadSession.Status.ACTIVE,
+        offset=offset
+    ).update(offset=new_offset, parts=parts, updated_at=timezone.now())
+
+    if not updated:
+        default_storage.delete(name)
+        raise UploadOffsetError('Upload-Offset does not match the session offset.')
+
+    metrics.observe('chunked_upload.chunk_bytes', received)
+
+    session.offset = new_offset
+    session.parts = parts
+    return session
+
+
+class PartsReader(io.RawIOBase):
+    """
+    Read-only stream over the stored parts of a session.
+    Hashes and counts bytes as they pass through.
+    """
+
+    def __init__(self, names):
+        super().__init__()
+        self._names = iter(names)
+        self._current = None
+        self.hasher = hashlib.sha256()
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self._current is None:
+                name = next(self._names, None)
+                if name is None:
+                    return 0
+                self._current = default_storage.open(name, 'rb')
+
+            data = self._current.read(len(buffer))
+            if data:
+                size = len(data)
+                buffer[:size] = data
+                self.hasher.update(data)
+                self.bytes_read += size
+                return size
+
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        super().close()
+
+
+def _delete_parts(session):
+    """Delete the stored chunk objects of a session."""
+    for _offset, name, _size in session.parts:
+        try:
+            default_storage.delete(name)
+        except Exception as e:
+            logger.warning(f"Could not delete upload part {name}: {str(e)}")
+
+
+def finalize(session):
+    """
+    Assemble the parts into the final object and create the ManuscriptFile.
+
+    Args:
+        session: UploadSession instance (all bytes received)
+
+    Returns:
+        ManuscriptFile: Created file
+    """
+    # Claim the session so it is assembled exactly once
+    claimed = UploadSession.objects.filter(
+        pk=session.pk,
+        mode=UploadSession.Mode.CHUNKED,
+        status=UploadSession.Status.ACTIVE,
+        offset=F('upload_length')
+    ).update(status=UploadSession.Status.FINALIZING, updated_at=timezone.now())
+
+    if not claimed:
+        raise UploadStateError('Upload is incomplete or already finalized.')
+
+    names = [name for _offset, name, _size in sorted(session.parts)]
+    head_reader = io.BufferedReader(PartsReader(names))
+    try:
+        check_content(session, head_reader.read(PDF_HEADER_WINDOW))
+    except UploadContentError:
+        UploadSession.objects.filter(pk=session.pk).update(
+            status=UploadSession.Status.ABORTED, updated_at=timezone.now()
+        )
+        session.status = UploadSession.Status.ABORTED
+        _delete_parts(session)
+        raise
+    finally:
+        head_reader.close()
+
+    instance = ManuscriptFile(
+        submission=session.submission,
+        uploaded_by=session.uploaded_by,
+        file_type=session.file_type,
+        original_filename=session.original_filename,
+        mime_type=session.mime_type,
+        description=session.description,
+        caption=session.caption,
+    )
+
+    reader = PartsReader(names)
+    content = File(io.BufferedReader(reader), name=session.original_filename)
+    content.size = session.upload_length
+    blob = None
+
+    try:
+        with metrics.timer('chunked_upload.assemble'):
+            name = FileBlob.write(content, session.original_filename)
+
+        if reader.bytes_read != session.upload_length:
+            default_storage.delete(name)
+            raise UploadSizeError('Stored parts do not add up to the upload length.')
+
+        # Hash is only known now: a duplicate object is dropped by register()
+        blob = FileBlob.register(
+            name,
+            reader.hasher.hexdigest(),
+            session.upload_length,
+            session.mime_type
+        )
+        instance.use_blob(blob)
+
+        with transaction.atomic():
+            instance.save()
+            session.status = UploadSession.Status.COMPLETED
+            session.manuscript_file = instance
+            session.save(update_fields=['status', 'manuscript_file', 'updated_at'])
+    except Exception:
+        if blob is not None:
+            blob.release()
+        UploadSession.objects.filter(pk=session.pk).update(
+            status=UploadSession.Status.ACTIVE
+        )
+        raise
+    finally:
+        reader.close()
+
+    _delete_parts(session)
+    return instance
+
+
+def abort(session):
+    """
+    Abort an active session and delete its parts.
+
+    Returns:
+        bool: True if the session was aborted
+    """
+    aborted = UploadSession.objects.filter(
+        pk=session.pk,
+        status=UploadSession.Status.ACTIVE
+    ).update(status=UploadSession.Status.ABORTED, updated_at=timezone.now())
+
+    if aborted:
+        session.status = UploadSession.Status.ABORTED
+        if session.mode == UploadSession.Mode.DIRECT:
+            from .direct_uploads import abort as abort_multipart
+            abort_multipart(session)
+        else:
+            _delete_parts(session)
+
+    return bool(aborted)
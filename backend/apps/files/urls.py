@@ -7,16 +7,38 @@ Endpoint'ler:
 - POST   /api/v1/files/                -> Dosya yükle
 - DELETE /api/v1/files/{id}/           -> Dosya sil
 - GET    /api/v1/files/{id}/download/  -> Presigned URL al
+- GET    /api/v1/files/{id}/metadata/  -> DOCX'ten çıkarılan başlık/özet (polling)
+- GET    /api/v1/files/{id}/content/?token=  -> Yerel storage'dan indir (USE_S3=false)
+- GET    /api/v1/files/{id}/preview/?variant=&fmt=&token=  -> Yerel storage'dan önizleme (USE_S3=false)
 - POST   /api/v1/files/reorder/        -> Sıralama güncelle
+- POST   /api/v1/files/presigned_urls/ -> Toplu presigned URL al
+- GET    /api/v1/files/bundle/?submission_id=  -> Tüm dosyaları ZIP olarak indir (stream)
+
+Parçalı (resumable) yükleme:
+- POST   /api/v1/files/uploads/?submission_id=  -> Yükleme oturumu başlat
+- GET    /api/v1/files/uploads/{id}/            -> Offset sorgula (devam etmek için)
+- PATCH  /api/v1/files/uploads/{id}/            -> Parça yükle (Upload-Offset)
+- POST   /api/v1/files/uploads/{id}/finalize/   -> Dosyayı oluştur
+- DELETE /api/v1/files/uploads/{id}/            -> Yüklemeyi iptal et
+- GET    /api/v1/files/uploads/{id}/parts/      -> Direct (S3) yükleme parçalarını yeniden imzala
 """
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ManuscriptFileViewSet
+from .views import (
+    LocalFileDownloadView,
+    LocalFilePreviewView,
+    ManuscriptFileViewSet,
+    UploadSessionViewSet,
+)
 
 router = DefaultRouter()
+# 'uploads' must be registered before the catch-all file routes
+router.register('uploads', UploadSessionViewSet, basename='upload')
 router.register('', ManuscriptFileViewSet, basename='file')
 
 urlpatterns = [
+    path('<uuid:file_id>/content/', LocalFileDownloadView.as_view(), name='file-content'),
+    path('<uuid:file_id>/preview/', LocalFilePreviewView.as_view(), name='file-preview'),
     path('', include(router.urls)),
 ]
@@ -9,18 +9,34 @@ Developer: Abdullah Dogan
 import logging
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.utils.translation import gettext_lazy as _
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import content_disposition_header
 
-from .models import ManuscriptFile
+from . import direct_uploads, download_log, local_serving, uploads
+from .bundle import iter_bundle
+from .derivatives import get_derivative_name
+from .docx_metadata import get_metadata, wants_metadata
+from .models import ManuscriptFile, UploadSession
 from .serializers import (
     ManuscriptFileSerializer,
     FileUploadSerializer,
     FileReorderSerializer,
+    PresignedUrlBatchSerializer,
+    UploadSessionSerializer,
+    UploadSessionCreateSerializer,
+    DirectUploadCompleteSerializer,
 )
+from .upload_handlers import add_validating_handler, get_upload_rejection
 from apps.submissions.models import Submission
+from apps.common import metrics
+from apps.common.pagination import KeysetPagination
 from apps.common.response import (
     success_response,
     error_response,
@@ -43,10 +59,14 @@ class ManuscriptFileViewSet(viewsets.ModelViewSet):
     - destroy: Delete a file (soft delete)
     - reorder: Reorder files
     - presigned_url: Get download URL
+    - presigned_urls: Get download URLs for many files
+    - bundle: Download all files of a submission as a ZIP
+    - metadata: Poll metadata extracted from a Word manuscript
     """
     
     permission_classes = [IsAuthenticated]
     serializer_class = ManuscriptFileSerializer
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         """
@@ -81,6 +101,9 @@ class ManuscriptFileViewSet(viewsets.ModelViewSet):
         
         Query params:
         - submission_id: Submission UUID (required)
+        - cursor / page_size: Switch to keyset pagination ordered by
+          newest upload (optional; default is the full list in display order)
+        - include_count: Include total count in paginated mode (optional)
         """
         submission_id = request.query_params.get('submission_id')
         
@@ -90,6 +113,14 @@ class ManuscriptFileViewSet(viewsets.ModelViewSet):
             )
         
         queryset = self.filter_queryset(self.get_queryset())
+        
+        # Keyset pagination mode (opt-in, the wizard needs the full list)
+        if 'cursor' in request.query_params or 'page_size' in request.query_params:
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+        
         serializer = self.get_serializer(queryset, many=True)
         
         return success_response(
@@ -132,8 +163,19 @@ class ManuscriptFileViewSet(viewsets.ModelViewSet):
                 _('Files can only be uploaded for draft or revision submissions.')
             )
         
+        # The body is parsed (and streamed through the upload handlers) here
+        add_validating_handler(request)
+        data = request.data
+        rejection = get_upload_rejection(request)
+        if rejection is not None:
+            return error_response(
+                message=rejection.message,
+                code=rejection.code,
+                status_code=rejection.status_code
+            )
+        
         serializer = self.get_serializer(
-            data=request.data,
+            data=data,
             context={
                 'request': request,
                 'submission': submission
@@ -194,20 +236,8 @@ class ManuscriptFileViewSet(viewsets.ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         
-        file_ids = serializer.validated_data['file_ids']
-        
-        # Update order
-        for order, file_id in enumerate(file_ids, start=1):
-            ManuscriptFile.objects.filter(
-                id=file_id,
-                submission=submission
-            ).update(order=order)
-        
-        # Return updated file list
-        files = ManuscriptFile.objects.filter(
-            submission=submission,
-            is_active=True
-        ).order_by('order')
+        # Single set-based UPDATE, returns the reordered list
+        files = serializer.save()
         
         return success_response(
             data=ManuscriptFileSerializer(files, many=True).data,
@@ -219,7 +249,8 @@ class ManuscriptFileViewSet(viewsets.ModelViewSet):
         """
         Get presigned download URL for a file.
         
-        Returns a temporary URL valid for 15 minutes.
+        Returns a temporary URL valid for 15 minutes (at least
+        PRESIGNED_URL_MIN_VALIDITY seconds when served from the cache).
         """
         instance = self.get_object()
         
@@ -229,14 +260,26 @@ class ManuscriptFileViewSet(viewsets.ModelViewSet):
                 _('You do not have permission to access this file.')
             )
         
+        if instance.scan_status == ManuscriptFile.ScanStatus.INFECTED:
+            return error_response(
+                message=_('This file failed the virus scan and has been quarantined.'),
+                code='FILE_QUARANTINED',
+                status_code=status.HTTP_403_FORBIDDEN
+            )
+        
         try:
-            download_url = instance.get_download_url(expiration=900)  # 15 minutes
+            # Cached URLs report their remaining validity
+            download_url, expires_in = ManuscriptFile.get_download_urls(
+                [instance], expiration=900  # 15 minutes
+            ).get(instance.pk, (None, 0))
+            
+            download_log.record([instance], request)
             
             return success_response(
                 data={
                     'file_id': str(instance.id),
                     'download_url': download_url,
-                    'expires_in': 900,
+                    'expires_in': expires_in,
                     'filename': instance.original_filename
                 },
                 message=_('Download URL generated successfully')
@@ -248,3 +291,573 @@ class ManuscriptFileViewSet(viewsets.ModelViewSet):
                 code='URL_GENERATION_ERROR',
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @action(detail=True, methods=['get'])
+    def metadata(self, request, pk=None):
+        """
+        Get metadata extracted from a main text / title page DOCX.
+        
+        Extraction runs in the background after upload; poll until
+        `status` is `done` (or `failed`). `pending` means the file is
+        queued, `unsupported` that it is not a Word manuscript.
+        """
+        instance = self.get_object()
+        
+        data = {'status': 'unsupported'}
+        if wants_metadata(instance):
+            data = (instance.checksum and get_metadata(instance.checksum)) or {'status': 'pending'}
+        
+        return success_response(
+            data={'file_id': str(instance.id), **data}
+        )
+    
+    @action(detail=False, methods=['post'])
+    def presigned_urls(self, request):
+        """
+        Get presigned download URLs for many files in one request.
+        
+        Request body:
+        {
+            "file_ids": ["uuid1", "uuid2", ...]
+        }
+        
+        Files that do not exist or belong to another user are
+        listed in `not_found`, quarantined files in `quarantined`.
+        """
+        serializer = PresignedUrlBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file_ids = serializer.validated_data['file_ids']
+        
+        # Single query, ownership enforced in the filter
+        files = {
+            f.id: f for f in ManuscriptFile.objects.filter(
+                id__in=file_ids,
+                is_active=True,
+                submission__submitter=request.user
+            )
+        }
+        
+        try:
+            with metrics.timer('presigned_url.batch'):
+                urls = ManuscriptFile.get_download_urls(files.values(), expiration=900)  # 15 minutes
+            metrics.observe('presigned_url.batch_size', len(files))
+        except Exception as e:
+            logger.error(f"Error generating presigned URLs: {str(e)}")
+            return error_response(
+                message=_('Failed to generate download URLs'),
+                code='URL_GENERATION_ERROR',
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        results = []
+        served = []
+        for file_id in file_ids:
+            instance = files.get(file_id)
+            if instance is None or instance.pk not in urls:
+                continue
+            download_url, expires_in = urls[instance.pk]
+            served.append(instance)
+            results.append({
+                'file_id': str(instance.id),
+                'download_url': download_url,
+                'expires_in': expires_in,
+                'filename': instance.original_filename
+            })
+        
+        download_log.record(served, request)
+        
+        return success_response(
+            data={
+                'files': results,
+                'not_found': [str(file_id) for file_id in file_ids if file_id not in files],
+                'quarantined': [
+                    str(f.id) for f in files.values()
+                    if f.scan_status == ManuscriptFile.ScanStatus.INFECTED
+                ],
+            },
+            message=_('Download URLs generated successfully')
+        )
+
+    @action(detail=False, methods=['get'])
+    def bundle(self, request):
+        """
+        Download all active files of a submission as one ZIP (streamed).
+        
+        Query params:
+        - submission_id: Submission UUID (required)
+        - revision: Only files of this revision number (optional)
+        
+        Files are ordered by file type and order; `manifest.json` lists
+        every entry with its SHA-256. Quarantined files are left out.
+        """
+        submission_id = request.query_params.get('submission_id')
+        
+        if not submission_id:
+            return validation_error_response(
+                _('submission_id parameter is required.')
+            )
+        
+        try:
+            submission = Submission.objects.get(id=submission_id)
+        except (Submission.DoesNotExist, ValueError, DjangoValidationError):
+            return not_found_response(
+                _('Submission not found.')
+            )
+        
+        # Authors download their own submissions, editors submitted ones
+        if not submission.can_be_read_by(request.user):
+            return forbidden_response(
+                _('You do not have permission to access these files.')
+            )
+        
+        files = ManuscriptFile.objects.filter(
+            submission=submission,
+            is_active=True
+        ).order_by('file_type', 'order', 'created_at')
+        
+        revision = request.query_params.get('revision')
+        if revision is not None:
+            try:
+                revision = int(revision)
+            except ValueError:
+                return validation_error_response(
+                    _('revision must be an integer.')
+                )
+            files = files.filter(revision_number=revision)
+        
+        files = list(files)
+        if not files:
+            return not_found_response(
+                _('No files found for this submission.')
+            )
+        
+        download_log.record(
+            [f for f in files if f.scan_status != ManuscriptFile.ScanStatus.INFECTED], request
+        )
+        
+        filename = f"{submission.manuscript_id or submission.id}_files"
+        if revision is not None:
+            filename += f"_rev{revision}"
+        
+        response = StreamingHttpResponse(
+            iter_bundle(submission, files, revision=revision),
+            content_type='application/zip'
+        )
+        response['Content-Disposition'] = content_disposition_header(
+            as_attachment=True, filename=f"{filename}.zip"
+        )
+        # Do not let proxies buffer the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class UploadSessionViewSet(viewsets.GenericViewSet):
+    """
+    ViewSet for resumable (chunked) uploads.
+    
+    Actions:
+    - create: Start an upload session
+    - retrieve: Get the current offset (HEAD/GET, to resume)
+    - partial_update: Upload a chunk (PATCH, raw body)
+    - destroy: Abort the upload
+    - finalize: Create the ManuscriptFile from the received chunks
+    - parts: Re-sign part URLs of a direct upload (resume)
+    
+    Sessions with mode=direct upload presigned multipart parts straight
+    to S3; finalize then verifies the object (see direct_uploads.py).
+    """
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = UploadSessionSerializer
+    
+    def get_queryset(self):
+        """Return the current user's upload sessions."""
+        return UploadSession.objects.filter(
+            uploaded_by=self.request.user
+        ).select_related('submission', 'uploaded_by')
+    
+    def _with_offset(self, response, session):
+        """Expose the session offset as a header (tus style)."""
+        response['Upload-Offset'] = str(session.offset)
+        response['Upload-Length'] = str(session.upload_length)
+        return response
+    
+    def create(self, request, *args, **kwargs):
+        """
+        Start a resumable upload.
+        
+        Required fields:
+        - original_filename: Name of the file
+        - upload_length: Total file size in bytes
+        - file_type: Type of file
+        - submission_id: Submission UUID (query param)
+        
+        Optional:
+        - mode: "chunked" (default) or "direct" (S3 multipart, response
+          contains presigned part URLs)
+        """
+        submission_id = request.query_params.get('submission_id')
+        
+        if not submission_id:
+            return validation_error_response(
+                _('submission_id parameter is required.')
+            )
+        
+        try:
+            submission = Submission.objects.get(id=submission_id)
+        except (Submission.DoesNotExist, ValueError, DjangoValidationError):
+            return not_found_response(
+                _('Submission not found.')
+            )
+        
+        # Check ownership
+        if submission.submitter != request.user:
+            return forbidden_response(
+                _('You do not have permission to upload files for this submission.')
+            )
+        
+        serializer = UploadSessionCreateSerializer(
+            data=request.data,
+            context={
+                'request': request,
+                'submission': submission
+            }
+        )
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save()
+        data = UploadSessionSerializer(session).data
+        
+        if session.mode == UploadSession.Mode.DIRECT:
+            try:
+                direct_uploads.initiate(session)
+                data['part_size'] = settings.DIRECT_UPLOAD_PART_SIZE
+                data['parts'] = direct_uploads.presign_parts(session)
+            except uploads.UploadSizeError as e:
+                session.delete()
+                return validation_error_response(str(e))
+            except Exception as e:
+                logger.error(f"Error starting direct upload: {str(e)}")
+                session.delete()
+                return error_response(
+                    message=_('Failed to start direct upload'),
+                    code='UPLOAD_INITIATE_ERROR',
+                    status_code=status.HTTP_502_BAD_GATEWAY
+                )
+        
+        response = created_response(
+            data=data,
+            message=_('Upload session created successfully')
+        )
+        response['Location'] = request.build_absolute_uri(f'{session.id}/')
+        return self._with_offset(response, session)
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Get upload progress (the offset to resume from)."""
+        session = self.get_object()
+        
+        response = success_response(
+            data=UploadSessionSerializer(session).data,
+            message=_('Upload session retrieved successfully')
+        )
+        response['Cache-Control'] = 'no-store'
+        return self._with_offset(response, session)
+    
+    def partial_update(self, request, *args, **kwargs):
+        """
+        Upload one chunk.
+        
+        Headers:
+        - Upload-Offset: Byte offset of this chunk (must match the session)
+        - Content-Length: Chunk size
+        - Upload-Checksum: "sha256 <base64 digest>" (optional)
+        
+        Body: raw chunk bytes (application/offset+octet-stream).
+        The body is streamed; request.data is never parsed.
+        """
+        session = self.get_object()
+        
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return validation_error_response(
+                _('Upload-Offset header is required.')
+            )
+        
+        try:
+            expected_digest = uploads.parse_checksum_header(
+                request.headers.get('Upload-Checksum')
+            )
+            session = uploads.write_chunk(
+                session,
+                request._request,
+                offset,
+                content_length,
+                expected_digest=expected_digest
+            )
+        except uploads.UploadOffsetError as e:
+            session.refresh_from_db(fields=['offset'])
+            return self._with_offset(error_response(
+                message=str(e),
+                code='UPLOAD_OFFSET_MISMATCH',
+                details={'offset': session.offset},
+                status_code=status.HTTP_409_CONFLICT
+            ), session)
+        except uploads.UploadStateError as e:
+            return error_response(
+                message=str(e),
+                code='UPLOAD_NOT_ACTIVE',
+                status_code=status.HTTP_409_CONFLICT
+            )
+        except uploads.UploadSizeError as e:
+            return error_response(
+                message=str(e),
+                code='UPLOAD_SIZE_ERROR',
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        except uploads.UploadChecksumError as e:
+            return error_response(
+                message=str(e),
+                code='UPLOAD_CHECKSUM_MISMATCH',
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        except uploads.UploadContentError as e:
+            return error_response(
+                message=str(e),
+                code='FILE_CONTENT_MISMATCH',
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        
+        response = success_response(
+            data={
+                'id': str(session.id),
+                'offset': session.offset,
+                'upload_length': session.upload_length,
+                'is_complete': session.is_complete,
+            },
+            message=_('Chunk uploaded successfully')
+        )
+        return self._with_offset(response, session)
+    
+    def destroy(self, request, *args, **kwargs):
+        """Abort the upload and delete received chunks."""
+        session = self.get_object()
+        
+        if not uploads.abort(session):
+            return error_response(
+                message=_('Upload session is not active.'),
+                code='UPLOAD_NOT_ACTIVE',
+                status_code=status.HTTP_409_CONFLICT
+            )
+        
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        """
+        Create the ManuscriptFile once every byte has been received.
+        """
+        session = self.get_object()
+        
+        if not session.submission.is_editable:
+            return validation_error_response(
+                _('Files can only be uploaded for draft or revision submissions.')
+            )
+        
+        if session.mode == UploadSession.Mode.DIRECT:
+            return self._complete_direct(request, session)
+        
+        try:
+            file_instance = uploads.finalize(session)
+        except uploads.UploadStateError as e:
+            return self._with_offset(error_response(
+                message=str(e),
+                code='UPLOAD_INCOMPLETE',
+                details={'offset': session.offset, 'upload_length': session.upload_length},
+                status_code=status.HTTP_409_CONFLICT
+            ), session)
+        except uploads.UploadContentError as e:
+            return error_response(
+                message=str(e),
+                code='FILE_CONTENT_MISMATCH',
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        except Exception as e:
+            logger.error(f"Error finalizing upload {session.id}: {str(e)}")
+            return error_response(
+                message=_('Failed to finalize upload'),
+                code='UPLOAD_FINALIZE_ERROR',
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return created_response(
+            data=ManuscriptFileSerializer(file_instance).data,
+            message=_('File uploaded successfully')
+        )
+    
+    def _complete_direct(self, request, session):
+        """
+        Complete a direct upload.
+        
+        Request body:
+        {
+            "parts": [{"part_number": 1, "etag": "..."}, ...]
+        }
+        """
+        serializer = DirectUploadCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            file_instance = direct_uploads.complete(
+                session, serializer.validated_data['parts']
+            )
+        except uploads.UploadStateError as e:
+            return error_response(
+                message=str(e),
+                code='UPLOAD_NOT_ACTIVE',
+                status_code=status.HTTP_409_CONFLICT
+            )
+        except (uploads.UploadSizeError, uploads.UploadChecksumError) as e:
+            return error_response(
+                message=str(e),
+                code='UPLOAD_VERIFICATION_FAILED',
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        except uploads.UploadContentError as e:
+            return error_response(
+                message=str(e),
+                code='FILE_CONTENT_MISMATCH',
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        except Exception as e:
+            logger.error(f"Error completing direct upload {session.id}: {str(e)}")
+            return error_response(
+                message=_('Failed to finalize upload'),
+                code='UPLOAD_FINALIZE_ERROR',
+                status_code=status.HTTP_502_BAD_GATEWAY
+            )
+        
+        return created_response(
+            data=ManuscriptFileSerializer(file_instance).data,
+            message=_('File uploaded successfully')
+        )
+    
+    @action(detail=True, methods=['get'])
+    def parts(self, request, pk=None):
+        """
+        Resume a direct upload: list received parts and re-sign the missing ones.
+        """
+        session = self.get_object()
+        
+        if session.mode != UploadSession.Mode.DIRECT:
+            return validation_error_response(
+                _('Only direct uploads have storage parts.')
+            )
+        
+        try:
+            uploaded = direct_uploads.list_uploaded_parts(session)
+            missing = [
+                number for number in range(1, direct_uploads.part_count(session) + 1)
+                if number not in uploaded
+            ]
+            part_urls = direct_uploads.presign_parts(session, missing) if missing else []
+        except uploads.UploadStateError as e:
+            return error_response(
+                message=str(e),
+                code='UPLOAD_NOT_ACTIVE',
+                status_code=status.HTTP_409_CONFLICT
+            )
+        except Exception as e:
+            logger.error(f"Error listing parts of upload {session.id}: {str(e)}")
+            return error_response(
+                message=_('Failed to list uploaded parts'),
+                code='UPLOAD_PARTS_ERROR',
+                status_code=status.HTTP_502_BAD_GATEWAY
+            )
+        
+        return success_response(
+            data={
+                'id': str(session.id),
+                'part_size': settings.DIRECT_UPLOAD_PART_SIZE,
+                'uploaded': [
+                    {'part_number': number, 'etag': part['etag'], 'size': part['size']}
+                    for number, part in sorted(uploaded.items())
+                ],
+                'parts': part_urls,
+            },
+            message=_('Upload parts retrieved successfully')
+        )
+
+
+class LocalFileDownloadView(APIView):
+    """
+    Serve a locally stored file (USE_S3=false).
+    
+    GET /files/{id}/content/?token=...
+    
+    Access with the signed token from the file's download URL, or as the
+    authenticated owner / an editor (not for drafts). The transfer itself
+    is handed to the web server (X-Accel-Redirect / X-Sendfile) or to
+    sendfile via FileResponse, with Range and If-None-Match support.
+    """
+    
+    # The signed token is the credential for plain links
+    permission_classes = [AllowAny]
+    
+    def get(self, request, file_id):
+        if settings.USE_S3:
+            raise Http404
+        
+        instance = ManuscriptFile.objects.select_related('submission').filter(
+            pk=file_id,
+            is_active=True
+        ).first()
+        if instance is None or not instance.file:
+            raise Http404
+        
+        token = request.query_params.get('token')
+        if token:
+            allowed = local_serving.check_token(token, instance)
+        else:
+            allowed = bool(instance.submission) and instance.submission.can_be_read_by(request.user)
+        
+        if not allowed:
+            return forbidden_response(
+                _('You do not have permission to access this file.')
+            )
+        
+        if instance.scan_status == ManuscriptFile.ScanStatus.INFECTED:
+            return error_response(
+                message=_('This file failed the virus scan and has been quarantined.'),
+                code='FILE_QUARANTINED',
+                status_code=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            return self.serve(request, instance)
+        except FileNotFoundError:
+            raise Http404
+    
+    def serve(self, request, instance):
+        return local_serving.serve(request, instance)
+
+
+class LocalFilePreviewView(LocalFileDownloadView):
+    """
+    Serve a locally stored preview of a figure (USE_S3=false).
+    
+    GET /files/{id}/preview/?variant=thumbnail&fmt=webp&token=...
+    
+    Same access rules and token as the file itself; the image is sent
+    inline so it can be used in <img>.
+    """
+    
+    def serve(self, request, instance):
+        name = get_derivative_name(
+            instance,
+            request.query_params.get('variant'),
+            request.query_params.get('fmt')
+        )
+        if name is None:
+            raise Http404
+        return local_serving.serve_derivative(request, instance, name)
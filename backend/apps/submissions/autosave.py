@@ -0,0 +1,285 @@
+"""
+TruEditor - Wizard Autosave Buffer
+==================================
+Coalesces rapid-fire wizard autosaves in the cache and writes them to the
+database in batches with `update_fields`.
+
+Flow:
+1. Each autosave applies JSON-Patch ops to the buffered `wizard_data` and
+   merges changed fields into a per-submission cache buffer.
+2. The buffer is flushed when it is older than AUTOSAVE_FLUSH_INTERVAL,
+   when the client asks for it, by a delayed Celery task (trailing flush),
+   or before any other action loads the submission (read-your-writes).
+3. A flush is a single UPDATE of only the dirty columns.
+
+Without a worker (eager mode) or a cache shared between processes
+(LocMemCache) nothing would flush the last save of a burst, so every
+autosave is written through immediately instead.
+
+Developer: Abdullah Dogan
+"""
+
+import copy
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = 'submission_autosave:{id}'
+LOCK_KEY = 'submission_autosave_lock:{id}'
+NON_SHARED_CACHES = ('LocMemCache', 'DummyCache')
+
+
+class AutosavePatchError(ValueError):
+    """Raised when a JSON-Patch operation cannot be applied."""
+
+
+class AutosaveBusyError(RuntimeError):
+    """Raised when the buffer lock cannot be acquired in time."""
+
+
+# ============================================
+# JSON PATCH (RFC 6902 subset: add, replace, remove)
+# ============================================
+
+def _parse_pointer(path):
+    """Split a JSON pointer ("/a/b/0") into unescaped tokens."""
+    if path == '':
+        return []
+    if not path.startswith('/'):
+        raise AutosavePatchError(f"Invalid path: {path}")
+    return [
+        token.replace('~1', '/').replace('~0', '~')
+        for token in path[1:].split('/')
+    ]
+
+
+def _list_index(container, token, allow_end=False):
+    """Convert a pointer token to a list index."""
+    if allow_end and token == '-':
+        return len(container)
+    try:
+        index = int(token)
+    except ValueError:
+        raise AutosavePatchError(f"Invalid list index: {token}")
+    upper = len(container) if allow_end else len(container) - 1
+    if index < 0 or index > upper:
+        raise AutosavePatchError(f"List index out of range: {token}")
+    return index
+
+
+def apply_json_patch(document, operations):
+    """
+    Apply JSON-Patch operations to a document.
+
+    Args:
+        document: JSON document (dict); not modified
+        operations: List of {"op", "path", "value"} dicts
+
+    Returns:
+        The patched document
+    """
+    document = copy.deepcopy(document)
+
+    for operation in operations:
+        op = operation.get('op')
+        tokens = _parse_pointer(operation.get('path', ''))
+
+        if not tokens:
+            if op in ('add', 'replace'):
+                document = copy.deepcopy(operation.get('value'))
+                continue
+            raise AutosavePatchError('Cannot remove the document root.')
+
+        parent = document
+        for token in tokens[:-1]:
+            if isinstance(parent, list):
+                parent = parent[_list_index(parent, token)]
+            elif isinstance(parent, dict) and token in parent:
+                parent = parent[token]
+            else:
+                raise AutosavePatchError(f"Path not found: {operation.get('path')}")
+
+        last = tokens[-1]
+        if isinstance(parent, dict):
+            if op in ('add', 'replace'):
+                if op == 'replace' and last not in parent:
+                    raise AutosavePatchError(f"Path not found: {operation.get('path')}")
+                parent[last] = copy.deepcopy(operation.get('value'))
+            elif op == 'remove':
+                if last not in parent:
+                    raise AutosavePatchError(f"Path not found: {operation.get('path')}")
+                del parent[last]
+            else:
+                raise AutosavePatchError(f"Unsupported operation: {op}")
+        elif isinstance(parent, list):
+            if op == 'add':
+                parent.insert(_list_index(parent, last, allow_end=True), copy.deepcopy(operation.get('value')))
+            elif op == 'replace':
+                parent[_list_index(parent, last)] = copy.deepcopy(operation.get('value'))
+            elif op == 'remove':
+                del parent[_list_index(parent, last)]
+            else:
+                raise AutosavePatchError(f"Unsupported operation: {op}")
+        else:
+            raise AutosavePatchError(f"Path not found: {operation.get('path')}")
+
+    return document
+
+
+# ============================================
+# BUFFER
+# ============================================
+
+@contextmanager
+def _buffer_lock(submission_id, wait=2.0):
+    """Short cache-based lock around buffer read-modify-write."""
+    key = LOCK_KEY.format(id=submission_id)
+    deadline = time.monotonic() + wait
+
+    while not cache.add(key, '1', timeout=10):
+        if time.monotonic() > deadline:
+            raise AutosaveBusyError('Autosave buffer is busy.')
+        time.sleep(0.02)
+
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+def _write(submission, buffer):
+    """Write buffered fields with a single UPDATE of the dirty columns."""
+    fields = buffer['fields']
+    if not fields:
+        return
+
+    for name, value in fields.items():
+        setattr(submission, name, value)
+
+    submission.save(update_fields=list(fields) + ['updated_at'])
+    logger.debug(
+        f"Autosave flushed {len(fields)} field(s) for submission {submission.pk} "
+        f"({buffer['writes']} coalesced save(s))"
+    )
+
+
+def _writes_through():
+    """
+    Check whether autosaves must skip the buffer.
+
+    Eager tasks ignore the countdown and a per-process cache is invisible
+    to the worker, so the trailing flush cannot be relied on.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    return settings.CELERY_TASK_ALWAYS_EAGER or backend.endswith(NON_SHARED_CACHES)
+
+
+def _schedule_flush(submission_id):
+    """Schedule the trailing flush; flush inline if the broker is down."""
+    from .tasks import flush_autosave_buffer
+
+    try:
+        flush_autosave_buffer.apply_async(
+            args=[str(submission_id)],
+            countdown=settings.AUTOSAVE_FLUSH_INTERVAL
+        )
+    except Exception as e:
+        logger.warning(f"Could not schedule autosave flush, flushing now: {str(e)}")
+        flush_pending_by_id(submission_id)
+
+
+def buffer_changes(submission, operations=None, fields=None, force_flush=False):
+    """
+    Buffer an autosave delta and flush it if due.
+
+    Args:
+        submission: Submission instance
+        operations: JSON-Patch ops against `wizard_data`
+        fields: Validated field values to set
+        force_flush: Write to the database immediately (always the
+            case in eager mode or with a non-shared cache)
+
+    Returns:
+        dict: Buffer state (`flushed`, `pending_fields`, `coalesced_saves`)
+    """
+    key = BUFFER_KEY.format(id=submission.pk)
+    now = time.time()
+    schedule = False
+
+    with _buffer_lock(submission.pk):
+        buffer = cache.get(key) or {'fields': {}, 'dirty_since': None, 'writes': 0}
+
+        if operations:
+            base = buffer['fields'].get('wizard_data', submission.wizard_data)
+            buffer['fields']['wizard_data'] = apply_json_patch(base, operations)
+
+        buffer['fields'].update(fields or {})
+        buffer['writes'] += 1
+
+        if buffer['dirty_since'] is None:
+            buffer['dirty_since'] = now
+            schedule = True
+
+        due = now - buffer['dirty_since'] >= settings.AUTOSAVE_FLUSH_INTERVAL
+        if force_flush or due or _writes_through():
+            _write(submission, buffer)
+            cache.delete(key)
+            flushed, schedule = True, False
+        else:
+            cache.set(key, buffer, timeout=settings.AUTOSAVE_BUFFER_TTL)
+            flushed = False
+
+    # Outside the lock: an eager task would otherwise wait on it
+    if schedule:
+        _schedule_flush(submission.pk)
+
+    return {
+        'flushed': flushed,
+        'pending_fields': [] if flushed else sorted(buffer['fields']),
+        'coalesced_saves': buffer['writes'],
+    }
+
+
+def flush_pending(submission):
+    """
+    Flush buffered autosave data for a loaded submission.
+
+    Costs one cache GET when nothing is pending.
+
+    Returns:
+        bool: True if data was written
+    """
+    key = BUFFER_KEY.format(id=submission.pk)
+    if cache.get(key) is None:
+        return False
+
+    with _buffer_lock(submission.pk):
+        buffer = cache.get(key)
+        if buffer is None:
+            return False
+        if submission.is_editable:
+            _write(submission, buffer)
+        cache.delete(key)
+
+    return True
+
+
+def flush_pending_by_id(submission_id):
+    """Flush buffered autosave data by submission ID (used by the task)."""
+    from .models import Submission
+
+    if cache.get(BUFFER_KEY.format(id=submission_id)) is None:
+        return False
+
+    try:
+        submission = Submission.objects.get(pk=submission_id)
+    except Submission.DoesNotExist:
+        cache.delete(BUFFER_KEY.format(id=submission_id))
+        return False
+
+    return flush_pending(submission)
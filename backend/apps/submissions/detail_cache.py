@@ -0,0 +1,118 @@
+"""
+TruEditor - Submission Detail Cache
+===================================
+Versioned read-through cache for serialized submission detail payloads.
+
+Keys:
+- submission_detail_version:{id}  -> version token, bumped by signals on
+                                     Submission / Author / ManuscriptFile writes
+- submission_detail:{id}          -> {"version", "owner", "data"}
+
+A hit fetches the version, the payload and the autosave buffer marker in a
+single cache round trip (get_many). Misses are rebuilt by one request at a
+time (stampede lock); concurrent requests wait briefly for that result.
+
+Developer: Abdullah Dogan
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.common import metrics
+from .autosave import BUFFER_KEY
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'submission_detail_version:{id}'
+PAYLOAD_KEY = 'submission_detail:{id}'
+LOCK_KEY = 'submission_detail_lock:{id}'
+
+LOCK_TIMEOUT = 10  # seconds
+LOCK_WAIT = 1.0  # seconds a request waits for another request's rebuild
+
+
+def bump_version(submission_id):
+    """Invalidate the cached payload of a submission."""
+    key = VERSION_KEY.format(id=submission_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Missing key: start from a fresh token so old payloads never match
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_version_on_commit(submission_id):
+    """
+    Invalidate after the current transaction commits, so a concurrent
+    reader cannot cache pre-commit data under the new version.
+    """
+    if submission_id is None:
+        return
+    transaction.on_commit(lambda: bump_version(submission_id))
+
+
+def get_or_build(submission_id, owner_id, builder):
+    """
+    Return the serialized detail payload of a submission.
+
+    Args:
+        submission_id: Submission UUID
+        owner_id: ID of the requesting user (cached payloads are owner-scoped)
+        builder: Callable loading and serializing the submission
+                 (raises if the user may not access it)
+
+    Returns:
+        dict: Serialized submission detail
+    """
+    version_key = VERSION_KEY.format(id=submission_id)
+    payload_key = PAYLOAD_KEY.format(id=submission_id)
+    buffer_key = BUFFER_KEY.format(id=submission_id)
+
+    values = cache.get_many([version_key, payload_key, buffer_key])
+    version = values.get(version_key)
+    payload = values.get(payload_key)
+
+    if (
+        version is not None
+        and payload is not None
+        and payload['version'] == version
+        and payload['owner'] == str(owner_id)
+        and buffer_key not in values
+    ):
+        metrics.incr('submission_detail_cache.hit')
+        return payload['data']
+
+    metrics.incr('submission_detail_cache.miss')
+
+    if version is None:
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+
+    lock_key = LOCK_KEY.format(id=submission_id)
+    if not cache.add(lock_key, '1', timeout=LOCK_TIMEOUT):
+        # Another request is rebuilding; wait for its result
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            payload = cache.get(payload_key)
+            if payload and payload['version'] == version and payload['owner'] == str(owner_id):
+                metrics.incr('submission_detail_cache.wait_hit')
+                return payload['data']
+        return builder()
+
+    try:
+        data = builder()
+        # Stored under the version read before building: a write that lands
+        # meanwhile bumps the version and simply turns this into a miss
+        cache.set(
+            payload_key,
+            {'version': version, 'owner': str(owner_id), 'data': data},
+            timeout=settings.SUBMISSION_DETAIL_CACHE_TTL
+        )
+        return data
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,107 @@
+"""
+TruEditor - PDF Render Benchmark
+================================
+Compares cold and warm render latency of a typical submission PDF
+(cover page, six authors, eight files; see pdf_renderer.sample_inputs).
+
+- cold process: first render in a fresh interpreter (a PDF worker
+  process without pre-warming; WeasyPrint and fonts load from scratch)
+- per render:   new font configuration, CSS and template for every
+                document, in an already running process
+- warm:         shared, pre-warmed Renderer (what PDF workers do)
+
+Usage:
+    python manage.py benchmark_pdf_render --runs 20 --cold-runs 3
+
+Developer: Abdullah Dogan
+"""
+
+import multiprocessing
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _cold_render(queue):
+    """Entry point of a fresh interpreter: set up Django, render once."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    started = time.perf_counter()
+
+    import django
+    django.setup()
+
+    from apps.submissions.pdf_renderer import Renderer, sample_inputs
+
+    Renderer().render(sample_inputs())
+    queue.put((time.perf_counter() - started) * 1000)
+
+
+def _summary(timings):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return statistics.median(ordered), p95, statistics.mean(ordered)
+
+
+class Command(BaseCommand):
+    """
+    Benchmark cold versus warm WeasyPrint renders.
+    """
+
+    help = 'Benchmark cold versus warm render latency of a typical submission PDF.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20, help='Renders per in-process mode')
+        parser.add_argument('--cold-runs', type=int, default=3, help='Fresh interpreters to start')
+
+    def handle(self, *args, **options):
+        try:
+            from apps.submissions.pdf_renderer import Renderer, sample_inputs
+            import weasyprint  # noqa: F401
+        except (ImportError, OSError) as e:
+            raise CommandError(f"WeasyPrint is not usable here: {e}")
+
+        inputs = sample_inputs()
+        results = []
+
+        cold = []
+        context = multiprocessing.get_context('spawn')
+        for _ in range(options['cold_runs']):
+            queue = context.Queue()
+            process = context.Process(target=_cold_render, args=(queue,))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise CommandError('Cold render process failed.')
+            cold.append(queue.get())
+        if cold:
+            results.append(('cold process', cold))
+
+        per_render = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            Renderer().render(inputs)
+            per_render.append((time.perf_counter() - started) * 1000)
+        results.append(('per render', per_render))
+
+        renderer = Renderer()
+        renderer.warm()
+        warm = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            _data, pages = renderer.render(inputs)
+            warm.append((time.perf_counter() - started) * 1000)
+        results.append(('warm', warm))
+
+        self.stdout.write(f"Sample document: {pages} page(s), renderer setup {renderer.setup_ms:.1f} ms")
+        self.stdout.write(f"{'Mode':<14} {'Runs':>5} {'Median ms':>10} {'p95 ms':>9} {'Mean ms':>9}")
+        for mode, timings in results:
+            median, p95, mean = _summary(timings)
+            self.stdout.write(f"{mode:<14} {len(timings):>5} {median:>10.1f} {p95:>9.1f} {mean:>9.1f}")
+
+        warm_median = _summary(warm)[0]
+        self.stdout.write(self.style.SUCCESS(
+            f"Warm renders are {_summary(per_render)[0] / warm_median:.1f}x faster than per-render setup"
+            + (f", {_summary(cold)[0] / warm_median:.1f}x faster than a cold process" if cold else '')
+        ))
@@ -0,0 +1,120 @@
+"""
+TruEditor - Submission List Benchmark
+=====================================
+Checks that the dashboard list endpoint (`GET /submissions/`) runs a
+constant number of queries, however many submissions, authors and files
+are listed. Runs inside a transaction that is rolled back, so no data
+is kept.
+
+Usage:
+    python manage.py benchmark_submission_list --sizes 5 10 20
+
+Developer: Abdullah Dogan
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.files.models import ManuscriptFile
+from apps.submissions.models import Author, Submission
+from apps.submissions.views import SubmissionViewSet
+from apps.users.models import User
+
+
+class _Rollback(Exception):
+    """Raised to roll back the benchmark transaction."""
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the submission list query count for increasing list sizes.
+    """
+
+    help = 'Check that the submission list query count does not depend on the number of submissions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[5, 10, 20],
+            help='Number of submissions to list (at most one default page)'
+        )
+
+    def handle(self, *args, **options):
+        sizes = options['sizes']
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        if max(sizes) > page_size:
+            raise CommandError(f'Sizes above the page size ({page_size}) are not one page.')
+
+        view = SubmissionViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        results = []
+
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['*']):
+                for index, size in enumerate(sizes):
+                    # A fresh user per size, so each list holds exactly `size` rows
+                    # (an unassigned-looking range, so it does not clash with dev users)
+                    user = User.objects.create_user(orcid_id=f'0000-0000-9999-{index:03d}X')
+                    for i in range(size):
+                        submission = Submission.objects.create(
+                            submitter=user, title=f'List benchmark {i}', abstract='-'
+                        )
+                        Author.objects.bulk_create([
+                            Author(
+                                submission=submission,
+                                given_name='Author',
+                                family_name=str(order),
+                                email=f'author{order}@example.org',
+                                order=order,
+                                is_corresponding=order == 1,
+                            )
+                            for order in range(1, 4)
+                        ])
+                        # bulk_create skips save(), so no real files are needed
+                        ManuscriptFile.objects.bulk_create([
+                            ManuscriptFile(
+                                submission=submission,
+                                file=f'benchmark/file_{i}_{n}.docx',
+                                file_type=ManuscriptFile.FileType.MAIN_TEXT,
+                                original_filename=f'file_{n}.docx',
+                                order=n,
+                            )
+                            for n in range(1, 3)
+                        ])
+
+                    request = factory.get('/api/v1/submissions/')
+                    force_authenticate(request, user=user)
+
+                    started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as queries:
+                        response = view(request)
+                        response.render()
+                    elapsed = (time.perf_counter() - started) * 1000
+
+                    listed = len(response.data['results'])
+                    if response.status_code != 200 or listed != size:
+                        raise CommandError(f'Expected {size} submissions, got {listed} ({response.status_code}).')
+
+                    # Savepoint statements are bookkeeping, not work
+                    statements = [
+                        q for q in queries.captured_queries
+                        if 'SAVEPOINT' not in q['sql'].upper()
+                    ]
+                    results.append((size, len(statements), elapsed))
+
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'Submissions':>11} {'Queries':>8} {'Time (ms)':>10}")
+        for size, query_count, elapsed in results:
+            self.stdout.write(f"{size:>11} {query_count:>8} {elapsed:>10.2f}")
+
+        if len({query_count for _, query_count, _ in results}) > 1:
+            raise CommandError('Query count depends on the number of submissions.')
+
+        self.stdout.write(self.style.SUCCESS('OK: constant number of queries.'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0002_alter_author_options_alter_submission_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['submitter', '-created_at', '-id'], name='submissions_submitt_c22afb_idx'),
+        ),
+    ]
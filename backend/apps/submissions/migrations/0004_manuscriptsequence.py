@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:52
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    """Start each year's counter after the highest existing manuscript ID."""
+    Submission = apps.get_model('submissions', 'Submission')
+    ManuscriptSequence = apps.get_model('submissions', 'ManuscriptSequence')
+    
+    last_numbers = {}
+    for manuscript_id in Submission.objects.filter(
+        manuscript_id__startswith='TRU-'
+    ).values_list('manuscript_id', flat=True):
+        try:
+            _, year, number = manuscript_id.split('-')
+            year, number = int(year), int(number)
+        except ValueError:
+            continue
+        last_numbers[year] = max(last_numbers.get(year, 0), number)
+    
+    ManuscriptSequence.objects.bulk_create([
+        ManuscriptSequence(year=year, last_number=number)
+        for year, number in last_numbers.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0003_submission_submissions_submitt_c22afb_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ManuscriptSequence',
+            fields=[
+                ('year', models.PositiveSmallIntegerField(primary_key=True, serialize=False, verbose_name='Year')),
+                ('last_number', models.PositiveIntegerField(default=0, help_text='Last manuscript number allocated for this year', verbose_name='Last Number')),
+            ],
+            options={
+                'verbose_name': 'Manuscript Sequence',
+                'verbose_name_plural': 'Manuscript Sequences',
+            },
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
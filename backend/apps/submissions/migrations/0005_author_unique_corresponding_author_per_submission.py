@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def keep_first_corresponding(apps, schema_editor):
+    """Keep only the first corresponding author per submission."""
+    Author = apps.get_model('submissions', 'Author')
+    
+    seen = set()
+    duplicates = []
+    for pk, submission_id in Author.objects.filter(
+        is_corresponding=True
+    ).order_by('submission_id', 'order').values_list('pk', 'submission_id'):
+        if submission_id in seen:
+            duplicates.append(pk)
+        seen.add(submission_id)
+    
+    Author.objects.filter(pk__in=duplicates).update(is_corresponding=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0004_manuscriptsequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_first_corresponding, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='author',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_corresponding', True)), fields=('submission',), name='unique_corresponding_author_per_submission'),
+        ),
+    ]
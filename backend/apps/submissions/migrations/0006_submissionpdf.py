@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:32
+
+import apps.submissions.models
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0005_author_unique_corresponding_author_per_submission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionPDF',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('content_hash', models.CharField(help_text='SHA-256 of the PDF inputs', max_length=64, verbose_name='Content Hash')),
+                ('file', models.FileField(max_length=500, upload_to=apps.submissions.models.submission_pdf_path, verbose_name='File')),
+                ('file_size', models.PositiveBigIntegerField(default=0, verbose_name='File Size')),
+                ('page_count', models.PositiveIntegerField(default=0, verbose_name='Page Count')),
+                ('render_time_ms', models.PositiveIntegerField(default=0, verbose_name='Render Time (ms)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pdfs', to='submissions.submission', verbose_name='Submission')),
+            ],
+            options={
+                'verbose_name': 'Submission PDF',
+                'verbose_name_plural': 'Submission PDFs',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(fields=('submission', 'content_hash'), name='unique_submission_pdf_hash')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:36
+
+import apps.submissions.models
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0006_submissionpdf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFFragment',
+            fields=[
+                ('key', models.CharField(help_text='SHA-256 of the fragment inputs', max_length=64, primary_key=True, serialize=False, verbose_name='Key')),
+                ('kind', models.CharField(choices=[('cover', 'Cover'), ('cover_letter', 'Cover Letter'), ('document', 'Document'), ('spreadsheet', 'Spreadsheet'), ('image', 'Image'), ('pdf', 'PDF'), ('placeholder', 'Placeholder'), ('page_numbers', 'Page Numbers')], max_length=20, verbose_name='Kind')),
+                ('file', models.FileField(max_length=500, upload_to=apps.submissions.models.pdf_fragment_path, verbose_name='File')),
+                ('file_size', models.PositiveBigIntegerField(default=0, verbose_name='File Size')),
+                ('page_count', models.PositiveIntegerField(default=0, verbose_name='Page Count')),
+                ('render_time_ms', models.PositiveIntegerField(default=0, verbose_name='Render Time (ms)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Last Used At')),
+            ],
+            options={
+                'verbose_name': 'PDF Fragment',
+                'verbose_name_plural': 'PDF Fragments',
+            },
+        ),
+    ]
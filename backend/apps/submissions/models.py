@@ -8,13 +8,92 @@ Developer: Abdullah Dogan
 """
 
 import uuid
-from django.db import models
+from django.apps import apps
+from django.db import connection, models, transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.utils import timezone
+from django.utils.http import content_disposition_header
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django_fsm import FSMField, transition
 
+from .detail_cache import bump_version_on_commit
+
+
+class SubmissionQuerySet(models.QuerySet):
+    """
+    Custom QuerySet for submissions.
+    """
+    
+    def with_counts(self):
+        """
+        Annotate author, corresponding author and active file counts.
+        
+        Counts are correlated subqueries (no JOIN fan-out), so they can be
+        combined freely and still cost a single SELECT.
+        """
+        # Resolved lazily: files app imports this module
+        ManuscriptFile = apps.get_model('files', 'ManuscriptFile')
+        
+        return self.annotate(
+            annotated_author_count=_count_subquery(Author.objects.all()),
+            annotated_corresponding_count=_count_subquery(
+                Author.objects.filter(is_corresponding=True)
+            ),
+            annotated_file_count=_count_subquery(
+                ManuscriptFile.objects.filter(is_active=True)
+            ),
+        )
+    
+    def with_readiness_counts(self):
+        """
+        Annotate everything the readiness rules need: the counts from
+        `with_counts` plus active files still awaiting or failing the
+        virus scan.
+        """
+        ManuscriptFile = apps.get_model('files', 'ManuscriptFile')
+        active_files = ManuscriptFile.objects.filter(is_active=True)
+        
+        return self.with_counts().annotate(
+            annotated_unscanned_file_count=_count_subquery(
+                active_files.filter(scan_status__in=[
+                    ManuscriptFile.ScanStatus.PENDING,
+                    ManuscriptFile.ScanStatus.SCANNING,
+                ])
+            ),
+            annotated_infected_file_count=_count_subquery(
+                active_files.filter(scan_status=ManuscriptFile.ScanStatus.INFECTED)
+            ),
+        )
+    
+    def with_list_summary(self):
+        """
+        Annotate dashboard summary data in the main query.
+        
+        Adds the counts from `with_counts` and prefetches only the
+        corresponding author, so listing a page costs a constant number
+        of queries.
+        """
+        return self.with_counts().prefetch_related(
+            Prefetch(
+                'authors',
+                queryset=Author.objects.filter(is_corresponding=True).order_by('order'),
+                to_attr='corresponding_authors'
+            )
+        )
+
+
+def _count_subquery(queryset):
+    """Return a COUNT(*) subquery of related rows for the outer submission."""
+    counts = queryset.filter(
+        submission=OuterRef('pk')
+    ).order_by().values('submission').annotate(
+        total=Count('pk')
+    ).values('total')
+    return Coalesce(Subquery(counts), 0)
+
 
 class Submission(models.Model):
     """
@@ -304,6 +383,8 @@ class Submission(models.Model):
         help_text=_('Date when the manuscript was published')
     )
     
+    objects = SubmissionQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('Submission')
         verbose_name_plural = _('Submissions')
@@ -315,6 +396,8 @@ class Submission(models.Model):
             models.Index(fields=['assigned_editor']),
             models.Index(fields=['created_at']),
             models.Index(fields=['submitted_at']),
+            # Keyset pagination: WHERE submitter = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['submitter', '-created_at', '-id']),
         ]
     
     def __str__(self):
@@ -330,25 +413,13 @@ class Submission(models.Model):
         """
         Generate a unique manuscript ID.
         Format: TRU-YYYY-NNNN
+        
+        The number comes from the per-year ManuscriptSequence counter,
+        which is advanced atomically (safe under concurrent submits).
         """
         year = timezone.now().year
-        prefix = f"TRU-{year}-"
-        
-        # Find the last number for this year
-        last_submission = Submission.objects.filter(
-            manuscript_id__startswith=prefix
-        ).order_by('-manuscript_id').first()
-        
-        if last_submission:
-            try:
-                last_number = int(last_submission.manuscript_id.split('-')[-1])
-                new_number = last_number + 1
-            except (ValueError, IndexError):
-                new_number = 1
-        else:
-            new_number = 1
-        
-        return f"{prefix}{new_number:04d}"
+        new_number = ManuscriptSequence.next_value(year)
+        return f"TRU-{year}-{new_number:04d}"
     
     # ============================================
     # FSM STATE TRANSITIONS
@@ -460,18 +531,37 @@ class Submission(models.Model):
             self.Status.REVISION_REQUIRED
         ]
     
+    def can_be_read_by(self, user):
+        """
+        Check if a user may read the submission's files: the submitter
+        always, editors once it has left DRAFT.
+        """
+        if not user.is_authenticated:
+            return False
+        if self.submitter_id == user.pk:
+            return True
+        return (user.is_editor or user.is_chief_editor) and self.status != self.Status.DRAFT
+    
     @property
     def author_count(self):
         """Return the number of authors."""
+        if hasattr(self, 'annotated_author_count'):
+            return self.annotated_author_count
         return self.authors.count()
     
     @property
     def file_count(self):
-        """Return the number of files."""
-        return self.files.count()
+        """Return the number of active files."""
+        if hasattr(self, 'annotated_file_count'):
+            return self.annotated_file_count
+        if 'files' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum(1 for f in self.files.all() if f.is_active)
+        return self.files.filter(is_active=True).count()
     
     def get_corresponding_author(self):
         """Return the corresponding author."""
+        if hasattr(self, 'corresponding_authors'):
+            return self.corresponding_authors[0] if self.corresponding_authors else None
         return self.authors.filter(is_corresponding=True).first()
     
     def get_status_history(self):
@@ -479,6 +569,69 @@ class Submission(models.Model):
         return self.status_history.all().order_by('-created_at')
 
 
+class ManuscriptSequence(models.Model):
+    """
+    Per-year manuscript number counter.
+    
+    One row per year; `next_value` increments it in a single atomic
+    statement, so concurrent submissions never get the same number and
+    allocation cost does not grow with the number of submissions.
+    """
+    
+    year = models.PositiveSmallIntegerField(
+        _('Year'),
+        primary_key=True
+    )
+    
+    last_number = models.PositiveIntegerField(
+        _('Last Number'),
+        default=0,
+        help_text=_('Last manuscript number allocated for this year')
+    )
+    
+    class Meta:
+        verbose_name = _('Manuscript Sequence')
+        verbose_name_plural = _('Manuscript Sequences')
+    
+    def __str__(self):
+        return f"{self.year}: {self.last_number}"
+    
+    @classmethod
+    def next_value(cls, year):
+        """
+        Allocate the next manuscript number for a year.
+        
+        PostgreSQL and SQLite (3.35+) use one upsert statement
+        (INSERT ... ON CONFLICT DO UPDATE ... RETURNING), which takes the
+        row lock and returns the new value in a single round trip.
+        Other backends fall back to SELECT ... FOR UPDATE.
+        
+        Args:
+            year: Calendar year of the sequence
+        
+        Returns:
+            int: Newly allocated number (1-based)
+        """
+        if connection.vendor in ('postgresql', 'sqlite'):
+            table = connection.ops.quote_name(cls._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {table} (year, last_number) VALUES (%s, 1) "
+                    f"ON CONFLICT (year) DO UPDATE "
+                    f"SET last_number = {table}.last_number + 1 "
+                    f"RETURNING last_number",
+                    [year]
+                )
+                return cursor.fetchone()[0]
+        
+        with transaction.atomic():
+            cls.objects.get_or_create(year=year)
+            sequence = cls.objects.select_for_update().get(year=year)
+            sequence.last_number += 1
+            sequence.save(update_fields=['last_number'])
+            return sequence.last_number
+
+
 class Author(models.Model):
     """
     Author Model.
@@ -612,6 +765,9 @@ class Author(models.Model):
         auto_now=True
     )
     
+    # Temporary offset used while renumbering, keeps (submission, order) unique
+    ORDER_SHIFT = 10000
+    
     class Meta:
         verbose_name = _('Author')
         verbose_name_plural = _('Authors')
@@ -622,6 +778,13 @@ class Author(models.Model):
             models.Index(fields=['email']),
             models.Index(fields=['orcid_id']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['submission'],
+                condition=models.Q(is_corresponding=True),
+                name='unique_corresponding_author_per_submission',
+            ),
+        ]
     
     def __str__(self):
         role = " (Corresponding)" if self.is_corresponding else ""
@@ -643,19 +806,57 @@ class Author(models.Model):
         return ", ".join(filter(None, parts))
     
     def save(self, *args, **kwargs):
-        """Perform validations before saving."""
+        """
+        Perform validations before saving.
+        
+        The single corresponding author rule is enforced by a partial
+        unique constraint; use `release_corresponding` before switching.
+        """
         # Sync ORCID ID from linked user
         if self.user and not self.orcid_id:
             self.orcid_id = self.user.orcid_id
         
         super().save(*args, **kwargs)
+    
+    @classmethod
+    def release_corresponding(cls, submission, exclude_pk=None):
+        """Clear the corresponding flag on a submission's other authors."""
+        queryset = cls.objects.filter(submission=submission, is_corresponding=True)
+        if exclude_pk is not None:
+            queryset = queryset.exclude(pk=exclude_pk)
+        queryset.update(is_corresponding=False)
+        bump_version_on_commit(submission.pk)
+    
+    @classmethod
+    def renumber(cls, submission, ordered_ids=None):
+        """
+        Renumber a submission's authors to 1..n in set-based statements.
+        
+        All rows are first shifted out of the way in one UPDATE, then
+        given their final order in one CASE WHEN UPDATE (bulk_update), so
+        the (submission, order) unique constraint never sees a duplicate.
+        
+        Args:
+            submission: Submission instance
+            ordered_ids: Author IDs in the desired order (default: current order)
+        """
+        if ordered_ids is None:
+            ordered_ids = list(
+                cls.objects.filter(submission=submission)
+                .order_by('order').values_list('id', flat=True)
+            )
+        if not ordered_ids:
+            return
         
-        # Ensure only one corresponding author
-        if self.is_corresponding:
-            Author.objects.filter(
-                submission=self.submission,
-                is_corresponding=True
-            ).exclude(pk=self.pk).update(is_corresponding=False)
+        with transaction.atomic():
+            bump_version_on_commit(submission.pk)
+            cls.objects.filter(submission=submission).update(
+                order=models.F('order') + cls.ORDER_SHIFT
+            )
+            cls.objects.bulk_update(
+                [cls(id=pk, order=order) for order, pk in enumerate(ordered_ids, start=1)],
+                ['order']
+            )
 
 
 class SubmissionStatusHistory(models.Model):
@@ -713,3 +914,191 @@ class SubmissionStatusHistory(models.Model):
     
     def __str__(self):
         return f"{self.submission.manuscript_id}: {self.from_status} → {self.to_status}"
+
+
+def submission_pdf_path(instance, filename):
+    """
+    Storage path of a generated PDF.
+    Kept outside `submissions/` (swept by the file garbage collector).
+    """
+    return f"pdfs/{instance.submission_id}/{instance.content_hash}.pdf"
+
+
+class SubmissionPDF(models.Model):
+    """
+    Generated submission PDF.
+    
+    Identified by the hash of everything that feeds the PDF (see
+    apps.submissions.pdf.content_hash): an unchanged draft maps to the
+    same row and is never rendered twice.
+    """
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    
+    submission = models.ForeignKey(
+        Submission,
+        on_delete=models.CASCADE,
+        related_name='pdfs',
+        verbose_name=_('Submission')
+    )
+    
+    content_hash = models.CharField(
+        _('Content Hash'),
+        max_length=64,
+        help_text=_('SHA-256 of the PDF inputs')
+    )
+    
+    file = models.FileField(
+        _('File'),
+        upload_to=submission_pdf_path,
+        max_length=500
+    )
+    
+    file_size = models.PositiveBigIntegerField(
+        _('File Size'),
+        default=0
+    )
+    
+    page_count = models.PositiveIntegerField(
+        _('Page Count'),
+        default=0
+    )
+    
+    render_time_ms = models.PositiveIntegerField(
+        _('Render Time (ms)'),
+        default=0
+    )
+    
+    created_at = models.DateTimeField(
+        _('Created At'),
+        auto_now_add=True
+    )
+    
+    class Meta:
+        verbose_name = _('Submission PDF')
+        verbose_name_plural = _('Submission PDFs')
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['submission', 'content_hash'],
+                name='unique_submission_pdf_hash'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.submission_id}: {self.content_hash[:12]}"
+    
+    # Attributes used by apps.files.local_serving
+    mime_type = 'application/pdf'
+    
+    @property
+    def checksum(self):
+        return self.content_hash
+    
+    @property
+    def original_filename(self):
+        return f"{self.submission.manuscript_id or 'submission'}.pdf"
+    
+    def sign_download_url(self, expiration=900):
+        """
+        Sign a download URL (S3 presigned URL, or the local content view).
+        """
+        if settings.USE_S3:
+            try:
+                return self.file.storage.url(
+                    self.file.name,
+                    parameters={'ResponseContentDisposition': content_disposition_header(
+                        as_attachment=True,
+                        filename=self.original_filename
+                    )},
+                    expire=expiration
+                )
+            except TypeError:
+                pass
+        
+        from apps.files.local_serving import make_download_url
+        return make_download_url(self, expiration, view_name='submission-pdf-content')
+
+
+def pdf_fragment_path(instance, filename):
+    """
+    Storage path of a PDF fragment.
+    Named by its key only: fragments are shared across submissions.
+    """
+    return f"pdfs/fragments/{instance.key[:2]}/{instance.key}.pdf"
+
+
+class PDFFragment(models.Model):
+    """
+    Rendered part of a submission PDF (cover, cover letter, converted file).
+    
+    Identified by the hash of the part's own inputs (see
+    apps.submissions.pdf_fragments): a part is rendered once and merged
+    into every PDF that contains it.
+    """
+    
+    class Kind(models.TextChoices):
+        COVER = 'cover', _('Cover')
+        COVER_LETTER = 'cover_letter', _('Cover Letter')
+        DOCUMENT = 'document', _('Document')
+        SPREADSHEET = 'spreadsheet', _('Spreadsheet')
+        IMAGE = 'image', _('Image')
+        PDF = 'pdf', _('PDF')
+        PLACEHOLDER = 'placeholder', _('Placeholder')
+        PAGE_NUMBERS = 'page_numbers', _('Page Numbers')
+    
+    key = models.CharField(
+        _('Key'),
+        max_length=64,
+        primary_key=True,
+        help_text=_('SHA-256 of the fragment inputs')
+    )
+    
+    kind = models.CharField(
+        _('Kind'),
+        max_length=20,
+        choices=Kind.choices
+    )
+    
+    file = models.FileField(
+        _('File'),
+        upload_to=pdf_fragment_path,
+        max_length=500
+    )
+    
+    file_size = models.PositiveBigIntegerField(
+        _('File Size'),
+        default=0
+    )
+    
+    page_count = models.PositiveIntegerField(
+        _('Page Count'),
+        default=0
+    )
+    
+    render_time_ms = models.PositiveIntegerField(
+        _('Render Time (ms)'),
+        default=0
+    )
+    
+    created_at = models.DateTimeField(
+        _('Created At'),
+        auto_now_add=True
+    )
+    
+    last_used_at = models.DateTimeField(
+        _('Last Used At'),
+        default=timezone.now,
+        db_index=True
+    )
+    
+    class Meta:
+        verbose_name = _('PDF Fragment')
+        verbose_name_plural = _('PDF Fragments')
+    
+    def __str__(self):
+        return f"{self.kind}: {self.key[:12]}"
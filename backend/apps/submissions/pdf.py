@@ -0,0 +1,380 @@
+"""
+TruEditor - Submission PDF
+==========================
+Builds the submission PDF (WeasyPrint) in the `generate_submission_pdf`
+Celery task, with content-hash caching. The PDF is merged from cached
+per-part fragments (pdf_fragments.py); rendering goes through the
+process-wide renderer in pdf_renderer.py.
+
+Everything that feeds the PDF (submission fields, ordered author list,
+active files by checksum, template and stylesheet sources) is collected
+into one document dict, and its SHA-256 identifies the PDF. The same
+dict feeds the fragment keys and templates, so the hash covers exactly
+what is rendered. A PDF for a hash is built once (SubmissionPDF is unique per
+submission and hash):
+
+- `build_pdf` on an unchanged draft finds the existing PDF and answers
+  immediately without queueing anything
+- repeated clicks while a render is running join that task
+- only an edit that changes the document produces a new render
+
+Build tasks record their state in the cache (Redis in production):
+queued, running with a stage (converting files k/n, rendering,
+uploading), done or failed. It is read by the owner-scoped task endpoint,
+which can long-poll it for a short while (`wait_for_task_state`).
+
+Developer: Abdullah Dogan
+"""
+
+import hashlib
+import json
+import logging
+import math
+import time
+import uuid
+from functools import cache as memoize
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.template.loader import get_template
+from django.utils import timezone
+
+from apps.common import metrics
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_NAME = 'submissions/pdf/submission.html'
+COVER_LETTER_TEMPLATE_NAME = 'submissions/pdf/cover_letter.html'
+FRAGMENT_TEMPLATE_NAME = 'submissions/pdf/fragment.html'
+PAGE_NUMBERS_TEMPLATE_NAME = 'submissions/pdf/page_numbers.html'
+TEMPLATE_NAMES = [TEMPLATE_NAME, COVER_LETTER_TEMPLATE_NAME, FRAGMENT_TEMPLATE_NAME, PAGE_NUMBERS_TEMPLATE_NAME]
+STYLESHEET_NAME = 'submissions/pdf/submission.css'
+
+BUILD_LOCK_KEY = 'submission_pdf:build:{submission_id}:{digest}'
+BUILD_LOCK_TIMEOUT = 900
+TASK_STATE_KEY = 'submission_pdf:task:{task_id}'
+TASK_STATE_TIMEOUT = 3600
+
+# Older PDFs of a submission are dropped beyond this many
+KEEP_VERSIONS = 3
+
+
+class PDFBuildError(Exception):
+    """The PDF could not be rendered."""
+
+
+# ============================================
+# INPUTS
+# ============================================
+
+@memoize
+def layout_fingerprint():
+    """Hash of the template and stylesheet sources (a layout change re-renders)."""
+    digest = hashlib.sha256()
+    for name in [*TEMPLATE_NAMES, STYLESHEET_NAME]:
+        with open(get_template(name).origin.name, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def collect_inputs(submission):
+    """
+    Collect everything the PDF shows.
+
+    Uses the prefetched `authors` and `files` if present, so the build
+    endpoint hashes a draft with the queries that loaded it.
+
+    Returns:
+        dict: JSON-serializable document (also the template context)
+    """
+    ManuscriptFile = submission.files.model
+
+    authors = sorted(submission.authors.all(), key=lambda author: author.order)
+    files = sorted(
+        (
+            f for f in submission.files.all()
+            # Quarantined files are not part of the manuscript
+            if f.is_active and f.scan_status != ManuscriptFile.ScanStatus.INFECTED
+        ),
+        key=lambda f: (f.file_type, f.order, f.created_at)
+    )
+
+    return {
+        'layout': layout_fingerprint(),
+        'submission': {
+            'id': str(submission.pk),
+            'manuscript_id': submission.manuscript_id or '',
+            'title': submission.title,
+            'title_en': submission.title_en,
+            'abstract': submission.abstract,
+            'abstract_en': submission.abstract_en,
+            'keywords': list(submission.keywords or []),
+            'keywords_en': list(submission.keywords_en or []),
+            'article_type': str(submission.get_article_type_display()),
+            'language': submission.language,
+            'language_display': str(submission.get_language_display()),
+            'cover_letter': submission.cover_letter,
+            'ethics_statement': submission.ethics_statement,
+            'ethics_approval_number': submission.ethics_approval_number,
+            'conflict_of_interest': submission.conflict_of_interest,
+            'funding_statement': submission.funding_statement,
+            'revision_number': submission.revision_number,
+        },
+        'authors': [
+            {
+                'name': author.full_name,
+                'orcid_id': author.orcid_id or '',
+                'email': author.email or '',
+                'affiliation': author.affiliation,
+                'is_corresponding': author.is_corresponding,
+                'contribution': author.contribution,
+            }
+            for author in authors
+        ],
+        'files': [
+            {
+                'id': str(f.pk),
+                'file_type': f.file_type,
+                'file_type_display': str(f.get_file_type_display()),
+                'original_filename': f.original_filename,
+                'description': f.description,
+                'caption': f.caption,
+                'file_size': f.file_size,
+                # Content identity: checksum, else the stored object (legacy files)
+                'content': f.checksum or f"{f.file.name}:{f.file_size}",
+            }
+            for f in files
+        ],
+    }
+
+
+def content_hash(inputs):
+    """Return the SHA-256 identifying a document."""
+    canonical = json.dumps(inputs, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+# ============================================
+# RENDERING
+# ============================================
+
+def render(context, template_name=None):
+    """
+    Render a template to PDF bytes with this process' shared renderer.
+
+    Args:
+        context: Template context
+        template_name: One of TEMPLATE_NAMES (default: the cover page)
+
+    Returns:
+        tuple: (pdf bytes, page count)
+    """
+    from .pdf_renderer import get_renderer
+
+    try:
+        return get_renderer().render(context, template_name)
+    except Exception as e:
+        raise PDFBuildError(str(e))
+
+
+def _no_progress(stage, done=None, total=None):
+    pass
+
+
+def build(submission, progress=None):
+    """
+    Return the PDF of a submission's current state, rendering it if needed.
+
+    Args:
+        submission: Submission (authors and files prefetched if possible)
+        progress: Callback `(stage, done=None, total=None)` for the stages
+            converting (parts done/total), rendering and uploading
+
+    Returns:
+        tuple: (SubmissionPDF, rendered)
+    """
+    progress = progress or _no_progress
+    from .models import SubmissionPDF
+    from .pdf_fragments import assemble, plan
+
+    inputs = collect_inputs(submission)
+    digest = content_hash(inputs)
+
+    existing = SubmissionPDF.objects.filter(submission=submission, content_hash=digest).first()
+    if existing is not None:
+        metrics.incr('submission_pdf.cache_hit')
+        return existing, False
+
+    metrics.incr('submission_pdf.cache_miss')
+    started = time.monotonic()
+    with metrics.timer('submission_pdf.render'):
+        # Only parts not rendered before are rendered; the rest is merged
+        data, page_count, fragments_rendered = assemble(plan(submission, inputs), progress=progress)
+    metrics.observe('submission_pdf.fragments_rendered', fragments_rendered)
+
+    progress('uploading')
+
+    pdf = SubmissionPDF(
+        submission=submission,
+        content_hash=digest,
+        file_size=len(data),
+        page_count=page_count,
+        render_time_ms=int((time.monotonic() - started) * 1000),
+    )
+    pdf.file.save(f"{digest}.pdf", ContentFile(data), save=False)
+
+    try:
+        with transaction.atomic():
+            pdf.save()
+    except IntegrityError:
+        # A concurrent build stored the same document first
+        pdf.file.delete(save=False)
+        return SubmissionPDF.objects.get(submission=submission, content_hash=digest), False
+
+    # Objects are deleted on commit (post_delete signal)
+    for old in SubmissionPDF.objects.filter(submission=submission)[KEEP_VERSIONS:]:
+        old.delete()
+
+    metrics.observe('submission_pdf.bytes', len(data))
+    return pdf, True
+
+
+# ============================================
+# TASK STATE
+# ============================================
+
+def get_task_state(task_id):
+    """Return the recorded state of a build task, or None if unknown/expired."""
+    return cache.get(TASK_STATE_KEY.format(task_id=task_id))
+
+
+def set_task_state(task_id, submission_id, owner_id, status, **extra):
+    """
+    Record the state of a build task.
+
+    Args:
+        task_id: Build task ID
+        submission_id: Submission UUID
+        owner_id: Submitter's user ID (the only user who may read the state)
+        status: queued, running, done or failed
+        **extra: stage/progress (running), pdf_id/content_hash (done), error (failed)
+    """
+    cache.set(
+        TASK_STATE_KEY.format(task_id=task_id),
+        {
+            'submission_id': str(submission_id),
+            'owner_id': str(owner_id),
+            'status': status,
+            'updated_at': timezone.now().isoformat(),
+            **extra
+        },
+        timeout=TASK_STATE_TIMEOUT
+    )
+
+
+def progress_reporter(task_id, submission):
+    """Return a `build` progress callback recording the running task's stage."""
+    def report(stage, done=None, total=None):
+        extra = {'stage': stage}
+        if total is not None:
+            extra['progress'] = {'done': done, 'total': total}
+        set_task_state(task_id, submission.pk, submission.submitter_id, 'running', **extra)
+    return report
+
+
+def is_task_owner(state, user):
+    """Check whether a user may read a task state."""
+    return state is not None and user.is_authenticated and state.get('owner_id') == str(user.pk)
+
+
+def task_data(task_id, state):
+    """Return a task state as API data (with the PDF once done)."""
+    from .models import SubmissionPDF
+
+    data = {'task_id': str(task_id), **state}
+    data.pop('owner_id', None)
+    if state.get('pdf_id'):
+        generated = SubmissionPDF.objects.filter(pk=state['pdf_id']).first()
+        data['pdf'] = pdf_data(generated) if generated else None
+    return data
+
+
+def wait_for_task_state(task_id, since, timeout):
+    """
+    Long-poll a task state from the cache.
+
+    Returns as soon as the state is no longer the one recorded at `since`
+    (its `updated_at`), the task has finished or expired, or `timeout`
+    seconds have passed. `timeout` is capped at PDF_TASK_WAIT_MAX_SECONDS
+    (non-finite values count as 0): the request holds a web worker thread
+    while it waits.
+
+    Returns:
+        dict: Current state, or None if unknown/expired
+    """
+    if not math.isfinite(timeout):
+        timeout = 0
+    timeout = min(max(timeout, 0), settings.PDF_TASK_WAIT_MAX_SECONDS)
+    deadline = time.monotonic() + timeout
+    while True:
+        state = get_task_state(task_id)
+        if (
+            state is None
+            or state.get('updated_at') != since
+            or state['status'] in ('done', 'failed')
+            or time.monotonic() >= deadline
+        ):
+            return state
+        time.sleep(settings.PDF_TASK_POLL_INTERVAL)
+
+
+# ============================================
+# SCHEDULING
+# ============================================
+
+
+def release_build(submission_id, digest):
+    """Allow a new build of a document (after its task finished)."""
+    cache.delete(BUILD_LOCK_KEY.format(submission_id=submission_id, digest=digest))
+
+
+def schedule(submission, digest):
+    """
+    Queue a build of a document unless one is already queued or running.
+
+    Args:
+        submission: Submission instance
+        digest: content_hash of its current inputs
+
+    Returns:
+        str: ID of the task building this document
+    """
+    from .tasks import generate_submission_pdf
+
+    key = BUILD_LOCK_KEY.format(submission_id=submission.pk, digest=digest)
+    task_id = str(uuid.uuid4())
+
+    if not cache.add(key, task_id, timeout=BUILD_LOCK_TIMEOUT):
+        running = cache.get(key)
+        if running:
+            metrics.incr('submission_pdf.joined')
+            return running
+        cache.set(key, task_id, timeout=BUILD_LOCK_TIMEOUT)
+
+    set_task_state(task_id, submission.pk, submission.submitter_id, 'queued')
+    generate_submission_pdf.apply_async(args=[str(submission.pk), digest], task_id=task_id)
+    return task_id
+
+
+def pdf_data(pdf, expiration=900):
+    """Return a SubmissionPDF as API data (with a download URL)."""
+    return {
+        'id': str(pdf.pk),
+        'content_hash': pdf.content_hash,
+        'file_size': pdf.file_size,
+        'page_count': pdf.page_count,
+        'created_at': pdf.created_at.isoformat(),
+        'download_url': pdf.sign_download_url(expiration),
+    }
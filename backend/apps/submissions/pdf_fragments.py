@@ -0,0 +1,520 @@
+"""
+TruEditor - PDF Fragments
+=========================
+The submission PDF is assembled from separately rendered parts: the
+cover (title, authors, abstract, statements, file list), the cover
+letter and the converted manuscript files (title page, main text,
+tables, figures, in that order).
+
+Each part is rendered once into a PDF fragment (PDFFragment), keyed by
+the SHA-256 of its own inputs. Files are keyed by content checksum (plus
+caption, converter version, PDF_DPI and layout), not by row, so the same
+content is converted once across drafts, revisions and submissions. A
+build renders only the fragments it has not seen and merges the rest
+with pypdf, which involves no layout work: editing the cover letter
+re-renders the cover letter page, not the figures.
+
+Converters:
+- .docx: python-docx to HTML (headings, paragraphs, runs, tables and
+  inline images)
+- images: decoded with Pillow and scaled to the text width at PDF_DPI
+- .xlsx: openpyxl (cell values, first rows per sheet) to HTML tables
+- .pdf: merged as uploaded
+- anything else (.doc, .xls, ...) or content that fails to decode: a
+  placeholder page pointing to the original file
+
+Page numbers run across the assembled PDF, so they are stamped after the
+merge from a page-number overlay (itself a cached fragment per page count).
+
+Developer: Abdullah Dogan
+"""
+
+import base64
+import io
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.translation import gettext as _
+from PIL import Image, ImageOps
+
+from apps.common import metrics
+from apps.files.derivatives import to_rgb
+from .models import PDFFragment
+from .pdf import (
+    COVER_LETTER_TEMPLATE_NAME, FRAGMENT_TEMPLATE_NAME, PAGE_NUMBERS_TEMPLATE_NAME, TEMPLATE_NAME,
+    PDFBuildError, content_hash, layout_fingerprint, render,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when a converter changes its output (re-converts every file)
+CONVERTER_VERSION = 1
+
+# File types converted into the PDF, in this order; the others are only listed on the cover
+PART_FILE_TYPES = ['title_page', 'main_text', 'tables', 'figures']
+
+FILE_KINDS = {
+    '.docx': PDFFragment.Kind.DOCUMENT,
+    '.xlsx': PDFFragment.Kind.SPREADSHEET,
+    '.pdf': PDFFragment.Kind.PDF,
+    **{ext: PDFFragment.Kind.IMAGE for ext in ('.jpg', '.jpeg', '.png', '.gif', '.tiff', '.tif', '.bmp')},
+}
+
+# A4 minus the page margins of submission.css
+TEXT_WIDTH_IN = (210 - 2 * 20) / 25.4
+JPEG_QUALITY = 90
+
+MAX_SHEET_ROWS = 1000
+MAX_SHEET_COLUMNS = 40
+
+HEADING_TAGS = {
+    'Title': 'h1',
+    'Subtitle': 'h2',
+    'Heading 1': 'h2',
+    'Heading 2': 'h3',
+    'Heading 3': 'h4',
+    'Heading 4': 'h5',
+}
+
+
+# ============================================
+# PLAN
+# ============================================
+
+def _part(kind, title, template_name, context, source=None):
+    context = {'kind': kind, **context}
+    return {
+        'key': content_hash(context),
+        'kind': kind,
+        'title': title,
+        'template_name': template_name,
+        'context': context,
+        'source': source,
+    }
+
+
+def plan(submission, inputs):
+    """
+    List the parts of a submission PDF in document order.
+
+    Args:
+        submission: Submission (files prefetched if possible)
+        inputs: apps.submissions.pdf.collect_inputs(submission)
+
+    Returns:
+        list: Part dicts (key, kind, title, template_name, context, source)
+    """
+    layout = inputs['layout']
+    fields = inputs['submission']
+
+    parts = [_part(
+        PDFFragment.Kind.COVER,
+        _('Cover'),
+        TEMPLATE_NAME,
+        # The cover letter is a part of its own
+        {**inputs, 'submission': {k: v for k, v in fields.items() if k != 'cover_letter'}}
+    )]
+
+    if fields['cover_letter']:
+        parts.append(_part(
+            PDFFragment.Kind.COVER_LETTER,
+            _('Cover Letter'),
+            COVER_LETTER_TEMPLATE_NAME,
+            {'layout': layout, 'language': fields['language'], 'cover_letter': fields['cover_letter']}
+        ))
+
+    sources = {str(f.pk): f for f in submission.files.all()}
+    entries = sorted(
+        (entry for entry in inputs['files'] if entry['file_type'] in PART_FILE_TYPES),
+        key=lambda entry: PART_FILE_TYPES.index(entry['file_type'])
+    )
+    for entry in entries:
+        extension = os.path.splitext(entry['original_filename'])[1].lower()
+        parts.append(_part(
+            FILE_KINDS.get(extension, PDFFragment.Kind.PLACEHOLDER),
+            entry['original_filename'],
+            FRAGMENT_TEMPLATE_NAME,
+            {
+                'layout': layout,
+                'converter': CONVERTER_VERSION,
+                'dpi': settings.PDF_DPI,
+                'extension': extension,
+                'content': entry['content'],
+                'caption': entry['caption'],
+            },
+            source=sources[entry['id']]
+        ))
+
+    return parts
+
+
+# ============================================
+# CONVERTERS
+# ============================================
+
+def scale_image(data):
+    """
+    Decode an image and scale it down to the text width at PDF_DPI.
+
+    Returns:
+        dict: src (data URI), width_in (printed width in inches)
+    """
+    dpi = settings.PDF_DPI
+    max_width = round(TEXT_WIDTH_IN * dpi)
+
+    image = Image.open(io.BytesIO(data))
+    lossless = image.format in ('PNG', 'GIF', 'BMP') or image.mode in ('1', 'P')
+    # JPEG decodes directly at a reduced scale
+    image.draft('RGB', (max_width, max_width))
+    image.load()
+    ImageOps.exif_transpose(image, in_place=True)
+    image = to_rgb(image)
+
+    if image.width > max_width:
+        height = max(1, round(image.height * max_width / image.width))
+        image = image.resize((max_width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    buffer = io.BytesIO()
+    if lossless:
+        # Line art and charts stay sharp
+        image.save(buffer, 'PNG', optimize=True)
+        mime_type = 'image/png'
+    else:
+        image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+        mime_type = 'image/jpeg'
+
+    return {
+        'src': f"data:{mime_type};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}",
+        'width_in': round(image.width / dpi, 3),
+    }
+
+
+def _image_tag(data):
+    try:
+        image = scale_image(data)
+    except Exception as e:
+        # E.g. EMF/WMF drawings, which Pillow cannot decode
+        logger.info(f"Skipped embedded image: {str(e)}")
+        return ''
+    return f'<img src="{image["src"]}" style="width: {image["width_in"]}in">'
+
+
+def _runs_html(paragraph, document):
+    from docx.oxml.ns import qn
+    from docx.text.hyperlink import Hyperlink
+
+    html = []
+    for item in paragraph.iter_inner_content():
+        runs = item.runs if isinstance(item, Hyperlink) else [item]
+        for run in runs:
+            for blip in run.element.iter(qn('a:blip')):
+                part = document.part.related_parts.get(blip.get(qn('r:embed')))
+                if part is not None:
+                    html.append(_image_tag(part.blob))
+
+            text = escape(run.text).replace('\n', '<br>')
+            if not text:
+                continue
+            if run.font.superscript:
+                text = f'<sup>{text}</sup>'
+            elif run.font.subscript:
+                text = f'<sub>{text}</sub>'
+            if run.italic:
+                text = f'<em>{text}</em>'
+            if run.bold:
+                text = f'<strong>{text}</strong>'
+            html.append(text)
+    return ''.join(html)
+
+
+def _paragraph_html(paragraph, document):
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    content = _runs_html(paragraph, document)
+    if not content.strip():
+        return ''
+
+    style = paragraph.style.name if paragraph.style is not None else ''
+    tag = HEADING_TAGS.get(style, 'p')
+    if style.startswith('List'):
+        content = f'&bull; {content}'
+
+    alignment = {WD_ALIGN_PARAGRAPH.CENTER: ' class="center"', WD_ALIGN_PARAGRAPH.RIGHT: ' class="right"'}
+    return f'<{tag}{alignment.get(paragraph.alignment, "")}>{content}</{tag}>'
+
+
+def _table_html(table, document):
+    rows = []
+    for row in table.rows:
+        # Horizontally merged cells are repeated by python-docx
+        cells = []
+        for cell in row.cells:
+            if cells and cells[-1][0]._tc is cell._tc:
+                cells[-1][1] += 1
+            else:
+                cells.append([cell, 1])
+        rows.append('<tr>%s</tr>' % ''.join(
+            '<td%s>%s</td>' % (
+                f' colspan="{span}"' if span > 1 else '',
+                ''.join(_paragraph_html(p, document) for p in cell.paragraphs)
+            )
+            for cell, span in cells
+        ))
+    return f"<table>{''.join(rows)}</table>"
+
+
+def docx_to_html(data):
+    """Convert a .docx document body to HTML."""
+    from docx import Document
+    from docx.oxml.ns import qn
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = Document(io.BytesIO(data))
+    html = []
+    for child in document.element.body.iterchildren():
+        if child.tag == qn('w:p'):
+            html.append(_paragraph_html(Paragraph(child, document), document))
+        elif child.tag == qn('w:tbl'):
+            html.append(_table_html(Table(child, document), document))
+    return ''.join(html)
+
+
+def _cell_html(value):
+    if value is None:
+        return '<td></td>'
+    if isinstance(value, bool):
+        return f'<td>{value}</td>'
+    if isinstance(value, (int, float)):
+        if isinstance(value, float):
+            value = int(value) if value.is_integer() else f'{value:.10g}'
+        return f'<td class="number">{value}</td>'
+    if isinstance(value, datetime):
+        value = value.date() if value.time() == datetime.min.time() else value.isoformat(sep=' ')
+    if isinstance(value, date):
+        value = value.isoformat()
+    return f'<td>{escape(value)}</td>'
+
+
+def xlsx_to_html(data):
+    """Convert the worksheets of an .xlsx workbook to HTML tables."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        sheets = []
+        for sheet in workbook.worksheets:
+            rows = []
+            truncated = False
+            for index, row in enumerate(sheet.iter_rows(values_only=True)):
+                if index >= MAX_SHEET_ROWS:
+                    truncated = True
+                    break
+                rows.append(row[:MAX_SHEET_COLUMNS])
+
+            # Trailing empty rows and columns
+            while rows and all(value is None for value in rows[-1]):
+                rows.pop()
+            if not rows:
+                continue
+            width = max(
+                max((i + 1 for i, value in enumerate(row) if value is not None), default=0) for row in rows
+            )
+
+            header, *body = [list(row[:width]) + [None] * (width - len(row[:width])) for row in rows]
+            html = [
+                f'<div class="sheet"><h3>{escape(sheet.title)}</h3><table>',
+                '<tr>%s</tr>' % ''.join(f'<th>{escape("" if v is None else v)}</th>' for v in header),
+                *('<tr>%s</tr>' % ''.join(_cell_html(v) for v in row) for row in body),
+                '</table>',
+            ]
+            if truncated:
+                html.append('<p class="truncated">%s</p>' % escape(
+                    _('Only the first %(rows)d rows are shown.') % {'rows': MAX_SHEET_ROWS}
+                ))
+            html.append('</div>')
+            sheets.append(''.join(html))
+        return ''.join(sheets)
+    finally:
+        workbook.close()
+
+
+def pdf_page_count(data):
+    """Check that uploaded PDF content can be merged and return its page count."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    if reader.is_encrypted:
+        raise ValueError('PDF is encrypted')
+    return len(reader.pages)
+
+
+# ============================================
+# FRAGMENTS
+# ============================================
+
+def _read_source(manuscript_file):
+    try:
+        with manuscript_file.file.open('rb') as stored:
+            return stored.read()
+    except OSError as e:
+        # Not a conversion failure: nothing is cached
+        raise PDFBuildError(f"Could not read {manuscript_file.original_filename}: {str(e)}")
+
+
+def convert(part):
+    """
+    Render a part to PDF.
+
+    Content that cannot be converted becomes a placeholder page.
+
+    Returns:
+        tuple: (kind, pdf bytes, page count)
+    """
+    kind = part['kind']
+    context = dict(part['context'])
+    source = part['source']
+
+    if source is not None and kind != PDFFragment.Kind.PLACEHOLDER:
+        data = _read_source(source)
+        try:
+            if kind == PDFFragment.Kind.PDF:
+                return kind, data, pdf_page_count(data)
+            if kind == PDFFragment.Kind.IMAGE:
+                context['image'] = scale_image(data)
+            elif kind == PDFFragment.Kind.DOCUMENT:
+                context['body'] = docx_to_html(data)
+            elif kind == PDFFragment.Kind.SPREADSHEET:
+                context['body'] = xlsx_to_html(data)
+        except Exception as e:
+            logger.warning(f"Could not convert {source.original_filename} ({source.pk}): {str(e)}")
+            metrics.incr('submission_pdf.conversion_failed')
+            kind = PDFFragment.Kind.PLACEHOLDER
+            context['kind'] = kind
+
+    data, page_count = render(context, part['template_name'])
+    return kind, data, page_count
+
+
+def store(key, kind, data, page_count, render_time_ms):
+    """Save a rendered fragment (or return the one a concurrent build saved first)."""
+    fragment = PDFFragment(
+        key=key,
+        kind=kind,
+        file_size=len(data),
+        page_count=page_count,
+        render_time_ms=render_time_ms,
+    )
+    fragment.file.save(f"{key}.pdf", ContentFile(data), save=False)
+
+    try:
+        with transaction.atomic():
+            fragment.save(force_insert=True)
+    except IntegrityError:
+        fragment.file.delete(save=False)
+        return PDFFragment.objects.get(pk=key)
+    return fragment
+
+
+def get_fragments(parts, progress=None):
+    """
+    Return the fragments of the given parts, rendering the missing ones.
+
+    Args:
+        parts: Part dicts (see `plan`)
+        progress: Optional callback, called as ('converting', done, total)
+            at the start and after each rendered part
+
+    Returns:
+        tuple: ({key: PDFFragment}, number of fragments rendered)
+    """
+    fragments = PDFFragment.objects.in_bulk([part['key'] for part in parts])
+    rendered = 0
+    if progress:
+        progress('converting', 0, len(parts))
+
+    for index, part in enumerate(parts, 1):
+        if part['key'] in fragments:
+            metrics.incr('submission_pdf.fragment_hit')
+            continue
+        metrics.incr('submission_pdf.fragment_miss')
+        started = time.monotonic()
+        with metrics.timer('submission_pdf.fragment_render'):
+            kind, data, page_count = convert(part)
+        fragments[part['key']] = store(
+            part['key'], kind, data, page_count, int((time.monotonic() - started) * 1000)
+        )
+        rendered += 1
+        if progress:
+            progress('converting', index, len(parts))
+
+    PDFFragment.objects.filter(pk__in=list(fragments)).update(last_used_at=timezone.now())
+    return fragments, rendered
+
+
+def _read_fragment(fragment):
+    with fragment.file.open('rb') as stored:
+        return io.BytesIO(stored.read())
+
+
+def assemble(parts, progress=None):
+    """
+    Merge the fragments of `parts` into one PDF with continuous page numbers.
+
+    Args:
+        parts: Part dicts (see `plan`)
+        progress: Optional build progress callback (converting, rendering)
+
+    Returns:
+        tuple: (pdf bytes, page count, number of fragments rendered)
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    fragments, rendered = get_fragments(parts, progress=progress)
+    if progress:
+        progress('rendering')
+
+    with metrics.timer('submission_pdf.merge'):
+        writer = PdfWriter()
+        for part in parts:
+            writer.append(_read_fragment(fragments[part['key']]), outline_item=part['title'])
+        page_count = len(writer.pages)
+
+        numbers_part = _part(
+            PDFFragment.Kind.PAGE_NUMBERS,
+            '',
+            PAGE_NUMBERS_TEMPLATE_NAME,
+            {'layout': layout_fingerprint(), 'pages': list(range(page_count))}
+        )
+        numbers, numbers_rendered = get_fragments([numbers_part])
+        overlay = PdfReader(_read_fragment(numbers[numbers_part['key']]))
+        if len(overlay.pages) == page_count:
+            for page, number in zip(writer.pages, overlay.pages):
+                page.merge_page(number)
+        else:
+            logger.warning(f"Page number overlay has {len(overlay.pages)} page(s), expected {page_count}")
+
+        buffer = io.BytesIO()
+        writer.write(buffer)
+
+    return buffer.getvalue(), page_count, rendered + numbers_rendered
+
+
+def cleanup_fragments():
+    """
+    Delete fragments no build used for PDF_FRAGMENT_RETENTION_DAYS.
+
+    Returns:
+        int: Number of fragments deleted
+    """
+    cutoff = timezone.now() - timedelta(days=settings.PDF_FRAGMENT_RETENTION_DAYS)
+    # Objects are deleted on commit (post_delete signal)
+    deleted, _per_model = PDFFragment.objects.filter(last_used_at__lt=cutoff).delete()
+    return deleted
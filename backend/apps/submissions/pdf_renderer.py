@@ -0,0 +1,191 @@
+"""
+TruEditor - PDF Renderer
+========================
+Long-lived WeasyPrint renderer shared by all PDF builds of a process.
+
+Setting up WeasyPrint is a large share of a short render: building the
+font configuration (fontconfig + the @font-face fonts in
+WEASYPRINT_FONT_DIR), parsing the stylesheet and compiling the templates.
+The Renderer does that once and reuses the FontConfiguration, the parsed
+CSS and the compiled templates for every fragment (see pdf_fragments.py).
+
+PDF workers (CELERY_WORKER_PROFILE=pdf) build and warm the renderer in
+each pool process at startup (`worker_process_init`), so even the first
+task of a process renders warm. Processes are recycled by Celery once
+they exceed PDF_WORKER_MAX_MEMORY_KB or PDF_WORKER_MAX_TASKS (see
+core/celery.py), which also bounds the growth of the font caches.
+
+Benchmark: python manage.py benchmark_pdf_render
+
+Developer: Abdullah Dogan
+"""
+
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.template.loader import get_template, render_to_string
+
+logger = logging.getLogger(__name__)
+
+FONT_EXTENSIONS = {'.ttf': 'truetype', '.otf': 'opentype', '.woff': 'woff', '.woff2': 'woff2'}
+# File name suffix -> (font-weight, font-style), e.g. NotoSerif-BoldItalic.ttf
+FONT_STYLES = {
+    'regular': ('normal', 'normal'),
+    'italic': ('normal', 'italic'),
+    'bold': ('bold', 'normal'),
+    'bolditalic': ('bold', 'italic'),
+}
+
+
+def font_face_rules(font_dir=None):
+    """
+    Return @font-face rules for the fonts shipped in WEASYPRINT_FONT_DIR.
+
+    Files are named `Family-Style.ext` (Style: Regular, Italic, Bold,
+    BoldItalic); the family is usable in the stylesheet by that name.
+    """
+    font_dir = font_dir or settings.WEASYPRINT_FONT_DIR
+    if not os.path.isdir(font_dir):
+        return ''
+
+    rules = []
+    for filename in sorted(os.listdir(font_dir)):
+        stem, extension = os.path.splitext(filename)
+        if extension.lower() not in FONT_EXTENSIONS:
+            continue
+        family, _sep, style = stem.partition('-')
+        weight, font_style = FONT_STYLES.get(style.lower(), ('normal', 'normal'))
+        path = os.path.join(os.path.abspath(font_dir), filename)
+        rules.append(
+            f"@font-face {{ font-family: '{family}'; font-weight: {weight}; font-style: {font_style}; "
+            f"src: url('file://{path}') format('{FONT_EXTENSIONS[extension.lower()]}'); }}"
+        )
+    return '\n'.join(rules)
+
+
+class Renderer:
+    """
+    WeasyPrint set up once: font configuration, parsed CSS, compiled templates.
+    """
+
+    def __init__(self):
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        from .pdf import STYLESHEET_NAME, TEMPLATE_NAMES
+
+        started = time.perf_counter()
+        self.font_config = FontConfiguration()
+        self.templates = {name: get_template(name) for name in TEMPLATE_NAMES}
+        self.stylesheets = [CSS(
+            string=font_face_rules() + '\n' + render_to_string(STYLESHEET_NAME),
+            font_config=self.font_config
+        )]
+        self.base_url = str(settings.WEASYPRINT_FONT_DIR)
+        self.renders = 0
+        self.setup_ms = (time.perf_counter() - started) * 1000
+
+    def render(self, context, template_name=None):
+        """
+        Render a template to PDF.
+
+        Args:
+            context: Template context (default template: the cover page,
+                see apps.submissions.pdf.collect_inputs)
+            template_name: One of apps.submissions.pdf.TEMPLATE_NAMES
+
+        Returns:
+            tuple: (pdf bytes, page count)
+        """
+        from weasyprint import HTML
+
+        from .pdf import TEMPLATE_NAME
+
+        html = self.templates[template_name or TEMPLATE_NAME].render(context)
+        document = HTML(string=html, base_url=self.base_url).render(
+            stylesheets=self.stylesheets,
+            font_config=self.font_config
+        )
+        self.renders += 1
+        return document.write_pdf(dpi=settings.PDF_DPI), len(document.pages)
+
+    def warm(self):
+        """Render a sample document so fonts are loaded and shaped before real work."""
+        started = time.perf_counter()
+        self.render(sample_inputs())
+        return (time.perf_counter() - started) * 1000
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """Return this process' renderer, creating it on first use."""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = Renderer()
+    return _renderer
+
+
+def prewarm():
+    """Create and warm this process' renderer (PDF worker startup)."""
+    renderer = get_renderer()
+    warm_ms = renderer.warm()
+    logger.info(f"PDF renderer ready (pid {os.getpid()}): setup {renderer.setup_ms:.0f} ms, warm-up {warm_ms:.0f} ms")
+
+
+def sample_inputs():
+    """A typical submission document (cover page, six authors, eight files)."""
+    abstract = ' '.join(['Background and aims of the study are described in detail.'] * 30)
+    return {
+        'layout': 'sample',
+        'submission': {
+            'id': '00000000-0000-0000-0000-000000000000',
+            'manuscript_id': 'TRU-2026-0001',
+            'title': 'Long-term outcomes of a randomized trial: a multicentre cohort analysis',
+            'title_en': '',
+            'abstract': abstract,
+            'abstract_en': '',
+            'keywords': ['cohort', 'randomized trial', 'outcomes', 'follow-up', 'mortality'],
+            'keywords_en': [],
+            'article_type': 'Research Article',
+            'language': 'en',
+            'language_display': 'English',
+            'cover_letter': '\n'.join(['Dear Editor, we submit our manuscript for consideration.'] * 12),
+            'ethics_statement': 'Approved by the institutional ethics committee.',
+            'ethics_approval_number': '2026/042',
+            'conflict_of_interest': 'None declared.',
+            'funding_statement': 'No external funding.',
+            'revision_number': 0,
+        },
+        'authors': [
+            {
+                'name': f'Author {i} Surname',
+                'orcid_id': f'0000-0002-1825-00{i:02d}',
+                'email': f'author{i}@example.org',
+                'affiliation': 'Department of Medicine, Example University, Ankara, Türkiye',
+                'is_corresponding': i == 1,
+                'contribution': '',
+            }
+            for i in range(1, 7)
+        ],
+        'files': [
+            {
+                'id': f'00000000-0000-0000-0000-00000000000{i}',
+                'file_type': 'figures',
+                'file_type_display': 'Figures',
+                'original_filename': f'figure_{i}.tif',
+                'description': '',
+                'caption': f'Figure {i}. Outcome by group.',
+                'file_size': 2_500_000,
+                'content': f'sample-{i}',
+            }
+            for i in range(1, 9)
+        ],
+    }
@@ -0,0 +1,162 @@
+"""
+TruEditor - Submission Readiness Checks
+=======================================
+Completeness rules shared by the approve/submit actions and the
+wizard's readiness endpoint.
+
+All facts a rule needs are gathered in one aggregated query
+(`Submission.objects.with_readiness_counts()`), and every failing rule
+is reported, not just the first one.
+
+Developer: Abdullah Dogan
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+
+from .models import Submission
+
+
+@dataclass
+class ReadinessRule:
+    """A single completeness rule."""
+    code: str
+    field: str
+    message: str
+    check: Callable[[dict], bool]
+
+
+@dataclass
+class ReadinessIssue:
+    """A failed readiness rule."""
+    code: str
+    field: str
+    message: str
+
+    def to_dict(self) -> dict:
+        """Return the issue in the API error details format."""
+        return {
+            'code': self.code,
+            'field': self.field,
+            'message': str(self.message),
+        }
+
+
+@dataclass
+class ReadinessReport:
+    """Result of running all readiness rules on a submission."""
+    submission_id: str
+    facts: dict
+    issues: List[ReadinessIssue] = field(default_factory=list)
+
+    @property
+    def is_ready(self) -> bool:
+        """Return True if no rule failed."""
+        return not self.issues
+
+    def issue_details(self) -> List[dict]:
+        """Return failing rules as a list of dicts."""
+        return [issue.to_dict() for issue in self.issues]
+
+    def to_dict(self) -> dict:
+        """Return the report as API response data."""
+        return {
+            'submission_id': self.submission_id,
+            'is_ready': self.is_ready,
+            'facts': self.facts,
+            'issues': self.issue_details(),
+        }
+
+
+READINESS_RULES = [
+    ReadinessRule(
+        code='TITLE_REQUIRED',
+        field='title',
+        message=_('Title is required.'),
+        check=lambda facts: bool(facts['has_title']),
+    ),
+    ReadinessRule(
+        code='ABSTRACT_REQUIRED',
+        field='abstract',
+        message=_('Abstract is required.'),
+        check=lambda facts: bool(facts['has_abstract']),
+    ),
+    ReadinessRule(
+        code='AUTHOR_REQUIRED',
+        field='authors',
+        message=_('At least one author is required.'),
+        check=lambda facts: facts['author_count'] > 0,
+    ),
+    ReadinessRule(
+        code='FILE_REQUIRED',
+        field='files',
+        message=_('At least one file is required.'),
+        check=lambda facts: facts['active_file_count'] > 0,
+    ),
+    ReadinessRule(
+        code='CORRESPONDING_AUTHOR_REQUIRED',
+        field='authors',
+        message=_('At least one corresponding author is required.'),
+        check=lambda facts: facts['corresponding_author_count'] > 0,
+    ),
+    ReadinessRule(
+        code='FILE_SCAN_PENDING',
+        field='files',
+        message=_('Files are still being checked for viruses. Please try again shortly.'),
+        check=lambda facts: not settings.VIRUS_SCAN_ENABLED or facts['unscanned_file_count'] == 0,
+    ),
+    ReadinessRule(
+        code='FILE_INFECTED',
+        field='files',
+        message=_('A file failed the virus scan. Please remove it and upload a clean copy.'),
+        check=lambda facts: not settings.VIRUS_SCAN_ENABLED or facts['infected_file_count'] == 0,
+    ),
+]
+
+
+def get_readiness_facts(submission: Submission) -> dict:
+    """
+    Collect the facts the readiness rules depend on.
+
+    Uses the count annotations if the instance was loaded with
+    `with_readiness_counts()`, otherwise runs one aggregated query.
+    """
+    if not hasattr(submission, 'annotated_unscanned_file_count'):
+        submission = Submission.objects.with_readiness_counts().only(
+            'id', 'title', 'abstract'
+        ).get(pk=submission.pk)
+
+    return {
+        'has_title': bool(submission.title),
+        'has_abstract': bool(submission.abstract),
+        'author_count': submission.annotated_author_count,
+        'corresponding_author_count': submission.annotated_corresponding_count,
+        'active_file_count': submission.annotated_file_count,
+        'unscanned_file_count': submission.annotated_unscanned_file_count,
+        'infected_file_count': submission.annotated_infected_file_count,
+    }
+
+
+def check_readiness(submission: Submission) -> ReadinessReport:
+    """
+    Run every readiness rule against a submission.
+
+    Args:
+        submission: Submission instance
+
+    Returns:
+        ReadinessReport: Facts and all failing rules
+    """
+    facts = get_readiness_facts(submission)
+    report = ReadinessReport(submission_id=str(submission.pk), facts=facts)
+
+    for rule in READINESS_RULES:
+        if not rule.check(facts):
+            report.issues.append(
+                ReadinessIssue(code=rule.code, field=rule.field, message=rule.message)
+            )
+
+    return report
@@ -7,10 +7,13 @@ Developer: Abdullah Dogan
 """
 
 from rest_framework import serializers
+from rest_framework.validators import UniqueTogetherValidator
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
 from .models import Submission, Author
+from .detail_cache import bump_version_on_commit
 from apps.users.serializers import UserMinimalSerializer
 from apps.files.serializers import ManuscriptFileSerializer
 
@@ -51,11 +54,14 @@ class SubmissionListSerializer(serializers.ModelSerializer):
     """
     Submission list serializer for dashboard.
     Returns summary information for listing.
+    
+    Reads counts and the corresponding author from the annotations added by
+    `Submission.objects.with_list_summary()` (constant query count per page).
     """
     
     submitter = UserMinimalSerializer(read_only=True)
-    author_count = serializers.ReadOnlyField()
-    file_count = serializers.ReadOnlyField()
+    author_count = serializers.IntegerField(read_only=True)
+    file_count = serializers.IntegerField(read_only=True)
     corresponding_author = serializers.SerializerMethodField()
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     
@@ -327,6 +333,82 @@ class SubmissionUpdateSerializer(serializers.ModelSerializer):
         return value
 
 
+class SubmissionAutosaveSerializer(serializers.Serializer):
+    """
+    Serializer for delta autosave requests.
+    
+    Request body:
+    {
+        "ops": [{"op": "replace", "path": "/step2/title", "value": "..."}],
+        "fields": {"abstract": "..."},
+        "flush": false
+    }
+    """
+    
+    AUTOSAVE_FIELDS = [
+        name for name in SubmissionUpdateSerializer.Meta.fields
+        if name != 'wizard_data'
+    ]
+    
+    ops = serializers.ListField(
+        child=serializers.DictField(),
+        required=False,
+        default=list,
+        help_text=_('JSON-Patch operations (add, replace, remove) against wizard_data')
+    )
+    fields = serializers.DictField(
+        required=False,
+        default=dict,
+        help_text=_('Changed submission fields')
+    )
+    flush = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text=_('Write to the database immediately')
+    )
+    
+    def validate_ops(self, value):
+        """Validate JSON-Patch operation shape."""
+        for operation in value:
+            if operation.get('op') not in ('add', 'replace', 'remove'):
+                raise serializers.ValidationError(
+                    _('Supported operations are add, replace and remove.')
+                )
+            if not isinstance(operation.get('path'), str):
+                raise serializers.ValidationError(
+                    _('Each operation requires a path.')
+                )
+            if operation['op'] != 'remove' and 'value' not in operation:
+                raise serializers.ValidationError(
+                    _('Add and replace operations require a value.')
+                )
+        return value
+    
+    def validate_fields(self, value):
+        """Validate changed fields with the update serializer rules."""
+        unknown = set(value) - set(self.AUTOSAVE_FIELDS)
+        if unknown:
+            raise serializers.ValidationError(
+                _('These fields cannot be autosaved: %(fields)s') % {
+                    'fields': ', '.join(sorted(unknown))
+                }
+            )
+        
+        serializer = SubmissionUpdateSerializer(
+            self.context['submission'],
+            data=value,
+            partial=True
+        )
+        if not serializer.is_valid():
+            raise serializers.ValidationError([
+                f"{name}: {message}"
+                for name, messages in serializer.errors.items()
+                for message in messages
+            ])
+        
+        return serializer.validated_data
+
+
 class AuthorCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating/updating authors.
@@ -355,6 +437,14 @@ class AuthorCreateSerializer(serializers.ModelSerializer):
             'is_corresponding',
             'contribution',
         ]
+        # Corresponding author switches are handled in create/update,
+        # so only the order uniqueness is validated here
+        validators = [
+            UniqueTogetherValidator(
+                queryset=Author.objects.all(),
+                fields=['submission', 'order']
+            )
+        ]
     
     def validate_email(self, value):
         """Validate email format."""
@@ -370,26 +460,195 @@ class AuthorCreateSerializer(serializers.ModelSerializer):
         if attrs.get('user') and not attrs.get('orcid_id'):
             attrs['orcid_id'] = attrs['user'].orcid_id
         
-        # Ensure at least name is provided
-        if not attrs.get('given_name') and not attrs.get('family_name'):
+        # Ensure at least name is provided (fall back to stored values on partial updates)
+        given_name = attrs.get('given_name', getattr(self.instance, 'given_name', ''))
+        family_name = attrs.get('family_name', getattr(self.instance, 'family_name', ''))
+        if not given_name and not family_name:
             raise serializers.ValidationError(
                 _('At least given name or family name must be provided.')
             )
         
         return attrs
     
+    @transaction.atomic
     def create(self, validated_data):
         """Create author and ensure only one corresponding author."""
-        author = super().create(validated_data)
+        # Release the flag first; the partial unique constraint rejects two
+        if validated_data.get('is_corresponding'):
+            Author.release_corresponding(validated_data['submission'])
+        
+        return super().create(validated_data)
+    
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Update author and ensure only one corresponding author."""
+        if validated_data.get('is_corresponding') and not instance.is_corresponding:
+            Author.release_corresponding(instance.submission, exclude_pk=instance.pk)
+        
+        return super().update(instance, validated_data)
+
+
+class AuthorBulkItemSerializer(AuthorCreateSerializer):
+    """
+    Single item of a bulk author update.
+    Order comes from the list position, so no per-row uniqueness queries.
+    """
+    
+    submission = None
+    
+    class Meta(AuthorCreateSerializer.Meta):
+        fields = [
+            name for name in AuthorCreateSerializer.Meta.fields
+            if name not in ('submission', 'order')
+        ]
+        validators = []
+
+
+class AuthorBulkSerializer(serializers.Serializer):
+    """
+    Serializer for replacing or reordering a submission's full author list.
+    
+    Items with an "id" update that existing author (only the given fields),
+    items without one create a new author. Position in the list becomes the
+    author order; existing authors missing from the list are removed.
+    
+    Request body:
+    {
+        "authors": [{"id": "uuid1"}, {"given_name": "...", ...}, ...]
+    }
+    """
+    
+    # Fields written by bulk_update (order/is_corresponding handled separately)
+    UPDATE_FIELDS = [
+        'user',
+        'orcid_id',
+        'given_name',
+        'family_name',
+        'email',
+        'institution',
+        'department',
+        'country',
+        'city',
+        'contribution',
+    ]
+    
+    authors = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        help_text=_('Full author list in the desired order')
+    )
+    
+    def validate_authors(self, value):
+        """Validate every item and build the write plan."""
+        submission = self.context['submission']
+        existing = {str(author.id): author for author in submission.authors.all()}
+        
+        plan = []
+        errors = {}
+        seen_ids = set()
         
-        # If this is corresponding, unset others
-        if author.is_corresponding:
-            Author.objects.filter(
-                submission=author.submission,
-                is_corresponding=True
-            ).exclude(pk=author.pk).update(is_corresponding=False)
+        for index, item in enumerate(value):
+            item = {k: v for k, v in item.items() if k not in ('order', 'submission')}
+            author_id = item.pop('id', None)
+            
+            if author_id is not None:
+                author_id = str(author_id)
+                if author_id not in existing:
+                    errors[index] = [_('Author does not belong to this submission.')]
+                    continue
+                if author_id in seen_ids:
+                    errors[index] = [_('Duplicate author IDs are not allowed.')]
+                    continue
+                seen_ids.add(author_id)
+                serializer = AuthorBulkItemSerializer(existing[author_id], data=item, partial=True)
+            else:
+                serializer = AuthorBulkItemSerializer(data=item)
+            
+            if not serializer.is_valid():
+                errors[index] = [
+                    f"{name}: {message}"
+                    for name, messages in serializer.errors.items()
+                    for message in messages
+                ]
+                continue
+            
+            plan.append((existing.get(author_id), serializer.validated_data))
+        
+        if errors:
+            raise serializers.ValidationError([
+                f"[{index}] {message}"
+                for index, messages in sorted(errors.items())
+                for message in messages
+            ])
+        
+        # An explicit corresponding author replaces the stored one
+        explicit = [data for _instance, data in plan if data.get('is_corresponding')]
+        if len(explicit) > 1:
+            raise serializers.ValidationError(
+                _('Only one corresponding author is allowed.')
+            )
+        if explicit:
+            for _instance, data in plan:
+                data.setdefault('is_corresponding', False)
+        
+        return plan
+    
+    @transaction.atomic
+    def save(self):
+        """
+        Apply the plan in set-based statements.
+        
+        Queries: one DELETE for removed authors, one UPDATE that shifts
+        orders and clears corresponding flags, one bulk_update and one
+        bulk_create.
+        """
+        submission = self.context['submission']
+        plan = self.validated_data['authors']
+        now = timezone.now()
+        
+        # Bulk writes send no signals
+        bump_version_on_commit(submission.pk)
+        
+        kept_ids = [instance.pk for instance, _data in plan if instance is not None]
+        Author.objects.filter(submission=submission).exclude(pk__in=kept_ids).delete()
+        
+        # Move surviving rows out of the 1..n range so final orders never clash
+        Author.objects.filter(submission=submission).update(
+            order=models.F('order') + Author.ORDER_SHIFT,
+            is_corresponding=False
+        )
+        
+        to_update = []
+        to_create = []
+        for order, (instance, data) in enumerate(plan, start=1):
+            is_corresponding = data.pop(
+                'is_corresponding',
+                instance.is_corresponding if instance else False
+            )
+            if instance is None:
+                author = Author(submission=submission, **data)
+                to_create.append(author)
+            else:
+                author = instance
+                for name, value in data.items():
+                    setattr(author, name, value)
+                to_update.append(author)
+            
+            author.order = order
+            author.is_corresponding = is_corresponding
+            author.updated_at = now
+            if author.user and not author.orcid_id:
+                author.orcid_id = author.user.orcid_id
+        
+        if to_update:
+            Author.objects.bulk_update(
+                to_update,
+                self.UPDATE_FIELDS + ['order', 'is_corresponding', 'updated_at']
+            )
+        if to_create:
+            Author.objects.bulk_create(to_create)
         
-        return author
+        return sorted(to_update + to_create, key=lambda author: author.order)
 
 
 class SubmissionSubmitSerializer(serializers.Serializer):
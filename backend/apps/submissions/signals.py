@@ -0,0 +1,44 @@
+"""
+TruEditor - Submission Signals
+==============================
+Invalidates cached submission detail payloads on related writes and
+removes generated PDFs from storage.
+
+Bulk operations (bulk_create, bulk_update, QuerySet.update) do not send
+signals; code using them calls `bump_version_on_commit` itself.
+
+Developer: Abdullah Dogan
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.files.models import ManuscriptFile
+from .models import Submission, SubmissionPDF, PDFFragment, Author
+from .detail_cache import bump_version_on_commit
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def invalidate_submission_detail(sender, instance, **kwargs):
+    """Submission row changed."""
+    bump_version_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=ManuscriptFile)
+@receiver(post_delete, sender=ManuscriptFile)
+def invalidate_parent_submission_detail(sender, instance, **kwargs):
+    """Author or file of a submission changed."""
+    bump_version_on_commit(instance.submission_id)
+
+
+@receiver(post_delete, sender=SubmissionPDF)
+@receiver(post_delete, sender=PDFFragment)
+def delete_submission_pdf_file(sender, instance, **kwargs):
+    """Remove a generated PDF or fragment from storage once its row is gone for good."""
+    if instance.file:
+        name, storage = instance.file.name, instance.file.storage
+        transaction.on_commit(lambda: storage.delete(name))
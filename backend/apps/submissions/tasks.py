@@ -0,0 +1,117 @@
+"""
+TruEditor - Submission Tasks
+============================
+Celery tasks for manuscript submissions.
+
+Developer: Abdullah Dogan
+"""
+
+import logging
+from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import worker_process_init
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def flush_autosave_buffer(submission_id):
+    """
+    Trailing flush of coalesced wizard autosaves.
+    
+    Scheduled when a submission's autosave buffer first becomes dirty;
+    a no-op if a request already flushed it.
+    
+    Args:
+        submission_id: Submission UUID
+    """
+    from .autosave import flush_pending_by_id
+    
+    flush_pending_by_id(submission_id)
+
+
+@shared_task(bind=True, ignore_result=True)
+def generate_submission_pdf(self, submission_id, content_hash=None):
+    """
+    Render the submission PDF unless its current content was rendered before.
+    
+    Not retried: a failed build is reported and the author can start another.
+    Runs on the `pdf` queue under its time limits (TASK_QUEUE_TIME_LIMITS).
+    Progress (converting files k/n, rendering, uploading) is recorded in
+    the task state as the build goes.
+    
+    Args:
+        submission_id: Submission UUID
+        content_hash: Hash the build was requested for (releases its build lock)
+    """
+    from .models import Submission
+    from .pdf import (
+        PDFBuildError, build, get_task_state, progress_reporter, release_build, set_task_state,
+    )
+    
+    task_id = self.request.id
+    
+    try:
+        submission = Submission.objects.prefetch_related('authors', 'files').get(pk=submission_id)
+    except Submission.DoesNotExist:
+        # Deleted after the build was requested
+        owner_id = (get_task_state(task_id) or {}).get('owner_id')
+        set_task_state(task_id, submission_id, owner_id, 'failed', error='Submission not found.')
+        return
+    
+    owner_id = submission.submitter_id
+    set_task_state(task_id, submission_id, owner_id, 'running')
+    
+    try:
+        pdf, rendered = build(submission, progress=progress_reporter(task_id, submission))
+    except PDFBuildError as e:
+        logger.error(f"PDF generation failed for submission {submission_id}: {str(e)}")
+        set_task_state(task_id, submission_id, owner_id, 'failed', error=str(e))
+        return
+    except SoftTimeLimitExceeded:
+        logger.error(f"PDF generation timed out for submission {submission_id}")
+        set_task_state(task_id, submission_id, owner_id, 'failed', error='PDF generation timed out.')
+        return
+    except Exception:
+        set_task_state(task_id, submission_id, owner_id, 'failed', error='PDF generation failed.')
+        raise
+    finally:
+        if content_hash:
+            release_build(submission_id, content_hash)
+    
+    set_task_state(task_id, submission_id, owner_id, 'done', pdf_id=str(pdf.pk), content_hash=pdf.content_hash)
+    if rendered:
+        logger.info(
+            f"Rendered PDF of submission {submission_id}: {pdf.page_count} page(s), "
+            f"{pdf.file_size} bytes in {pdf.render_time_ms} ms"
+        )
+
+
+@shared_task(ignore_result=True)
+def cleanup_pdf_fragments():
+    """
+    Delete PDF fragments no build used for PDF_FRAGMENT_RETENTION_DAYS.
+    
+    Scheduled daily by Celery beat.
+    """
+    from .pdf_fragments import cleanup_fragments
+    
+    deleted = cleanup_fragments()
+    if deleted:
+        logger.info(f"Deleted {deleted} unused PDF fragment(s)")
+
+
+@worker_process_init.connect
+def prewarm_pdf_renderer(**kwargs):
+    """Load fonts, CSS and template in each PDF worker process before its first task."""
+    if settings.CELERY_WORKER_PROFILE != 'pdf':
+        return
+    
+    from .pdf_renderer import prewarm
+    
+    try:
+        prewarm()
+    except Exception as e:
+        # Tasks still render (the renderer is then built on first use)
+        logger.error(f"PDF renderer warm-up failed: {str(e)}")
@@ -1,3 +1,234 @@
-from django.test import TestCase
+"""
+TruEditor - Submission Tests
+============================
+Tests for the submission API and helpers.
 
-# Create your tests here.
+Developer: Abdullah Dogan
+"""
+
+import time
+import uuid
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+from . import pdf
+from .autosave import buffer_changes
+from .models import Author, Submission, SubmissionPDF
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class SubmissionListPaginationTests(TestCase):
+    """Page-number listing by default, keyset listing on request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(orcid_id='0000-0000-9999-100X')
+        for i in range(3):
+            Submission.objects.create(submitter=cls.user, title=f'Submission {i}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_default_is_page_number(self):
+        response = self.client.get('/api/v1/submissions/', {'page': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_page_size_switches_to_keyset(self):
+        response = self.client.get('/api/v1/submissions/', {'page_size': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_tampered_cursor_is_not_found(self):
+        response = self.client.get('/api/v1/submissions/', {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class AuthorOrderTests(TestCase):
+    """Set-based author renumbering and bulk saves."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(orcid_id='0000-0000-9999-102X')
+        self.submission = Submission.objects.create(submitter=self.user, title='Authors')
+        self.authors = Author.objects.bulk_create([
+            Author(
+                submission=self.submission,
+                given_name='Author',
+                family_name=str(order),
+                email=f'author{order}@example.org',
+                order=order,
+                is_corresponding=order == 1,
+            )
+            for order in range(1, 4)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stored_order(self):
+        return list(
+            Author.objects.filter(submission=self.submission)
+            .order_by('order').values_list('family_name', 'order', 'is_corresponding')
+        )
+
+    def test_renumber_closes_gaps(self):
+        self.authors[1].delete()
+
+        Author.renumber(self.submission)
+
+        self.assertEqual(self.stored_order(), [('1', 1, True), ('3', 2, False)])
+
+    def test_renumber_in_given_order(self):
+        Author.renumber(self.submission, [author.pk for author in reversed(self.authors)])
+
+        self.assertEqual(
+            self.stored_order(),
+            [('3', 1, False), ('2', 2, False), ('1', 3, True)]
+        )
+
+    def test_bulk_save_reorders_creates_and_removes(self):
+        first, _second, third = self.authors
+        response = self.client.put(
+            f'/api/v1/submissions/{self.submission.pk}/authors/bulk/',
+            {'authors': [
+                {'id': str(third.pk), 'is_corresponding': True},
+                {
+                    'given_name': 'New',
+                    'family_name': '4',
+                    'email': 'author4@example.org',
+                    'institution': 'Example University',
+                },
+                {'id': str(first.pk), 'institution': 'Example University'},
+            ]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.stored_order(),
+            [('3', 1, True), ('4', 2, False), ('1', 3, False)]
+        )
+        self.assertEqual(
+            Author.objects.get(pk=first.pk).institution, 'Example University'
+        )
+
+    def test_bulk_save_rejects_foreign_author(self):
+        other = Submission.objects.create(submitter=self.user, title='Other')
+        foreign = Author.objects.create(
+            submission=other, given_name='Other', email='other@example.org', order=1
+        )
+
+        response = self.client.put(
+            f'/api/v1/submissions/{self.submission.pk}/authors/bulk/',
+            {'authors': [{'id': str(foreign.pk)}]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.stored_order()), 3)
+
+
+class AutosaveWriteThroughTests(TestCase):
+    """Autosaves are not buffered where nothing would flush them."""
+
+    def test_local_memory_cache_writes_through(self):
+        user = User.objects.create_user(orcid_id='0000-0000-9999-101X')
+        submission = Submission.objects.create(submitter=user, title='Draft')
+
+        state = buffer_changes(
+            submission,
+            operations=[{'op': 'add', 'path': '/step', 'value': 2}],
+            fields={'title': 'Autosaved'}
+        )
+
+        self.assertTrue(state['flushed'])
+        stored = Submission.objects.get(pk=submission.pk)
+        self.assertEqual(stored.title, 'Autosaved')
+        self.assertEqual(stored.wizard_data['step'], 2)
+
+
+@override_settings(ALLOWED_HOSTS=['*'], USE_S3=False, CELERY_TASK_ALWAYS_EAGER=True)
+class SubmissionPDFTests(TestCase):
+    """PDF builds and generated PDF downloads."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(orcid_id='0000-0000-9999-103X')
+        self.editor = User.objects.create_user(orcid_id='0000-0000-9999-104X', is_editor=True)
+        self.submission = Submission.objects.create(submitter=self.author, title='PDF')
+        self.client = APIClient()
+
+    def fake_build(self, submission, *args, **kwargs):
+        # Stands in for the WeasyPrint render; only the row matters here
+        generated = SubmissionPDF.objects.create(
+            submission=submission,
+            content_hash=pdf.content_hash(pdf.collect_inputs(submission)),
+            file='submission_pdfs/test.pdf',
+        )
+        return generated, True
+
+    def test_eager_build_answers_done(self):
+        self.client.force_authenticate(self.author)
+
+        with mock.patch('apps.submissions.pdf.build', side_effect=self.fake_build):
+            response = self.client.post(f'/api/v1/submissions/{self.submission.pk}/build_pdf/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['status'], 'done')
+        self.assertEqual(
+            response.data['data']['pdf']['id'],
+            str(SubmissionPDF.objects.get(submission=self.submission).pk)
+        )
+
+    def test_editor_needs_a_token_for_draft_pdfs(self):
+        generated, _rendered = self.fake_build(self.submission)
+        url = f'/api/v1/submissions/pdfs/{generated.pk}/content/'
+        self.client.force_authenticate(self.editor)
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        Submission.objects.filter(pk=self.submission.pk).update(status=Submission.Status.SUBMITTED)
+        # Past the access check; the test PDF was never written
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(ALLOWED_HOSTS=['*'], PDF_TASK_WAIT_MAX_SECONDS=0.2, PDF_TASK_POLL_INTERVAL=0.05)
+class PDFTaskLongPollTests(TestCase):
+    """Long-polling the PDF task state."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(orcid_id='0000-0000-9999-105X')
+        submission = Submission.objects.create(submitter=self.author, title='Polling')
+        self.task_id = str(uuid.uuid4())
+        pdf.set_task_state(self.task_id, submission.pk, self.author.pk, 'running')
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_non_finite_wait_is_rejected(self):
+        for wait in ('nan', 'inf', '-inf', 'soon'):
+            with self.subTest(wait=wait):
+                response = self.client.get(f'/api/v1/submissions/pdf-tasks/{self.task_id}/', {'wait': wait})
+
+                self.assertEqual(response.status_code, 400)
+
+    def test_wait_is_capped(self):
+        state = pdf.get_task_state(self.task_id)
+
+        for timeout in (60, float('inf'), float('nan')):
+            with self.subTest(timeout=timeout):
+                started = time.monotonic()
+                pdf.wait_for_task_state(self.task_id, state['updated_at'], timeout)
+
+                self.assertLess(time.monotonic() - started, 1)
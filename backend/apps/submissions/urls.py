@@ -13,16 +13,27 @@ Endpoint'ler:
 - POST   /api/v1/submissions/{id}/build_pdf/  -> PDF oluştur
 - POST   /api/v1/submissions/{id}/approve/    -> Onayla
 - POST   /api/v1/submissions/{id}/submit/     -> Gönder
+- PATCH  /api/v1/submissions/{id}/autosave/    -> Delta otomatik kayıt
+- GET    /api/v1/submissions/{id}/readiness/   -> Tamamlanma kontrolü
 - GET    /api/v1/submissions/{id}/task_status/ -> Görev durumu
+- GET    /api/v1/submissions/pdf-tasks/{task_id}/        -> PDF görev durumu (sadece cache, ?wait=&since= ile long-polling)
+- GET    /api/v1/submissions/pdfs/{id}/content/ -> Oluşturulan PDF (yerel storage)
+- PUT    /api/v1/submissions/{id}/authors/bulk/ -> Yazar listesini toplu güncelle
 """
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SubmissionViewSet
+from .views import (
+    SubmissionPDFDownloadView,
+    SubmissionPDFTaskView,
+    SubmissionViewSet,
+)
 
 router = DefaultRouter()
 router.register('', SubmissionViewSet, basename='submission')
 
 urlpatterns = [
+    path('pdfs/<uuid:pdf_id>/content/', SubmissionPDFDownloadView.as_view(), name='submission-pdf-content'),
+    path('pdf-tasks/<uuid:task_id>/', SubmissionPDFTaskView.as_view(), name='submission-pdf-task'),
     path('', include(router.urls)),
 ]
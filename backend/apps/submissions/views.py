@@ -7,23 +7,40 @@ Developer: Abdullah Dogan
 """
 
 import logging
+import math
+import uuid
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.http import Http404
+from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
-from .models import Submission, Author
+from . import pdf
+from .models import Submission, SubmissionPDF, Author
 from .serializers import (
     SubmissionListSerializer,
     SubmissionDetailSerializer,
     SubmissionCreateSerializer,
     SubmissionUpdateSerializer,
+    SubmissionAutosaveSerializer,
+    AuthorshipSerializer,
     AuthorCreateSerializer,
+    AuthorBulkSerializer,
     SubmissionSubmitSerializer,
 )
 from .permissions import IsOwnerOrReadOnly, CanEditSubmission, CanDeleteSubmission
+from .readiness import check_readiness
+from .autosave import buffer_changes, flush_pending, AutosavePatchError, AutosaveBusyError
+from .detail_cache import get_or_build
+from apps.common import metrics
+from apps.files import local_serving
+from apps.common.pagination import KeysetPagination
 from apps.common.response import (
     success_response,
     error_response,
@@ -49,10 +66,23 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     - build_pdf: Trigger PDF generation
     - approve: Author approval
     - submit: Final submission
+    - readiness: Completeness check for the wizard
+    - autosave: Buffered delta autosave for the wizard
     """
     
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly, CanEditSubmission, CanDeleteSubmission]
     
+    @property
+    def paginator(self):
+        """
+        Keyset pagination when asked for (`cursor` / `page_size`),
+        the default page-number pagination otherwise.
+        """
+        params = self.request.query_params
+        if not hasattr(self, '_paginator') and ('cursor' in params or 'page_size' in params):
+            self._paginator = KeysetPagination()
+        return super().paginator
+    
     def get_queryset(self):
         """
         Return submissions for the current user.
@@ -63,11 +93,20 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         ).select_related(
             'submitter',
             'assigned_editor'
-        ).prefetch_related(
-            'authors',
-            'files'
         ).order_by('-created_at')
         
+        if self.action == 'list':
+            # Counts and corresponding author come from annotations (no N+1)
+            queryset = queryset.with_list_summary()
+        elif self.action == 'readiness':
+            # Readiness facts come from annotations on the same SELECT
+            queryset = queryset.with_readiness_counts()
+        elif self.action in ['approve', 'submit']:
+            queryset = queryset.with_readiness_counts().prefetch_related('authors', 'files')
+        elif self.action not in ['autosave', 'task_status']:
+            # Autosave and task status only touch submission columns
+            queryset = queryset.prefetch_related('authors', 'files')
+        
         # Filter by status if provided
         status_filter = self.request.query_params.get('status', None)
         if status_filter:
@@ -75,6 +114,16 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def get_object(self):
+        """
+        Return the submission with any buffered autosave data written,
+        so every action except autosave itself sees the latest edits.
+        """
+        instance = super().get_object()
+        if self.action != 'autosave':
+            flush_pending(instance)
+        return instance
+    
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
         if self.action == 'list':
@@ -85,12 +134,26 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             return SubmissionUpdateSerializer
         return SubmissionDetailSerializer
     
+    def get_detail_data(self, submission):
+        """
+        Return the serialized detail payload through the versioned cache.
+        """
+        return get_or_build(
+            submission.pk,
+            self.request.user.pk,
+            lambda: SubmissionDetailSerializer(submission).data
+        )
+    
     def list(self, request, *args, **kwargs):
         """
         List user's submissions.
         
         Query params:
         - status: Filter by status (optional)
+        - page: Page number (optional, default mode)
+        - cursor / page_size: Switch to keyset pagination ordered by
+          newest first (optional)
+        - include_count: Include total count in keyset mode (optional)
         """
         queryset = self.filter_queryset(self.get_queryset())
         
@@ -115,19 +178,29 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         submission = serializer.save()
         
         return created_response(
-            data=SubmissionDetailSerializer(submission).data,
+            data=self.get_detail_data(submission),
             message=_('Submission created successfully')
         )
     
     def retrieve(self, request, *args, **kwargs):
         """
         Get submission details.
+        Served from the versioned detail cache (one cache round trip on a hit).
         """
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
+        # Same key as the signal bumps (canonical UUID), whatever the URL spelling
+        try:
+            submission_id = str(uuid.UUID(str(kwargs['pk'])))
+        except ValueError:
+            raise Http404
+        
+        def build():
+            instance = self.get_object()
+            return self.get_serializer(instance).data
+        
+        data = get_or_build(submission_id, request.user.pk, build)
         
         return success_response(
-            data=serializer.data,
+            data=data,
             message=_('Submission retrieved successfully')
         )
     
@@ -150,7 +223,7 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         self.perform_update(serializer)
         
         return success_response(
-            data=SubmissionDetailSerializer(instance).data,
+            data=self.get_detail_data(instance),
             message=_('Submission updated successfully')
         )
     
@@ -173,10 +246,14 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def build_pdf(self, request, pk=None):
         """
-        Trigger PDF generation for the submission.
-        
-        Note: PDF generation will be implemented in Phase 7 (Celery + WeasyPrint).
-        For now, this endpoint returns a placeholder response.
+        Build the submission PDF.
+        
+        The current draft content is hashed first: if a PDF of exactly
+        this content exists it is returned immediately (`status: done`),
+        otherwise a build is queued (`status: queued`, 202) or an already
+        running build of the same content is joined. Follow the build
+        through `status_url` (long-poll with `wait` and `since`). Eager
+        builds (development) return `status: done` right away.
         """
         submission = self.get_object()
         
@@ -186,16 +263,49 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 _('PDF can only be generated for draft submissions.')
             )
         
-        # TODO: Implement Celery task in Phase 7
-        # task = generate_submission_pdf.delay(submission.id)
+        digest = pdf.content_hash(pdf.collect_inputs(submission))
+        existing = submission.pdfs.filter(content_hash=digest).first()
+        
+        if existing is not None:
+            metrics.incr('submission_pdf.up_to_date')
+            return success_response(
+                data={
+                    'submission_id': str(submission.id),
+                    'status': 'done',
+                    'content_hash': digest,
+                    'pdf': pdf.pdf_data(existing),
+                },
+                message=_('PDF is up to date')
+            )
+        
+        task_id = pdf.schedule(submission, digest)
+        
+        # Eager tasks (development) have already finished the build
+        state = pdf.get_task_state(task_id)
+        if state is not None and state['status'] == 'done':
+            generated = submission.pdfs.filter(pk=state['pdf_id']).first()
+            if generated is not None:
+                return success_response(
+                    data={
+                        'submission_id': str(submission.id),
+                        'status': 'done',
+                        'task_id': task_id,
+                        'content_hash': digest,
+                        'pdf': pdf.pdf_data(generated),
+                    },
+                    message=_('PDF generated successfully')
+                )
         
         return success_response(
             data={
                 'submission_id': str(submission.id),
-                'status': 'pending',
-                'message': 'PDF generation will be implemented in Phase 7'
+                'status': 'queued',
+                'task_id': task_id,
+                'content_hash': digest,
+                'status_url': reverse('submission-pdf-task', args=[task_id]),
             },
-            message=_('PDF generation initiated')
+            message=_('PDF generation initiated'),
+            status_code=status.HTTP_202_ACCEPTED
         )
     
     @action(detail=True, methods=['post'])
@@ -211,31 +321,18 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 _('Only draft submissions can be approved.')
             )
         
-        # Validation: Check required fields
-        if not submission.title:
-            return validation_error_response(
-                _('Title is required.')
-            )
-        
-        if not submission.abstract:
-            return validation_error_response(
-                _('Abstract is required.')
-            )
-        
-        if submission.authors.count() == 0:
+        # Validation: Check completeness
+        report = check_readiness(submission)
+        if not report.is_ready:
             return validation_error_response(
-                _('At least one author is required.')
-            )
-        
-        if submission.files.filter(is_active=True).count() == 0:
-            return validation_error_response(
-                _('At least one file is required.')
+                report.issues[0].message,
+                details=report.issue_details()
             )
         
         # Approval is just a validation step
         # No status change, just return success
         return success_response(
-            data=SubmissionDetailSerializer(submission).data,
+            data=self.get_detail_data(submission),
             message=_('Submission approved and ready for final submission')
         )
     
@@ -257,30 +354,11 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         
         # Final validations
-        if not submission.title:
-            return validation_error_response(
-                _('Title is required.')
-            )
-        
-        if not submission.abstract:
-            return validation_error_response(
-                _('Abstract is required.')
-            )
-        
-        if submission.authors.count() == 0:
-            return validation_error_response(
-                _('At least one author is required.')
-            )
-        
-        if submission.files.filter(is_active=True).count() == 0:
+        report = check_readiness(submission)
+        if not report.is_ready:
             return validation_error_response(
-                _('At least one file is required.')
-            )
-        
-        # Check for corresponding author
-        if not submission.authors.filter(is_corresponding=True).exists():
-            return validation_error_response(
-                _('At least one corresponding author is required.')
+                report.issues[0].message,
+                details=report.issue_details()
             )
         
         # Perform FSM transition
@@ -293,7 +371,7 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             )
             
             return success_response(
-                data=SubmissionDetailSerializer(submission).data,
+                data=self.get_detail_data(submission),
                 message=_('Submission submitted successfully')
             )
         except Exception as e:
@@ -304,14 +382,78 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=True, methods=['patch'])
+    def autosave(self, request, pk=None):
+        """
+        Delta autosave for the wizard.
+        
+        Applies JSON-Patch ops to wizard_data and merges changed fields into
+        a short-lived cache buffer; the buffer is written with update_fields
+        once per AUTOSAVE_FLUSH_INTERVAL (or immediately with "flush": true).
+        """
+        submission = self.get_object()
+        
+        if not submission.is_editable:
+            return forbidden_response(
+                _('This submission cannot be edited in its current status.')
+            )
+        
+        serializer = SubmissionAutosaveSerializer(
+            data=request.data,
+            context={'submission': submission}
+        )
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            state = buffer_changes(
+                submission,
+                operations=serializer.validated_data['ops'],
+                fields=serializer.validated_data['fields'],
+                force_flush=serializer.validated_data['flush']
+            )
+        except AutosavePatchError as e:
+            return validation_error_response(str(e))
+        except AutosaveBusyError:
+            return error_response(
+                message=_('Another save is in progress, please retry.'),
+                code='AUTOSAVE_BUSY',
+                status_code=status.HTTP_409_CONFLICT
+            )
+        
+        return success_response(
+            data=state,
+            message=_('Changes saved')
+        )
+    
+    @action(detail=True, methods=['get'])
+    def readiness(self, request, pk=None):
+        """
+        Check whether the submission is complete.
+        
+        Runs every readiness rule against facts gathered in the same query
+        that loads the submission, so the wizard can poll it cheaply.
+        """
+        submission = self.get_object()
+        report = check_readiness(submission)
+        
+        return success_response(
+            data=report.to_dict(),
+            message=_('Readiness checked successfully')
+        )
+    
     @action(detail=True, methods=['get'])
     def task_status(self, request, pk=None):
         """
         Get PDF generation task status.
         
         Query params:
-        - task_id: Celery task ID
+        - task_id: Task ID returned by build_pdf
+        
+        Status: queued, running (with stage and progress), done (with
+        the PDF) or failed (with error). `GET /submissions/pdf-tasks/{task_id}/`
+        answers the same without loading the submission.
         """
+        submission = self.get_object()
         task_id = request.query_params.get('task_id')
         
         if not task_id:
@@ -319,13 +461,16 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 _('task_id parameter is required.')
             )
         
-        # TODO: Implement in Phase 7
-        # from celery.result import AsyncResult
-        # result = AsyncResult(task_id)
-        # return success_response(data={'status': result.status, 'result': result.result})
+        state = pdf.get_task_state(task_id)
+        
+        # Tasks of other submissions are indistinguishable from unknown ones
+        if state is None or state['submission_id'] != str(submission.id):
+            return not_found_response(
+                _('Task not found.')
+            )
         
         return success_response(
-            data={'status': 'pending', 'message': 'Task status will be implemented in Phase 7'},
+            data=pdf.task_data(task_id, state),
             message=_('Task status retrieved')
         )
     
@@ -360,7 +505,40 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 message=_('Author added successfully')
             )
     
-    @action(detail=True, methods=['put', 'delete'], url_path='authors/(?P<author_id>[^/.]+)')
+    @action(detail=True, methods=['put'], url_path='authors/bulk')
+    def bulk_authors(self, request, pk=None):
+        """
+        Replace or reorder the full author list in one transaction.
+        
+        Request body:
+        {
+            "authors": [{"id": "uuid1"}, {"given_name": "...", ...}, ...]
+        }
+        """
+        submission = self.get_object()
+        
+        if not submission.is_editable:
+            return forbidden_response(
+                _('This submission cannot be edited in its current status.')
+            )
+        
+        serializer = AuthorBulkSerializer(
+            data=request.data,
+            context={'submission': submission}
+        )
+        serializer.is_valid(raise_exception=True)
+        authors = serializer.save()
+        
+        return success_response(
+            data=AuthorshipSerializer(authors, many=True).data,
+            message=_('Authors updated successfully')
+        )
+    
+    @action(
+        detail=True,
+        methods=['put', 'delete'],
+        url_path=r'authors/(?P<author_id>[0-9a-fA-F-]{36})'
+    )
     def author_detail(self, request, pk=None, author_id=None):
         """
         Update or delete an author.
@@ -392,12 +570,100 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             )
         
         elif request.method == 'DELETE':
-            author.delete()
-            
-            # Reorder remaining authors
-            remaining_authors = submission.authors.all().order_by('order')
-            for order, auth in enumerate(remaining_authors, start=1):
-                auth.order = order
-                auth.save(update_fields=['order'])
+            with transaction.atomic():
+                author.delete()
+                
+                # Reorder remaining authors (set-based)
+                Author.renumber(submission)
             
             return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SubmissionPDFTaskView(APIView):
+    """
+    Status of a PDF build task.
+    
+    GET /submissions/pdf-tasks/{task_id}/?since=<updated_at>&wait=<seconds>
+    
+    Answered from the cached task state alone (no submission query), for
+    the submitter only: unknown, expired and other users' tasks are 404.
+    
+    Long-polling: with `wait`, the response is held until the state is no
+    longer the one from `since` (the `updated_at` of the previous answer),
+    at most PDF_TASK_WAIT_MAX_SECONDS.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, task_id):
+        state = pdf.get_task_state(task_id)
+        
+        if not pdf.is_task_owner(state, request.user):
+            return not_found_response(
+                _('Task not found.')
+            )
+        
+        try:
+            wait = float(request.query_params.get('wait') or 0)
+        except ValueError:
+            wait = None
+        # float() also accepts "nan" and "inf", which the clamp lets through
+        if wait is None or not math.isfinite(wait):
+            return validation_error_response(
+                _('wait must be a number of seconds.')
+            )
+        
+        wait = min(max(wait, 0), settings.PDF_TASK_WAIT_MAX_SECONDS)
+        if wait:
+            since = request.query_params.get('since') or state.get('updated_at')
+            state = pdf.wait_for_task_state(task_id, since, wait)
+            if state is None:
+                return not_found_response(
+                    _('Task not found.')
+                )
+        
+        response = success_response(
+            data=pdf.task_data(task_id, state),
+            message=_('Task status retrieved')
+        )
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+class SubmissionPDFDownloadView(APIView):
+    """
+    Serve a generated submission PDF from local storage (USE_S3=false).
+    
+    GET /submissions/pdfs/{id}/content/?token=...
+    
+    Same access rules and transfer as apps.files LocalFileDownloadView:
+    the signed token from the PDF's download URL, or the authenticated
+    submitter / an editor (not for drafts).
+    """
+    
+    # The signed token is the credential for plain links
+    permission_classes = [AllowAny]
+    
+    def get(self, request, pdf_id):
+        if settings.USE_S3:
+            raise Http404
+        
+        instance = SubmissionPDF.objects.select_related('submission').filter(pk=pdf_id).first()
+        if instance is None or not instance.file:
+            raise Http404
+        
+        token = request.query_params.get('token')
+        if token:
+            allowed = local_serving.check_token(token, instance)
+        else:
+            allowed = instance.submission.can_be_read_by(request.user)
+        
+        if not allowed:
+            return forbidden_response(
+                _('You do not have permission to access this file.')
+            )
+        
+        try:
+            return local_serving.serve(request, instance)
+        except FileNotFoundError:
+            raise Http404
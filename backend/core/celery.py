@@ -6,7 +6,12 @@ PDF oluşturma, email gönderme gibi ağır işler burada işlenir.
 """
 
 import os
+from fnmatch import fnmatchcase
+
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import celeryd_init
+from kombu import Queue
 
 # Django ayarlarını yükle
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
@@ -47,11 +52,122 @@ app.conf.update(
     result_serializer='json',
 )
 
+# ============================================
+# KUYRUKLAR VE YÖNLENDİRME
+# ============================================
+# Her iş türü kendi kuyruğunda, kendi worker'ında çalışır; bir PDF
+# yığılması mail / ORCID gibi kısa görevleri bekletmez:
+#   pdf    -> CPU ağırlıklı render (prefork)
+#   files  -> I/O ağırlıklı dosya işleri (önizleme, virüs tarama, GC)
+#   orcid  -> ağ beklemeli ORCID çağrıları (threads, yüksek eşzamanlılık)
+#   mail   -> e-posta gönderimi (threads)
+#   default-> diğer kısa görevler (autosave flush vb.)
+
+TASK_QUEUES = ['default', 'pdf', 'files', 'orcid', 'mail']
+
+# Görev adı (glob) -> kuyruk; ilk eşleşen geçerli
+TASK_ROUTES = {
+    'apps.submissions.tasks.generate_submission_pdf': 'pdf',
+    'apps.submissions.tasks.cleanup_pdf_fragments': 'files',
+    'apps.files.tasks.*': 'files',
+    'apps.users.tasks.*': 'orcid',
+    'apps.notifications.tasks.*': 'mail',
+}
+
+
+def queue_for(task_name):
+    """Return the queue a task is routed to."""
+    for pattern, queue in TASK_ROUTES.items():
+        if fnmatchcase(task_name, pattern):
+            return queue
+    return 'default'
+
+
+class QueueTimeLimits:
+    """
+    task_annotations: every task gets the time limits of its queue
+    (settings.TASK_QUEUE_TIME_LIMITS).
+    """
+    
+    def annotate(self, task):
+        from django.conf import settings
+        
+        limits = settings.TASK_QUEUE_TIME_LIMITS.get(queue_for(task.name))
+        if limits is None:
+            return None
+        soft_time_limit, time_limit = limits
+        return {'soft_time_limit': soft_time_limit, 'time_limit': time_limit}
+
+
+app.conf.update(
+    task_queues=[Queue(name) for name in TASK_QUEUES],
+    task_default_queue='default',
+    task_routes={pattern: {'queue': queue} for pattern, queue in TASK_ROUTES.items()},
+    task_annotations=[QueueTimeLimits()],
+)
+
+# ============================================
+# WORKER PROFİLLERİ
+# ============================================
+# Her worker bir profille başlatılır (docker-compose.yml / render.yaml).
+# Kuyruk (-Q), havuz (-P), eşzamanlılık (-c) ve ön-alma
+# (--prefetch-multiplier) komut satırında verilir:
+#
+#   profil   kuyruk(lar)     havuz    -c   prefetch
+#   default  default         prefork  2    1
+#   pdf      pdf             prefork  2    1   (uzun render'lar tek tek alınır)
+#   files    files           prefork  4    2
+#   network  orcid,mail      threads  20   4   (ağ beklemesi, kısa görevler)
+#
+# CELERY_WORKER_PROFILE=pdf: renderer her süreçte önceden ısıtılır
+# (apps.submissions.tasks), süreçler bellek / görev sınırında yenilenir
+
+
+@celeryd_init.connect
+def configure_worker_profile(conf=None, **kwargs):
+    """Worker profiline özel ayarlar (worker başlarken, havuz oluşmadan)."""
+    from django.conf import settings
+    
+    if settings.CELERY_WORKER_PROFILE == 'pdf':
+        conf.worker_max_memory_per_child = settings.PDF_WORKER_MAX_MEMORY_KB
+        conf.worker_max_tasks_per_child = settings.PDF_WORKER_MAX_TASKS
+
+
 # ============================================
 # PERIYODIK GÖREVLER (Celery Beat)
 # ============================================
 
 app.conf.beat_schedule = {
+    # Süresi dolan parçalı yükleme oturumlarını temizle
+    'cleanup-expired-uploads': {
+        'task': 'apps.files.tasks.cleanup_expired_uploads',
+        'schedule': crontab(minute=30),
+    },
+    
+    # Buffer'daki indirme loglarını toplu yaz
+    'flush-download-logs': {
+        'task': 'apps.files.tasks.flush_download_logs',
+        'schedule': crontab(),  # her dakika
+    },
+    
+    # Taranmamış dosyaları virüs taramasından geçir (kaçan tetiklemeler için)
+    'scan-pending-files': {
+        'task': 'apps.files.tasks.scan_pending_files',
+        'schedule': crontab(minute='*/5'),
+    },
+    
+    # Sahipsiz ve süresi dolmuş silinmiş dosyaları temizle
+    'collect-file-garbage': {
+        'task': 'apps.files.tasks.collect_file_garbage',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    
+    # Kullanılmayan PDF parçalarını temizle
+    'cleanup-pdf-fragments': {
+        'task': 'apps.submissions.tasks.cleanup_pdf_fragments',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    
     # Örnek: Her gün gece yarısı eski PDF'leri temizle
     # 'cleanup-old-pdfs': {
     #     'task': 'apps.submissions.tasks.cleanup_old_pdfs',
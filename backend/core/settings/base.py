@@ -254,6 +254,15 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    # Resumable upload (chunked) header'ları
+    'upload-offset',
+    'upload-checksum',
+]
+
+CORS_EXPOSE_HEADERS = [
+    'upload-offset',
+    'upload-length',
+    'location',
 ]
 
 # Development'ta tüm origin'lere izin ver (CORS_ALLOW_ALL geçersiz kılar)
@@ -323,6 +332,21 @@ else:
         },
     }
 
+# Yerel storage indirmeleri (USE_S3=false): dosyayı kim gönderir?
+# django: FileResponse (sendfile + Range), nginx: X-Accel-Redirect, apache: X-Sendfile
+LOCAL_FILE_SERVER = os.environ.get('LOCAL_FILE_SERVER', 'django')
+LOCAL_FILE_ACCEL_PREFIX = os.environ.get('LOCAL_FILE_ACCEL_PREFIX', '/protected-media/')  # nginx internal location
+
+# Presigned URL cache: URL'ler en az bu kadar süre geçerli kalacak şekilde
+# cache'lenir (cache TTL = expire - min validity - SUBMISSION_DETAIL_CACHE_TTL)
+PRESIGNED_URL_MIN_VALIDITY = int(os.environ.get('PRESIGNED_URL_MIN_VALIDITY', 300))  # 5 dakika
+
+# İndirme logları: istek sadece buffer'a (Redis list / process-local) yazar,
+# toplu bulk_create ile veritabanına aktarılır
+DOWNLOAD_LOG_BATCH_SIZE = int(os.environ.get('DOWNLOAD_LOG_BATCH_SIZE', 2000))
+DOWNLOAD_LOG_FLUSH_INTERVAL = int(os.environ.get('DOWNLOAD_LOG_FLUSH_INTERVAL', 10))  # saniye (process-local)
+DOWNLOAD_LOG_LOCAL_MAX_PENDING = 10000  # process-local buffer üst sınırı
+
 # ============================================
 # REDIS / CACHE (Platform-Agnostic)
 # ============================================
@@ -349,6 +373,13 @@ else:
         }
     }
 
+# Submission detail payload cache
+# Presigned URL'ler (15 dk) payload içinde olduğu için TTL daha kısa tutulur
+SUBMISSION_DETAIL_CACHE_TTL = int(os.environ.get('SUBMISSION_DETAIL_CACHE_TTL', 300))  # 5 dakika
+
+# Metrics: process-local sayaçlar bu aralıkla cache'e yazılır
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', 10))  # saniye
+
 # ============================================
 # CELERY (Platform-Agnostic)
 # ============================================
@@ -371,6 +402,19 @@ CELERY_TASK_ACKS_LATE = True  # Crash durumunda task'ı tekrar çalıştır
 CELERY_TASK_REJECT_ON_WORKER_LOST = True
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Fair distribution
 
+# Kuyruk başına zaman sınırları: (soft, hard) saniye
+# Kuyruklar ve yönlendirme: core/celery.py
+TASK_QUEUE_TIME_LIMITS = {
+    'default': (600, 900),
+    'pdf': (
+        int(os.environ.get('PDF_TASK_SOFT_TIME_LIMIT', 240)),
+        int(os.environ.get('PDF_TASK_TIME_LIMIT', 300)),
+    ),
+    'files': (600, 900),
+    'orcid': (30, 60),
+    'mail': (30, 60),
+}
+
 # Development'ta senkron çalıştırma (CELERY_EAGER=true ile)
 CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_EAGER', 'false').lower() == 'true'
 CELERY_TASK_EAGER_PROPAGATES = CELERY_TASK_ALWAYS_EAGER
@@ -385,12 +429,105 @@ ALLOWED_EXTENSIONS = os.environ.get(
     '.doc,.docx,.pdf,.jpg,.jpeg,.png,.tiff,.tif'
 ).split(',')
 
+# Yüklemeler hash'lenir (SHA-256, ikinci okuma yok). Akış sırasında
+# doğrulama (boyut, uzantı, magic bytes) sadece dosya yükleme view'ında
+# eklenir (ValidatingUploadHandler, ManuscriptFileViewSet.create); diğer
+# multipart formlar (ör. admin) bu kurallarla reddedilmez
+FILE_UPLOAD_HANDLERS = [
+    'apps.files.upload_handlers.HashingMemoryFileUploadHandler',
+    'apps.files.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# Resumable (chunked) upload
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 8388608))  # 8MB
+CHUNKED_UPLOAD_EXPIRY = int(os.environ.get('CHUNKED_UPLOAD_EXPIRY', 86400))  # 24 saat
+
+# Direct-to-S3 multipart upload (sadece USE_S3=true)
+DIRECT_UPLOAD_PART_SIZE = int(os.environ.get('DIRECT_UPLOAD_PART_SIZE', 8388608))  # 8MB (S3 min: 5MB)
+DIRECT_UPLOAD_URL_EXPIRE = int(os.environ.get('DIRECT_UPLOAD_URL_EXPIRE', 3600))  # 1 saat
+
+# ============================================
+# VIRUS TARAMA (Celery, arka planda)
+# ============================================
+# Yeni dosyalar arka planda taranır; tüm dosyalar temiz olana kadar
+# gönderim (submit) engellenir. Varsayılan kapalı: erişilebilir bir clamd
+# olmadan açılırsa hiçbir dosya taranmaz ve hiçbir gönderim yapılamaz.
+# Açmak için: VIRUS_SCAN_ENABLED=true ve CLAMD_HOST (clamd servisi)
+
+VIRUS_SCAN_ENABLED = os.environ.get('VIRUS_SCAN_ENABLED', 'false').lower() == 'true'
+VIRUS_SCANNER = os.environ.get('VIRUS_SCANNER', 'apps.files.scanning.ClamdScanner')
+VIRUS_SCANNER_OPTIONS = {
+    'host': os.environ.get('CLAMD_HOST', 'localhost'),
+    'port': int(os.environ.get('CLAMD_PORT', 3310)),
+    'timeout': int(os.environ.get('CLAMD_TIMEOUT', 60)),
+}
+VIRUS_SCAN_BATCH_DELAY = int(os.environ.get('VIRUS_SCAN_BATCH_DELAY', 5))  # saniye
+VIRUS_SCAN_BATCH_SIZE = int(os.environ.get('VIRUS_SCAN_BATCH_SIZE', 20))  # dosya / clamd oturumu
+VIRUS_SCAN_SMALL_FILE_SIZE = int(os.environ.get('VIRUS_SCAN_SMALL_FILE_SIZE', 1048576))  # 1MB, üstü stream edilir
+VIRUS_SCAN_STALE_AFTER = int(os.environ.get('VIRUS_SCAN_STALE_AFTER', 1800))  # 30 dakika
+
+# ============================================
+# ŞEKİL ÖNİZLEMELERİ (Pillow, Celery)
+# ============================================
+# Şekil dosyalarından (TIFF/PNG/JPEG) web boyutunda önizleme ve küçük
+# resimler üretilir; orijinalin yanında storage'da saklanır.
+
+IMAGE_DERIVATIVES = {
+    'thumbnail': 320,  # genişlik (px)
+    'preview': 1600,
+}
+IMAGE_DERIVATIVE_FORMATS = ['webp', 'jpeg']
+IMAGE_DERIVATIVE_QUALITY = int(os.environ.get('IMAGE_DERIVATIVE_QUALITY', 82))
+
+# ============================================
+# DOCX METADATA (Celery)
+# ============================================
+# Ana metin / başlık sayfası DOCX dosyalarından başlık, özet, anahtar
+# kelimeler ve sayımlar çıkarılır (her checksum bir kez işlenir).
+
+DOCUMENT_METADATA_MAX_SIZE = int(os.environ.get('DOCUMENT_METADATA_MAX_SIZE', 52428800))  # 50MB
+DOCUMENT_METADATA_STALE_AFTER = 600  # saniye, yarım kalan işlem yeniden alınır
+
+# ============================================
+# DOSYA ÇÖP TOPLAMA (Celery Beat, günlük)
+# ============================================
+# Silinmiş (is_active=False) dosyalar saklama süresi dolunca kalıcı
+# silinir; hiçbir kayda bağlı olmayan storage nesneleri temizlenir.
+
+FILE_GC_RETENTION_DAYS = int(os.environ.get('FILE_GC_RETENTION_DAYS', 30))  # silinmiş dosya saklama süresi
+FILE_GC_ORPHAN_GRACE_HOURS = int(os.environ.get('FILE_GC_ORPHAN_GRACE_HOURS', 24))  # yeni nesnelere dokunma
+FILE_GC_BATCH_SIZE = 1000  # satır / storage silme isteği
+FILE_GC_DRY_RUN = os.environ.get('FILE_GC_DRY_RUN', 'false').lower() == 'true'  # sadece raporla
+
+# ============================================
+# WIZARD AUTOSAVE
+# ============================================
+# Autosave delta'ları cache'te biriktirilir ve toplu yazılır
+
+AUTOSAVE_FLUSH_INTERVAL = int(os.environ.get('AUTOSAVE_FLUSH_INTERVAL', 15))  # saniye
+AUTOSAVE_BUFFER_TTL = int(os.environ.get('AUTOSAVE_BUFFER_TTL', 3600))  # 1 saat
+
 # ============================================
 # PDF OLUŞTURMA
 # ============================================
 
 WEASYPRINT_FONT_DIR = BASE_DIR / 'static' / 'fonts'
 PDF_DPI = int(os.environ.get('PDF_DPI', 150))
+# Parça önbelleği: kapak, ön yazı ve dönüştürülmüş dosyalar ayrı ayrı render edilip birleştirilir;
+# bu kadar gün hiçbir PDF'te kullanılmayan parçalar silinir
+PDF_FRAGMENT_RETENTION_DAYS = int(os.environ.get('PDF_FRAGMENT_RETENTION_DAYS', 30))
+
+# PDF görev durumu long-polling (?wait=): durum cache'ten bu aralıkla okunur;
+# bekleyen istek bir gunicorn thread'i tuttuğu için bekleme kısa tutulur
+PDF_TASK_POLL_INTERVAL = float(os.environ.get('PDF_TASK_POLL_INTERVAL', 0.5))
+PDF_TASK_WAIT_MAX_SECONDS = int(os.environ.get('PDF_TASK_WAIT_MAX_SECONDS', 5))
+
+# Worker profili (default, pdf, files, network; bkz. core/celery.py):
+# CELERY_WORKER_PROFILE=pdf ile başlatılan worker'lar font, CSS ve
+# şablonu süreç başında bir kez yükler (önceden ısıtılmış renderer)
+CELERY_WORKER_PROFILE = os.environ.get('CELERY_WORKER_PROFILE', 'default')
+PDF_WORKER_MAX_MEMORY_KB = int(os.environ.get('PDF_WORKER_MAX_MEMORY_KB', 614400))  # 600MB, aşılınca süreç yenilenir
+PDF_WORKER_MAX_TASKS = int(os.environ.get('PDF_WORKER_MAX_TASKS', 200))  # süreç başına PDF
 
 # ============================================
 # LOGGING (Platform-Agnostic - Console Only)
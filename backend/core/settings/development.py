@@ -51,6 +51,13 @@ try:
 except ImportError:
     pass
 
+# ============================================
+# VIRUS TARAMA (Development - varsayılan kapalı)
+# ============================================
+# Açmak için: VIRUS_SCAN_ENABLED=true ve `python manage.py clamd_stub`
+
+VIRUS_SCAN_ENABLED = os.environ.get('VIRUS_SCAN_ENABLED', 'false').lower() == 'true'
+
 # ============================================
 # JWT (Development - Uzun süreli tokenlar)
 # ============================================
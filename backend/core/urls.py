@@ -35,9 +35,10 @@ urlpatterns = [
     ])),
 ]
 
-# Development ortamında media dosyalarını serve et
+# Development ortamında static dosyaları serve et. MEDIA_ROOT bilerek
+# serve edilmez: dosyalar ve önizlemeler imzalı /files/{id}/content/ ve
+# /files/{id}/preview/ view'ları üzerinden verilir
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     
     # Debug Toolbar